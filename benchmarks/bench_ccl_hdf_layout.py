@@ -0,0 +1,48 @@
+"""Compares writing and loading the attribute layout of a `.ccl_hdf` file (one HDF5 group
+per CCL group, one attribute per option) with the columnar layout (`CCLColumns`).
+
+    python bench_ccl_hdf_layout.py --sizes 1000 10000
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.cclcolumns import CCLColumns
+
+
+def _timeit(func, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main(sizes, repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        print(f'{"groups":>8s} {"layout":>10s} {"write [s]":>10s} {"load [s]":>10s} {"size [MB]":>10s}')
+        for n in sizes:
+            ccl = CCLTextFile(write_synthetic_ccl(tmpdir / f'synthetic_{n}.ccl', n))
+            attr_filename = tmpdir / f'synthetic_{n}.ccl_hdf'
+            col_filename = tmpdir / f'synthetic_{n}.columnar.ccl_hdf'
+
+            t_write = _timeit(lambda: ccl.to_hdf(attr_filename), repeat)
+            t_load = _timeit(lambda: CCLColumns.from_attribute_hdf(attr_filename), repeat)
+            print(f'{n:8d} {"attributes":>10s} {t_write:10.3f} {t_load:10.3f} '
+                  f'{attr_filename.stat().st_size / 1e6:10.2f}')
+
+            t_write = _timeit(lambda: ccl.to_hdf(col_filename, layout='columnar'), repeat)
+            t_load = _timeit(lambda: CCLColumns.from_hdf(col_filename), repeat)
+            print(f'{n:8d} {"columnar":>10s} {t_write:10.3f} {t_load:10.3f} '
+                  f'{col_filename.stat().st_size / 1e6:10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
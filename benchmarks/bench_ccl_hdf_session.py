@@ -0,0 +1,50 @@
+"""Per-access overhead of the CCL wrapper classes with and without a `CCLFile.session()`.
+Reads and writes a few flow settings and the boundary types of a synthetic case.
+
+    python bench_ccl_hdf_session.py --groups 1000 --repeat 20
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLFile, CCLTextFile
+
+
+def _access(cclfile):
+    flow = cclfile.flow[0]
+    flow.max_iterations = flow.max_iterations + 1
+    flow.min_iterations = flow.min_iterations
+    return [b.type for domain in flow.domains for b in domain.boundaries]
+
+
+def main(groups, repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ccl = CCLTextFile(write_synthetic_ccl(pathlib.Path(tmpdir) / 'synthetic.ccl', groups))
+        cclfile = CCLFile(ccl.to_hdf())
+        n_accesses = 5 + len(_access(cclfile))
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            _access(cclfile)
+        t_plain = (time.perf_counter() - t0) / repeat
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            with cclfile.session('r+'):
+                _access(cclfile)
+        t_session = (time.perf_counter() - t0) / repeat
+
+        print(f'{n_accesses} accesses per run')
+        print(f'{"":>12s} {"run [ms]":>9s} {"access [us]":>12s}')
+        print(f'{"no session":>12s} {t_plain * 1e3:9.2f} {t_plain / n_accesses * 1e6:12.1f}')
+        print(f'{"session":>12s} {t_session * 1e3:9.2f} {t_session / n_accesses * 1e6:12.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--groups', type=int, default=1_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    main(args.groups, args.repeat)
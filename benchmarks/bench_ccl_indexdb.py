@@ -0,0 +1,83 @@
+"""Cross-case query "which cases use a mass flow inlet above 0.5 kg/s": walking every
+`.ccl_hdf` file compared with a query of the SQLite index `CCLIndexDB`.
+
+    python bench_ccl_indexdb.py --cases 800
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+import h5py
+
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.cclindexdb import CCLIndexDB
+
+CCL_FILENAME = pathlib.Path(__file__).parent.joinpath(
+    '../testdata/cylinderflow/steady_state/cyl_steadystate_laminar.ccl').resolve()
+MASS_AND_MOMENTUM = ('FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/'
+                     'BOUNDARY CONDITIONS/MASS AND MOMENTUM')
+
+
+def scan(hdf_files):
+    """Opens every file and walks its tree"""
+    found = []
+    for filename in hdf_files:
+        matches = []
+
+        def _visit(name, obj):
+            if (isinstance(obj, h5py.Group) and name.rsplit('/', 1)[-1] == 'MASS AND MOMENTUM'
+                    and obj.attrs.get('Option', None) == 'Mass Flow Rate'
+                    and float(obj.attrs['Mass Flow Rate'].split('[')[0]) > 0.5
+                    and obj.parent.parent.attrs.get('Boundary Type', None) == 'INLET'):
+                matches.append(name)
+
+        with h5py.File(filename) as h5:
+            h5.visititems(_visit)
+        if matches:
+            found.append(filename)
+    return found
+
+
+def main(n_cases):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        base = CCLTextFile(CCL_FILENAME).overlay()
+        hdf_files = []
+        for i in range(n_cases):
+            patch = {'Option': 'Mass Flow Rate', 'Mass Flow Rate': f'{i / n_cases:.4f} [kg s^-1]'}
+            filename = base.variant({MASS_AND_MOMENTUM: patch}).to_ccl(tmpdir / f'case{i:04d}.ccl')
+            hdf_files.append(CCLTextFile(filename).to_hdf())
+
+        t0 = time.perf_counter()
+        found_scan = scan(hdf_files)
+        t_scan = time.perf_counter() - t0
+
+        db = CCLIndexDB(tmpdir / f'cases{CCLIndexDB.SUFFIX}')
+        t0 = time.perf_counter()
+        db.add(hdf_files)
+        t_index = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        query = (db.query(group_type='MASS AND MOMENTUM')
+                 .where('Option', '==', 'Mass Flow Rate')
+                 .where('Mass Flow Rate', '>', '0.5 [kg s^-1]')
+                 .within('BOUNDARY', 'Boundary Type', '==', 'INLET'))
+        found_db = [pathlib.Path(filename) for filename, _, _ in query.paths()]
+        t_query = time.perf_counter() - t0
+        assert found_db == found_scan
+        t0 = time.perf_counter()
+        query.paths()
+        t_query_again = time.perf_counter() - t0
+        size = db.filename.stat().st_size
+        db.close()
+
+        print(f'{n_cases} cases, {len(found_db)} matches')
+        print(f'scan of all files: {t_scan * 1e3:8.1f} ms')
+        print(f'index query:       {t_query * 1e3:8.1f} ms, {t_query_again * 1e3:.1f} ms when repeated '
+              f'(indexing {t_index:.1f} s once, {size / 1e6:.1f} MB)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--cases', type=int, default=200)
+    main(parser.parse_args().cases)
@@ -0,0 +1,60 @@
+"""Accessing one domain of a large CCL file: full parsing (`CCLTextFile`) compared with
+the memory-mapped, lazily parsed `LazyCCLTextFile`.
+
+    python bench_ccl_lazy.py --sizes 10000 100000
+"""
+import argparse
+import gc
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.ccllazy import LazyCCLTextFile
+
+DOMAIN = 'FLOW: Flow Analysis 1/DOMAIN: dom0'
+
+
+def _measure(func, *args):
+    """Returns the result, the memory retained by the result [MB] and the runtime [s]"""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    dt = time.perf_counter() - t0
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 1e6, dt
+
+
+def _full(filename):
+    ccl = CCLTextFile(filename)
+    return ccl, ccl.index[DOMAIN].data
+
+
+def _lazy(filename):
+    ccl = LazyCCLTextFile(filename)
+    return ccl, ccl[DOMAIN].data
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f'{"groups":>8s} {"file [MB]":>10s} {"full [MB]":>10s} {"lazy [MB]":>10s} '
+              f'{"t_full [s]":>11s} {"t_lazy [s]":>11s}')
+        for n in sizes:
+            filename = write_synthetic_ccl(pathlib.Path(tmpdir) / f'synthetic_{n}.ccl', n)
+            (_, data_full), mem_full, t_full = _measure(_full, filename)
+            (lazy, data_lazy), mem_lazy, t_lazy = _measure(_lazy, filename)
+            assert {k: f.value for k, f in data_full.items()} == {k: f.value for k, f in data_lazy.items()}
+            lazy.close()
+            print(f'{n:8d} {filename.stat().st_size / 1e6:10.2f} {mem_full:10.2f} {mem_lazy:10.2f} '
+                  f'{t_full:11.3f} {t_lazy:11.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    main(parser.parse_args().sizes)
@@ -0,0 +1,50 @@
+"""Looking up the CEL group and the inlet boundary of a `.ccl_hdf` file: `h5tbx.find_one()`
+tree walks (as the setters of `CCLFile` did before) compared with the cached `CCLLocator`.
+
+    python bench_ccl_locator.py --calls 200
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+import h5rdmtoolbox as h5tbx
+
+from cfdtoolkit.cfx.ccl import CCLFile, CCLTextFile
+
+CCL_FILENAME = pathlib.Path(__file__).parent.joinpath(
+    '../testdata/cylinderflow/steady_state/cyl_steadystate_laminar.ccl').resolve()
+
+
+def main(n_calls):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cclfile = CCLFile(CCLTextFile(CCL_FILENAME).to_hdf(pathlib.Path(tmpdir) / 'case.ccl_hdf'))
+
+        t0 = time.perf_counter()
+        with h5tbx.File(cclfile.filename) as h5:
+            for _ in range(n_calls):
+                cel = h5.find_one({'$name': '/LIBRARY/CEL'}, '$group').name
+                inlet = h5['FLOW: Flow Analysis 1'].find_one({'$basename': 'BOUNDARY: Inlet'}, '$group').name
+        t_find_one = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(n_calls):
+            assert cclfile.locator.get('CEL', within='LIBRARY') == cel.strip('/')
+            assert cclfile.locator.find('BOUNDARY', boundary_type='INLET') == [inlet.strip('/')]
+        t_locator = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for i in range(n_calls):
+            cclfile.set_massflowrate(0.01 * i)
+        t_setter = time.perf_counter() - t0
+
+        print(f'{n_calls} lookups of the CEL group and the inlet')
+        print(f'h5tbx.find_one:   {t_find_one / n_calls * 1e3:8.3f} ms per lookup')
+        print(f'CCLLocator:       {t_locator / n_calls * 1e3:8.3f} ms per lookup (incl. the first walk)')
+        print(f'set_massflowrate: {t_setter / n_calls * 1e3:8.3f} ms per call')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=200)
+    main(parser.parse_args().calls)
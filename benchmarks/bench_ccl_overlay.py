@@ -0,0 +1,54 @@
+"""Writing CCL variants by copying the .ccl_hdf file, setting values and converting it
+(`CCLFile.to_ccl()`) compared with copy-on-write overlays (`CCLFile.overlay()`).
+
+    python bench_ccl_overlay.py --groups 1000 --variants 1000
+"""
+import argparse
+import pathlib
+import shutil
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLFile, CCLTextFile
+
+
+def main(groups, n_variants):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        ccl = CCLTextFile(write_synthetic_ccl(tmpdir / 'synthetic.ccl', groups))
+        cclfile = CCLFile(ccl.to_hdf())
+        path, fields = next((path, grp.data) for path, grp in ccl.index.paths.items() if path and grp.data)
+        name = next(iter(fields))
+
+        n_copy = min(n_variants, 20)
+        t0 = time.perf_counter()
+        for i in range(n_copy):
+            variant_filename = tmpdir / f'copy{i}.ccl_hdf'
+            shutil.copy(cclfile.filename, variant_filename)
+            variant = CCLFile(variant_filename)
+            with variant.session('r+') as session:
+                session.h5[path].attrs[name] = str(i)
+            variant.to_ccl(tmpdir / f'copy{i}.ccl')
+        t_copy = (time.perf_counter() - t0) / n_copy
+
+        t0 = time.perf_counter()
+        base = cclfile.overlay()
+        t_base = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for i in range(n_variants):
+            base.variant({f'{path}/{name}': str(i)}).to_ccl(tmpdir / f'overlay{i}.ccl')
+        t_overlay = (time.perf_counter() - t0) / n_variants
+
+        print(f'{groups} groups, {n_variants} variants')
+        print(f'copy + set + to_ccl   {t_copy * 1e3:10.3f} ms/variant ({60 / t_copy:10.0f} variants/min)')
+        print(f'overlay (base)        {t_base * 1e3:10.3f} ms')
+        print(f'overlay               {t_overlay * 1e3:10.3f} ms/variant ({60 / t_overlay:10.0f} variants/min)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--groups', type=int, default=1_000)
+    parser.add_argument('--variants', type=int, default=1_000)
+    args = parser.parse_args()
+    main(args.groups, args.variants)
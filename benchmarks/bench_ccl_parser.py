@@ -0,0 +1,47 @@
+"""Compares the single-pass CCL parser (`parse_ccl_lines`) with the legacy recursive
+`CCLGroup.find_subgroup` on synthetic CCL files.
+
+The legacy parser is O(groups x lines) and is therefore only run up to `--legacy-max` groups.
+
+    python bench_ccl_parser.py --sizes 10000 30000 100000 --legacy-max 10000
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLGroup, CCLTextFile
+
+
+def _signature(grp):
+    return (grp.name, grp.grp_line, grp.end_line, grp.indentation_length,
+            tuple((k, v.line, v.value) for k, v in grp.data.items()),
+            tuple(_signature(g) for g in grp.sub_groups.values()))
+
+
+def main(sizes, legacy_max):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f'{"groups":>8s} {"lines":>9s} {"new [s]":>9s} {"legacy [s]":>11s} {"speedup":>8s}')
+        for n in sizes:
+            filename = write_synthetic_ccl(pathlib.Path(tmpdir) / f'synthetic_{n}.ccl', n)
+            t0 = time.perf_counter()
+            ccl = CCLTextFile(filename)
+            t_new = time.perf_counter() - t0
+            if n <= legacy_max:
+                t0 = time.perf_counter()
+                legacy_root = CCLGroup(ccl.filename, 0, -1, ccl.indentation[0][1], ccl.intendation_step,
+                                       ccl.lines, ccl.indentation, name='root')
+                t_legacy = time.perf_counter() - t0
+                assert _signature(legacy_root) == _signature(ccl.root_group), 'trees differ!'
+                print(f'{n:8d} {len(ccl.lines):9d} {t_new:9.3f} {t_legacy:11.3f} {t_legacy / t_new:8.1f}')
+            else:
+                print(f'{n:8d} {len(ccl.lines):9d} {t_new:9.3f} {"-":>11s} {"-":>8s}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 30_000, 100_000])
+    parser.add_argument('--legacy-max', type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.sizes, args.legacy_max)
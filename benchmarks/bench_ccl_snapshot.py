@@ -0,0 +1,49 @@
+"""Reading options through `CCLHDFGroup` (file access per call) compared with a
+`CCLFile.snapshot()` (one load, then dict lookups).
+
+    python bench_ccl_snapshot.py --groups 1000 --options 200
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLFile, CCLTextFile
+
+
+def main(groups, n_options):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ccl = CCLTextFile(write_synthetic_ccl(pathlib.Path(tmpdir) / 'synthetic.ccl', groups))
+        cclfile = CCLFile(ccl.to_hdf())
+        paths = [path.lstrip('/') for path, grp in ccl.index.paths.items() if path and grp.option_names()]
+        reads = []
+        for path in paths:
+            reads.extend((path, name) for name in ccl.index[path].option_names())
+        reads = reads[:n_options]
+
+        t0 = time.perf_counter()
+        for path, name in reads:
+            cclfile[path].options[name]
+        t_hdf = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        snapshot = cclfile.snapshot()
+        t_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for path, name in reads:
+            snapshot[path].options[name]
+        t_snapshot = time.perf_counter() - t0
+
+        print(f'{len(reads)} option reads')
+        print(f'CCLHDFGroup        {t_hdf * 1e3:10.2f} ms')
+        print(f'snapshot (load)    {t_load * 1e3:10.2f} ms')
+        print(f'snapshot (reads)   {t_snapshot * 1e6:10.2f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--groups', type=int, default=1_000)
+    parser.add_argument('--options', type=int, default=200)
+    args = parser.parse_args()
+    main(args.groups, args.options)
@@ -0,0 +1,65 @@
+"""Disk use and a cross-case query of a parameter study: one `.ccl_hdf` file per case
+compared with one `CCLStudy` container with deduplicated subtrees.
+
+    python bench_ccl_study.py --cases 100
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+import h5py
+
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.cclstudy import CCLStudy
+from cfdtoolkit.cfx.hdfsession import HDFSession
+
+CCL_FILENAME = pathlib.Path(__file__).parent.joinpath(
+    '../testdata/cylinderflow/steady_state/cyl_steadystate_laminar.ccl').resolve()
+OPTION = 'LIBRARY/CEL/EXPRESSIONS/Um'
+
+
+def main(n_cases):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        base = CCLTextFile(CCL_FILENAME).overlay()
+        ccl_files = []
+        for i in range(n_cases):
+            filename = base.variant({OPTION: f'{0.1 + 0.01 * i:.2f} [m/s]'}).to_ccl(tmpdir / f'case{i:04d}.ccl')
+            ccl_files.append(CCLTextFile(filename))
+
+        t0 = time.perf_counter()
+        hdf_files = [ccl.to_hdf() for ccl in ccl_files]
+        t_files = time.perf_counter() - t0
+        size_files = sum(f.stat().st_size for f in hdf_files)
+
+        study = CCLStudy(tmpdir / f'study{CCLStudy.SUFFIX}')
+        t0 = time.perf_counter()
+        with HDFSession(study.filename, 'r+'):
+            for ccl in ccl_files:
+                study.add(ccl.filename.stem, ccl)
+        t_study = time.perf_counter() - t0
+        size_study = study.filename.stat().st_size
+
+        group_path, _, option = OPTION.rpartition('/')
+        t0 = time.perf_counter()
+        values_files = {}
+        for f in hdf_files:
+            with h5py.File(f) as h5:
+                values_files[f.stem] = h5[group_path].attrs[option]
+        t_query_files = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        values_study = study.values(OPTION)
+        t_query_study = time.perf_counter() - t0
+        assert values_files == values_study
+
+        print(f'{n_cases} cases, {study.stats()}')
+        print(f'{"":14s} {"size [MB]":>10s} {"write [s]":>10s} {"query [ms]":>11s}')
+        print(f'{".ccl_hdf files":14s} {size_files / 1e6:10.2f} {t_files:10.2f} {t_query_files * 1e3:11.2f}')
+        print(f'{"CCLStudy":14s} {size_study / 1e6:10.2f} {t_study:10.2f} {t_query_study * 1e3:11.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--cases', type=int, default=100)
+    main(parser.parse_args().cases)
@@ -0,0 +1,57 @@
+"""Compares the memory held by a parsed `CCLTextFile` (tree of `CCLGroup`) with the compact
+array-backed `CCLTree` on synthetic CCL files.
+
+    python bench_ccl_tree_memory.py --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.ccltree import CCLTree
+
+
+def _measure(func, *args):
+    """Returns the result, the memory retained by the result [MB] and the runtime [s]"""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    dt = time.perf_counter() - t0
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 1e6, dt
+
+
+def _touch_data(root):
+    """CCLGroup.data is built on request. Keep all data fields alive as an analysis would do"""
+    stack, fields = [root], []
+    while stack:
+        grp = stack.pop()
+        fields.append(grp.data)
+        stack.extend(grp.sub_groups.values())
+    return root, fields
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f'{"groups":>8s} {"file [MB]":>10s} {"CCLTextFile [MB]":>17s} {"+data [MB]":>11s} '
+              f'{"CCLTree [MB]":>13s} {"t_text [s]":>11s} {"t_tree [s]":>11s}')
+        for n in sizes:
+            filename = write_synthetic_ccl(pathlib.Path(tmpdir) / f'synthetic_{n}.ccl', n)
+            _, mem_text, t_text = _measure(CCLTextFile, filename)
+            _, mem_data, _ = _measure(lambda f: _touch_data(CCLTextFile(f).root_group), filename)
+            _, mem_tree, t_tree = _measure(CCLTree.from_file, filename)
+            print(f'{n:8d} {filename.stat().st_size / 1e6:10.2f} {mem_text:17.2f} {mem_data:11.2f} '
+                  f'{mem_tree:13.2f} {t_text:11.3f} {t_tree:11.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    main(parser.parse_args().sizes)
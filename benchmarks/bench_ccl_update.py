@@ -0,0 +1,46 @@
+"""Compares the incremental `CCLTextFile.update()` with a full re-parse after changing
+a single option of a synthetic CCL file (as done by parameter study drivers).
+
+    python bench_ccl_update.py --sizes 10000 100000
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLTextFile
+
+
+def main(sizes, repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f'{"groups":>8s} {"full parse [s]":>15s} {"update [s]":>11s} {"speedup":>8s}')
+        for n in sizes:
+            filename = write_synthetic_ccl(pathlib.Path(tmpdir) / f'synthetic_{n}.ccl', n)
+            ccl = CCLTextFile(filename)
+            t_update, t_full = 0., 0.
+            for i in range(repeat):
+                with open(filename) as f:
+                    text = f.read()
+                with open(filename, 'w') as f:
+                    f.write(text.replace(f'Maximum Number of Iterations = {100 + i}',
+                                         f'Maximum Number of Iterations = {101 + i}'))
+                os.utime(filename, (0, ccl.mtime + 1))
+
+                t0 = time.perf_counter()
+                ccl.update()
+                t_update += time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                CCLTextFile(filename)
+                t_full += time.perf_counter() - t0
+            print(f'{n:8d} {t_full / repeat:15.3f} {t_update / repeat:11.3f} {t_full / t_update:8.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,55 @@
+"""Extracting the numeric option values of many cases by splitting strings ad hoc compared
+with the cached typed-value layer (`cclvalue.typed_options()`).
+
+    python bench_ccl_values.py --groups 1000 --cases 50
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx import cclvalue
+from cfdtoolkit.cfx.ccl import CCLTextFile
+
+
+def _adhoc(text):
+    try:
+        return float(text.split(' [')[0])
+    except ValueError:
+        return text
+
+
+def main(groups, n_cases):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ccl = CCLTextFile(write_synthetic_ccl(pathlib.Path(tmpdir) / 'synthetic.ccl', groups))
+        texts = [text for _, text in cclvalue._iter_options(ccl.root_group)]
+
+        t0 = time.perf_counter()
+        for _ in range(n_cases):
+            values = [_adhoc(text) for text in texts]
+        t_adhoc = time.perf_counter() - t0
+
+        cclvalue.parse_value.cache_clear()
+        t0 = time.perf_counter()
+        for _ in range(n_cases):
+            values = cclvalue.parse_values(texts)
+        t_typed = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(n_cases):
+            cclvalue.typed_options(ccl.root_group)
+        t_tree = time.perf_counter() - t0
+
+        print(f'{n_cases} cases with {len(values)} options')
+        print(f'split ad hoc               {t_adhoc * 1e3:10.2f} ms')
+        print(f'parse_values               {t_typed * 1e3:10.2f} ms')
+        print(f'typed_options (tree walk)  {t_tree * 1e3:10.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--groups', type=int, default=1_000)
+    parser.add_argument('--cases', type=int, default=50)
+    args = parser.parse_args()
+    main(args.groups, args.cases)
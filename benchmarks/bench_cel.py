@@ -0,0 +1,43 @@
+"""Pre-validating a parameter sweep of the testdata case: evaluating the CEL expressions
+point by point compared with one vectorized evaluation over all points.
+
+    python bench_cel.py --points 10000
+"""
+import argparse
+import pathlib
+import time
+
+import numpy as np
+
+from cfdtoolkit.cfx.ccl import CCLTextFile
+from cfdtoolkit.cfx.cel import CELExpressions, CELQuantity
+
+CCL_FILENAME = pathlib.Path(__file__).parent.joinpath(
+    '../testdata/cylinderflow/steady_state/cyl_steadystate_laminar.ccl').resolve()
+
+
+def main(n_points):
+    cel = CELExpressions.from_ccl(CCLTextFile(CCL_FILENAME))
+    params = {'ave(Density)@INLET': '1 [kg m^-3]', 'ave(Dynamic Viscosity)@INLET': '0.001 [kg m^-1 s^-1]'}
+    um = np.linspace(0.1, 2.0, n_points)
+
+    t0 = time.perf_counter()
+    re_loop = [cel.evaluate(['Re'], params, Um=CELQuantity.from_unit(u, 'm s^-1'))['Re'].value for u in um]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    re_vec = cel.evaluate(['Re'], params, Um=CELQuantity.from_unit(um, 'm s^-1'))['Re'].value
+    valid = re_vec < 100
+    t_vec = time.perf_counter() - t0
+    assert np.allclose(re_loop, re_vec)
+
+    print(f'{n_points} sweep points, {valid.sum()} with Re < 100')
+    print(f'point by point  {t_loop * 1e3:10.2f} ms')
+    print(f'vectorized      {t_vec * 1e3:10.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--points', type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.points)
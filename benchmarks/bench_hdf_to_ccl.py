@@ -0,0 +1,68 @@
+"""Compares `hdf_to_ccl()` with the former recursive writer (string concatenation and one
+write per HDF5 group) on synthetic CCL files.
+
+    python bench_hdf_to_ccl.py --sizes 10000 50000
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+import h5py
+
+from ccl_synthetic import write_synthetic_ccl
+from cfdtoolkit.cfx.ccl import CCLTextFile, hdf_to_ccl
+
+
+def legacy_hdf_to_ccl(hdf_filename, ccl_filename, intendation_step=2):
+    def _write_to_file(writer, h5obj):
+        ret_string = ''
+        nlevel = len(h5obj.name.split('/')) - 2
+        _spaces = ''.join([' '] * nlevel * intendation_step)
+        name_stem = pathlib.Path(h5obj.name).stem
+        if ':' in name_stem:
+            ret_string += f'{_spaces}{name_stem}\n'
+        else:
+            ret_string += f'{_spaces}{name_stem.upper()}:\n'
+        for _k, _v in h5obj.attrs.items():
+            ret_string += _spaces.join([' '] * intendation_step) + f'{_k} = {_v}\n'
+        writer.write(ret_string)
+        for _v in h5obj.values():
+            _write_to_file(writer, _v)
+        writer.write(f'{_spaces}END\n')
+
+    with open(ccl_filename, 'w') as f:
+        with h5py.File(hdf_filename) as h5:
+            for k, v in h5.items():
+                _write_to_file(f, v)
+    return ccl_filename
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = pathlib.Path(tmpdir)
+        print(f'{"groups":>8s} {"attributes":>10s} {"legacy [s]":>11s} {"new [s]":>8s} {"identical":>10s}')
+        for n in sizes:
+            ccl = CCLTextFile(write_synthetic_ccl(tmpdir / f'synthetic_{n}.ccl', n))
+            hdf_filename = ccl.to_hdf()
+            with h5py.File(hdf_filename) as h5:
+                n_attrs = [0]
+                h5.visititems(lambda name, obj: n_attrs.__setitem__(0, n_attrs[0] + len(obj.attrs)))
+
+            t0 = time.perf_counter()
+            legacy_filename = legacy_hdf_to_ccl(hdf_filename, tmpdir / 'legacy.ccl')
+            t_legacy = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            new_filename = hdf_to_ccl(hdf_filename, tmpdir / 'new.ccl')
+            t_new = time.perf_counter() - t0
+
+            identical = legacy_filename.read_bytes() == new_filename.read_bytes()
+            print(f'{n:8d} {n_attrs[0]:10d} {t_legacy:11.3f} {t_new:8.3f} {str(identical):>10s}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000])
+    args = parser.parse_args()
+    main(args.sizes)
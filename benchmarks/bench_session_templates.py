@@ -0,0 +1,41 @@
+"""Preparing cfx5pre session files: copying the template and replacing every keyword in
+the file (as `run_session_file` did before) compared with rendering the compiled template
+and writing it once to the scratch directory.
+
+    python bench_session_templates.py --sessions 2000
+"""
+import argparse
+import time
+
+from cfdtoolkit.cfx import session
+
+PARAMS = {'__version__': '22.2', '__cfxfilename__': '/cases/case.cfx', '__timestep__': '0.001',
+          '__deffilename__': '/cases/case.def'}
+
+
+def main(n_sessions):
+    template = session.SESSIONS_DIR / 'change_timestep_and_write_def.pre'
+
+    t0 = time.perf_counter()
+    for _ in range(n_sessions):
+        tmp_session_file = session.copy_session_file_to_tmp(template)
+        for k, v in PARAMS.items():
+            session.replace_in_file(tmp_session_file, k, v)
+        tmp_session_file.unlink()
+    t_replace = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n_sessions):
+        with session._session_file(session.session_template(template).render(PARAMS)):
+            pass
+    t_render = time.perf_counter() - t0
+
+    print(f'{n_sessions} session files')
+    print(f'copy and replace per keyword: {t_replace / n_sessions * 1e6:8.1f} us per session')
+    print(f'compiled template:            {t_render / n_sessions * 1e6:8.1f} us per session')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sessions', type=int, default=2000)
+    main(parser.parse_args().sessions)
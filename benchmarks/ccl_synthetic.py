@@ -0,0 +1,59 @@
+"""Generates synthetic CCL files of arbitrary size for the benchmarks in this directory"""
+import pathlib
+
+BOUNDARIES_PER_DOMAIN = 20
+
+
+def _boundary(ib: int) -> str:
+    return (f'    BOUNDARY: bdry{ib}\n'
+            f'      Boundary Type = {"INLET" if ib == 0 else "WALL"}\n'
+            f'      Location = LOC{ib}\n'
+            f'      BOUNDARY CONDITIONS:\n'
+            f'        FLOW REGIME:\n'
+            f'          Option = Subsonic\n'
+            f'        END\n'
+            f'        MASS AND MOMENTUM:\n'
+            f'          Option = Normal Speed\n'
+            f'          Normal Speed = {ib}.5 [m s^-1]\n'
+            f'        END\n'
+            f'        TURBULENCE:\n'
+            f'          Option = Low Intensity and Eddy Viscosity Ratio\n'
+            f'        END\n'
+            f'      END\n'
+            f'    END\n')
+
+
+def write_synthetic_ccl(filename: pathlib.Path, n_groups: int) -> pathlib.Path:
+    """Writes a CCL file with roughly `n_groups` groups. Every boundary accounts
+    for 5 groups, every domain holds `BOUNDARIES_PER_DOMAIN` boundaries."""
+    n_domains = max(1, n_groups // (5 * BOUNDARIES_PER_DOMAIN))
+    with open(filename, 'w') as f:
+        f.write('LIBRARY:\n'
+                '  CEL:\n'
+                '    EXPRESSIONS:\n'
+                '      Um = 1.5 [m s^-1]\n'
+                '      Re = Um*0.1 [m]/1.5e-05 [m^2 s^-1]\n'
+                '    END\n'
+                '  END\n'
+                'END\n'
+                'FLOW: Flow Analysis 1\n'
+                '  ANALYSIS TYPE:\n'
+                '    Option = Steady State\n'
+                '  END\n')
+        for idom in range(n_domains):
+            f.write(f'  DOMAIN: dom{idom}\n'
+                    f'    Coord Frame = Coord 0\n'
+                    f'    Domain Type = Fluid\n'
+                    f'    Location = B{idom}, \\\n'
+                    f'      B{idom}b\n')
+            for ib in range(BOUNDARIES_PER_DOMAIN):
+                f.write(_boundary(ib))
+            f.write('  END\n')
+        f.write('  SOLVER CONTROL:\n'
+                '    CONVERGENCE CONTROL:\n'
+                '      Maximum Number of Iterations = 100\n'
+                '      Minimum Number of Iterations = 1\n'
+                '    END\n'
+                '  END\n'
+                'END\n')
+    return pathlib.Path(filename)
@@ -0,0 +1,69 @@
+"""Running the external CFX tools from asyncio.
+
+The blocking calls (`session.play_session()`, `CFXSolve.run()`, ...) run one tool at a time.
+Their `..._async` variants are coroutines built on `run_async()`, so a single driver can
+pre-process, solve, monitor and post-process many cases concurrently. The tools are started
+with argument lists (no shell) and their stdout and stderr are captured. A tool is killed if
+it exceeds its timeout or if the awaiting task is cancelled.
+
+Example
+-------
+async def main():
+    await asyncio.gather(*(session.play_session_async(f, timeout=600) for f in session_files))
+
+asyncio.run(main())
+"""
+import asyncio
+import logging
+import os
+import subprocess
+from typing import List, Union
+
+from .utils import NEW_PROCESS_GROUP, kill_process_group
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+
+async def run_async(args: List[Union[str, PATHLIKE]], timeout: Union[float, None] = None,
+                    cwd: Union[PATHLIKE, None] = None) -> subprocess.CompletedProcess:
+    """Runs `args` like `subprocess.run(args, capture_output=True)` without blocking the
+    event loop.
+
+    Parameters
+    ----------
+    args: List[Union[str, PATHLIKE]]
+        The executable and its arguments
+    timeout: float, optional
+        Seconds after which the process is killed and `subprocess.TimeoutExpired` is raised
+    cwd: PATHLIKE, optional
+        Working directory of the process
+
+    Returns
+    -------
+    subprocess.CompletedProcess
+        With the return code and the captured stdout and stderr (bytes)
+    """
+    args = [os.fspath(a) for a in args]
+    logger.debug(f'Starting {args}')
+    process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE, cwd=cwd,
+                                                   **NEW_PROCESS_GROUP)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        raise subprocess.TimeoutExpired(args, timeout) from None
+    except asyncio.CancelledError:
+        await _kill(process)
+        raise
+    completed_process = subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+    logger.debug(f'subprocess info: {completed_process}')
+    return completed_process
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        logger.debug(f'Killing process {process.pid}')
+        kill_process_group(process.pid)  # the tools are launcher scripts: kill their children, too
+        await process.wait()
@@ -1,10 +1,10 @@
-import h5py
 import pathlib
 from dataclasses import dataclass
 from typing import Dict, Union
 
 from . import CFXBoundaryCondition
 from . import axis, flowdir
+from ..hdfsession import open_h5
 from ...typing import PATHLIKE
 
 
@@ -18,7 +18,7 @@ class InletBoundaryCondition(CFXBoundaryCondition):
         boundary_ccl_name, boundary_user_name = group_name.split(':', 1)
         assert boundary_ccl_name == 'BOUNDARY'
 
-        with h5py.File(hdf_filename, 'r+') as h5:
+        with open_h5(hdf_filename, 'r+') as h5:
             h5[bdry_h5_path].attrs['Boundary Type'] = self.boundary_name
 
             # print(f'deleting {bdry_h5_path}/BOUNDARY CONDITIONS')
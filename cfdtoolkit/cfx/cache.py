@@ -0,0 +1,117 @@
+"""Content-addressed cache for files generated from CFX case files (e.g. the CCL text
+written by cfx5cmds). Generated files are stored as "<sha256 of the input><suffix>" in a
+cache directory inside the aux dir. The digest of an input file is remembered together
+with its size and modification time, so unchanged files are not hashed again."""
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Callable, Union
+
+from .. import AUXDIRNAME
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+CCL_CACHE_DIRNAME = 'ccl_cache'
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir(filename: PATHLIKE) -> pathlib.Path:
+    """Cache directory for the CCL of a case file: <case dir>/.cfdtoolkit/ccl_cache"""
+    return pathlib.Path(filename).resolve().parent.joinpath(AUXDIRNAME, CCL_CACHE_DIRNAME)
+
+
+def _stamp_filename(filename: pathlib.Path, cache_dir: pathlib.Path, suffix: str) -> pathlib.Path:
+    # the path hash keeps equally named files of different directories apart
+    path_hash = hashlib.blake2b(str(filename.resolve()).encode(), digest_size=4).hexdigest()
+    return cache_dir.joinpath(f'{filename.name}.{path_hash}{suffix}')
+
+
+def write_text_atomic(filename: pathlib.Path, text: str) -> None:
+    """Writes via a temporary file, so that concurrent readers never see a partial file"""
+    fd, tmp_filename = tempfile.mkstemp(dir=filename.parent, prefix=f'.{filename.name}.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_filename, filename)
+
+
+def file_digest(filename: PATHLIKE, cache_dir: PATHLIKE) -> str:
+    """Returns the sha256 hex digest of the file content. If size and modification time
+    equal the ones stored with the last digest, the file is not read again."""
+    filename = pathlib.Path(filename)
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    st = filename.stat()
+    stamp_filename = _stamp_filename(filename, cache_dir, '.stamp')
+    if stamp_filename.exists():
+        try:
+            size, mtime_ns, digest = stamp_filename.read_text().split()
+            if int(size) == st.st_size and int(mtime_ns) == st.st_mtime_ns:
+                return digest
+        except ValueError:
+            logger.debug(f'Ignoring corrupt stamp file {stamp_filename}')
+
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    write_text_atomic(stamp_filename, f'{st.st_size} {st.st_mtime_ns} {digest}')
+    return digest
+
+
+def cached_file(input_file: PATHLIKE, suffix: str, generate: Callable[[pathlib.Path, pathlib.Path], None],
+                cache_dir: PATHLIKE) -> pathlib.Path:
+    """Returns the cached file generated from the content of `input_file`. On a cache miss
+    `generate(input_file, target_filename)` is called to write it.
+
+    Parameters
+    ----------
+    input_file: PATHLIKE
+        File the cached file is generated from (e.g. a .def file)
+    suffix: str
+        Suffix of the generated file (e.g. ".ccl")
+    generate: Callable
+        Function writing the generated file
+    cache_dir: PATHLIKE
+        Cache directory (see `default_cache_dir()`)
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the cached file. Must not be modified.
+    """
+    input_file = pathlib.Path(input_file)
+    cache_dir = pathlib.Path(cache_dir)
+    digest = file_digest(input_file, cache_dir)
+    target = cache_dir.joinpath(f'{digest}{suffix}')
+    if target.exists():
+        logger.debug(f'Taking cached {target.name} for {input_file}')
+        return target
+
+    logger.debug(f'No cached {suffix} file for {input_file}. Generating it.')
+    # unique per process and thread. equal files may be generated concurrently (see `generate_many()`):
+    tmp_target = cache_dir.joinpath(f'.{digest}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}')
+    try:
+        generate(input_file, tmp_target)
+        os.replace(tmp_target, target)
+    finally:
+        if tmp_target.exists():
+            tmp_target.unlink()
+    return target
+
+
+def record_source(filename: PATHLIKE, digest: str, cache_dir: PATHLIKE) -> None:
+    """Remembers the digest of the input `filename` was generated from"""
+    write_text_atomic(_stamp_filename(pathlib.Path(filename), pathlib.Path(cache_dir), '.source'), digest)
+
+
+def recorded_source(filename: PATHLIKE, cache_dir: PATHLIKE) -> Union[str, None]:
+    """Returns the digest of the input `filename` was generated from or None if unknown"""
+    source_filename = _stamp_filename(pathlib.Path(filename), pathlib.Path(cache_dir), '.source')
+    if source_filename.exists():
+        return source_filename.read_text().strip()
+    return None
@@ -0,0 +1,196 @@
+"""Semantic hash of a CFX case file (.cfx).
+
+A .cfx file is a journal of datasets ("*DATASET", header fields, "*DATA", data,
+"*ENDDATASET"). Every save appends the changed datasets and a new "*INDEX" at the end of
+the file, which flags the datasets that are still valid ("Y") or superseded ("N"). The CCL
+of the case is stored in the "STATE" dataset as fixed width text records, followed by the
+state of the CFX-Pre GUI (views, colour maps, ...). Hence, saving a case in CFX-Pre changes
+the file even if nothing has changed that is written to the solver file.
+
+The semantic hash covers the valid datasets (in sorted order) except the bookkeeping ones
+(`IGNORED_DATASETS`). The STATE dataset contributes the normalized CCL without the GUI
+groups (see `COSMETIC_GROUP_TYPES`). It is used to skip writing a new .def file if the case
+is semantically unchanged.
+"""
+import hashlib
+import logging
+import pathlib
+import struct
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .cache import write_text_atomic
+from .. import AUXDIRNAME
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+#: top level CCL groups of the CFX-Pre state, which do not affect the solver file
+COSMETIC_GROUP_TYPES = ('COLOUR MAP DEFAULT', 'CUSTOMISATION', 'DEFAULT LEGEND', 'DEFAULT RENDERING',
+                        'GRAPHICS OPTIONS CONTROL', 'LABEL CONTROL', 'PHYSICS MESSAGES', 'STATE OPTIONS',
+                        'SYSTEM COLOUR MAP', 'VIEW', 'VIEWPORT MANAGER')
+#: datasets ignored by the semantic hash (dates and undo bookkeeping)
+IGNORED_DATASETS = ('Date - created', 'Date - modified', 'State - current', 'State - first', 'State - last')
+
+_DATASET = b'*DATASET'
+_ENDDATASET = b'*ENDDATASET'
+_INDEX = b'\n*INDEX\n'
+_ENDINDEX = b'\n*ENDINDEX\n'
+
+
+class CFXFileFormatError(ValueError):
+    """The .cfx file could not be read"""
+
+
+def _read_header(data: bytes, pos: int) -> Tuple[Dict[str, str], int]:
+    """Reads the header fields behind "*DATASET" at `pos`. Returns the header and the
+    position of the data (or of "*ENDDATASET" for empty datasets)"""
+    header = {}
+    while True:
+        if pos + 4 > len(data):
+            raise CFXFileFormatError('Unexpected end of file in dataset header')
+        (length,) = struct.unpack_from('<I', data, pos)
+        if length > 1024:
+            raise CFXFileFormatError(f'Unexpected header field length {length}')
+        pos += 4
+        fld = data[pos:pos + length]
+        pos += length
+        if fld == b'*DATA':
+            return header, pos
+        if fld == b'*HEADER':
+            continue
+        key, sep, value = fld.partition(b'\x1b')
+        if sep:
+            header[key.decode()] = value.decode(errors='replace')
+        # else: dataset attribute, e.g. "t=u"
+        if key == b'BLOCKFACTOR' and data.startswith(_ENDDATASET, pos):
+            return header, pos
+
+
+def _read_index(data: bytes) -> List[Tuple[str, str, int]]:
+    """Returns (what, where, offset) of the valid datasets listed in the last index"""
+    start = data.rfind(_INDEX)
+    stop = data.rfind(_ENDINDEX)
+    if start < 0 or stop < start:
+        raise CFXFileFormatError('No dataset index found')
+    entries = []
+    for line in data[start + len(_INDEX):stop].split(b'\n')[1:]:
+        fields = line.split(b'\x1b')
+        if len(fields) != 6:
+            raise CFXFileFormatError(f'Unexpected index entry {line!r}')
+        if fields[0] == b'Y':
+            entries.append((fields[1].decode(errors='replace'), fields[2].decode(errors='replace'),
+                            int(fields[5])))
+    return entries
+
+
+def iter_datasets(data: bytes) -> Iterator[Tuple[Dict[str, str], bytes]]:
+    """Yields header and data of the valid datasets of the content of a .cfx file"""
+    for what, where, offset in _read_index(data):
+        pos = data.find(_DATASET, offset, offset + 64)
+        if pos < 0:
+            raise CFXFileFormatError(f'Dataset {what} not found at {offset}')
+        header, data_start = _read_header(data, pos + len(_DATASET))
+        if header.get('WHAT', None) != what or header.get('WHERE', None) != where:
+            raise CFXFileFormatError(f'Expected dataset {what} at {offset} but found {header.get("WHAT")}')
+        data_end = data.find(_ENDDATASET, data_start)
+        if data_end < 0:
+            raise CFXFileFormatError(f'Dataset {what} is not terminated')
+        yield header, data[data_start:data_end]
+
+
+def state_ccl_lines(header: Dict[str, str], data: bytes) -> List[str]:
+    """Decodes the fixed width text records of the STATE dataset"""
+    n = int(header['NUMBER'])
+    if n == 0:
+        return []
+    width, rest = divmod(len(data), n)
+    if rest:
+        raise CFXFileFormatError(f'STATE dataset of {len(data)} bytes does not contain {n} records')
+    return [data[i:i + width].rstrip(b'\x00').decode(errors='replace') + '\n'
+            for i in range(0, len(data), width)]
+
+
+def _ccl_digest(lines: List[str]) -> bytes:
+    from .ccl import _tokenize_ccl, parse_ccl_lines
+    from .ccldiff import hash_tree
+
+    root = parse_ccl_lines(_tokenize_ccl(lines)[0])
+    for name in list(root.sub_groups):
+        if name.split(':', 1)[0] in COSMETIC_GROUP_TYPES:
+            del root.sub_groups[name]
+    return hash_tree(root).digest
+
+
+def semantic_hash(cfx_filename: PATHLIKE) -> Union[str, None]:
+    """Returns the semantic hash of a .cfx file or None if the file cannot be interpreted"""
+    with open(cfx_filename, 'rb') as f:
+        data = f.read()
+    digests = []
+    found_state = False
+    try:
+        for header, dataset in iter_datasets(data):
+            what, where = header['WHAT'], header['WHERE']
+            if what in IGNORED_DATASETS:
+                continue
+            if what == 'STATE' and where == 'CFX-Pre':
+                digest = _ccl_digest(state_ccl_lines(header, dataset))
+                found_state = True
+            else:
+                digest = hashlib.blake2b(dataset, digest_size=16).digest()
+            digests.append((what, where, digest))
+    except (CFXFileFormatError, ValueError, KeyError, struct.error) as e:
+        logger.debug(f'Cannot compute the semantic hash of {cfx_filename}: {e}')
+        return None
+    if not found_state:
+        logger.debug(f'No CCL state found in {cfx_filename}')
+        return None
+    h = hashlib.blake2b(digest_size=32)
+    for what, where, digest in sorted(digests):
+        h.update(what.encode() + b'\x00' + where.encode() + b'\x00' + digest)
+    return h.hexdigest()
+
+
+def _record_filename(def_filename: pathlib.Path) -> pathlib.Path:
+    return def_filename.parent.joinpath(AUXDIRNAME, f'{def_filename.name}.semantic')
+
+
+def def_is_current(cfx_filename: PATHLIKE, def_filename: PATHLIKE, ansys_version: str) -> bool:
+    """Whether `def_filename` was written from a .cfx file with the same semantic hash and
+    with the same ANSYS version"""
+    cfx_filename = pathlib.Path(cfx_filename)
+    def_filename = pathlib.Path(def_filename)
+    record_filename = _record_filename(def_filename)
+    if not def_filename.exists() or not record_filename.exists():
+        return False
+    try:
+        size, mtime_ns, version, digest = record_filename.read_text().split('\n')[:4]
+    except ValueError:
+        return False
+    if version != str(ansys_version):
+        return False
+    st = cfx_filename.stat()
+    if int(size) == st.st_size and int(mtime_ns) == st.st_mtime_ns:
+        return True
+    current_digest = semantic_hash(cfx_filename)
+    if current_digest is None or current_digest != digest:
+        return False
+    record_def(cfx_filename, def_filename, ansys_version, current_digest)  # new mtime, same content
+    return True
+
+
+def record_def(cfx_filename: PATHLIKE, def_filename: PATHLIKE, ansys_version: str,
+               digest: Union[str, None] = None) -> None:
+    """Records the semantic hash of the .cfx file `def_filename` was written from in the
+    aux dir next to the .def file"""
+    cfx_filename = pathlib.Path(cfx_filename)
+    def_filename = pathlib.Path(def_filename)
+    if digest is None:
+        digest = semantic_hash(cfx_filename)
+    record_filename = _record_filename(def_filename)
+    if digest is None:
+        if record_filename.exists():
+            record_filename.unlink()
+        return
+    record_filename.parent.mkdir(parents=True, exist_ok=True)
+    st = cfx_filename.stat()
+    write_text_atomic(record_filename, f'{st.st_size}\n{st.st_mtime_ns}\n{ansys_version}\n{digest}\n')
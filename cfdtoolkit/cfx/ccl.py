@@ -1,19 +1,37 @@
+import bisect
+import concurrent.futures
+import contextlib
 import dotenv
+import fnmatch
+import functools
 import h5py
 import h5rdmtoolbox as h5tbx
+import hashlib
 import logging
 import numpy as np
 import os
 import pathlib
+import re
 import shutil
 import subprocess
+import tempfile
 from IPython.display import display, HTML
-from dataclasses import dataclass
-from typing import Dict
-from typing import List, Union
+from dataclasses import dataclass, field
+from typing import Dict, Iterable
+from typing import List, Tuple, Union
 
+from .asyncproc import run_async
 from .boundary_conditions import CFXBoundaryCondition
+from .cache import CCL_CACHE_DIRNAME, cached_file, default_cache_dir, file_digest, record_source, recorded_source
+from .cclcolumns import CCLColumns, COLUMNAR_LAYOUT, is_columnar
+from .ccldiff import CCLDiff, diff as ccl_diff
+from .ccllocator import CCLLocator
+from .ccloverlay import CCLOverlayBase
+from .cclsnapshot import CCLSnapshot
+from .cclvalue import CCLValue, format_value, parse_value
+from .cel import CELQuantity, CELUnitError, parse_unit
 from .core import MonitorObject
+from .hdfsession import H5GroupRef, HDFSession, open_h5
 from .session import cfx2def
 from .utils import change_suffix
 from .. import CFX_DOTENV_FILENAME
@@ -36,25 +54,171 @@ class CCLDataField:
     value: str
 
     def set(self, new_value) -> None:
-        """updates the value in the CCL file"""
+        """updates the value in the CCL file. To change multiple values, use
+        `CCLTextFile.edit()`, which writes the file only once."""
         if not self.value == new_value:
-            self.value = new_value
-            bak_filename = shutil.copy(self.filename, f'{self.filename}.bak')
-            shutil.copy(self.filename, bak_filename)
             with open(self.filename, 'r') as f:
-                lines = f.readlines()
-                target_line = lines[self.line]
-            intendation_count = target_line.split(self.name)[0]
-            lines[self.line] = f'{intendation_count}{self.name} = {new_value}\n'
-            with open(self.filename, 'w') as f:
-                f.writelines(lines)
+                raw_lines = f.readlines()
+            _, line_numbers = _tokenize_ccl(raw_lines)
+            new_raw_lines, _ = _apply_option_edits(raw_lines, line_numbers, {self.line: (self.name, new_value)})
+            _atomic_write(self.filename, new_raw_lines, backup=True)
+            self.value = new_value
+
+
+def _apply_option_edits(raw_lines: List[str], line_numbers: List[int],
+                        edits: Dict[int, Tuple[str, str]]) -> Tuple[List[str], List[int]]:
+    """Replaces option lines in a single pass.
+
+    Parameters
+    ----------
+    raw_lines: List[str]
+        Lines of the CCL file as read from disk
+    line_numbers: List[int]
+        Index of the first raw line of every logical line (see `_tokenize_ccl`)
+    edits: Dict[int, Tuple[str, str]]
+        Logical line -> (option name, new value). An option continued over multiple
+        raw lines is written to a single line.
+
+    Returns
+    -------
+    new_raw_lines: List[str]
+    new_line_numbers: List[int]
+        The logical lines are the same, but their raw line numbers shift if continued
+        lines have been joined.
+    """
+    new_raw_lines = []
+    new_line_numbers = []
+    raw_pos, logical_pos, offset = 0, 0, 0
+    for iline in sorted(edits):
+        name, value = edits[iline]
+        raw_start = line_numbers[iline]
+        target_line = raw_lines[raw_start]
+        if target_line.strip().partition('=')[0].strip() != name:
+            raise ValueError(f'Expected option "{name}" in line {raw_start} but found: {target_line.strip()}')
+        raw_stop = raw_start + 1
+        while raw_stop < len(raw_lines) and raw_lines[raw_stop - 1].rstrip('\n').endswith('\\'):
+            raw_stop += 1
+        intendation = target_line[:len(target_line) - len(target_line.lstrip())]
+
+        new_raw_lines.extend(raw_lines[raw_pos:raw_start])
+        new_raw_lines.append(f'{intendation}{name} = {value}\n')
+        if offset == 0:
+            new_line_numbers.extend(line_numbers[logical_pos:iline + 1])
+        else:
+            new_line_numbers.extend(n - offset for n in line_numbers[logical_pos:iline + 1])
+        offset += raw_stop - raw_start - 1
+        raw_pos, logical_pos = raw_stop, iline + 1
+    new_raw_lines.extend(raw_lines[raw_pos:])
+    if offset == 0:
+        new_line_numbers.extend(line_numbers[logical_pos:])
+    else:
+        new_line_numbers.extend(n - offset for n in line_numbers[logical_pos:])
+    return new_raw_lines, new_line_numbers
+
+
+def _atomic_write(filename: PATHLIKE, lines: List[str], backup: bool = True) -> None:
+    """Writes lines to a temporary file next to `filename` which then replaces `filename`.
+    If `backup`, the current file is copied to "<filename>.bak" before."""
+    filename = pathlib.Path(filename)
+    if backup:
+        shutil.copy2(filename, f'{filename}.bak')
+    fd, tmp_filename = tempfile.mkstemp(dir=filename.parent, prefix=f'.{filename.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+        shutil.copymode(filename, tmp_filename)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.unlink(tmp_filename)
+        raise
+
+
+class CCLEditSession:
+    """Queues value changes of options of a `CCLTextFile` and writes them in one pass.
+    Use it via `CCLTextFile.edit()`:
+
+    with ccl.edit() as tx:
+        tx.set(convergence_control.data['Maximum Number of Iterations'], 100)
+        tx.set(time_steps.data['Timesteps'], '0.001 [s]')
+
+    The changes are written when the with-block is left without an exception. The file
+    is replaced atomically and backed up once. Logical line numbers of all options (and
+    thus all `CCLDataField` objects) stay valid.
+    """
+
+    def __init__(self, ccl_file: "CCLTextFile", backup: bool = True):
+        self.ccl_file = ccl_file
+        self.backup = backup
+        self._edits = {}
+
+    def __repr__(self):
+        return f'<CCLEditSession {self.ccl_file.filename} ({len(self)} pending changes)>'
+
+    def __len__(self):
+        return len(self._edits)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def set(self, field: CCLDataField, new_value) -> None:
+        """Queues a new value for an option. It is written and stored as string."""
+        new_value = str(new_value)
+        if field.value == new_value:
+            self._edits.pop(field.line, None)
+        else:
+            self._edits[field.line] = (field, new_value)
+
+    def discard(self) -> None:
+        """Drops all pending changes"""
+        self._edits = {}
+
+    def commit(self) -> bool:
+        """Writes all pending changes. Returns False if there was nothing to write"""
+        if len(self._edits) == 0:
+            return False
+        ccl_file = self.ccl_file
+        ccl_file.update()
+        for iline, (field, _) in self._edits.items():
+            if iline >= len(ccl_file.lines) or \
+                    ccl_file.lines[iline].strip().partition('=')[0].strip() != field.name:
+                raise ValueError(f'Option "{field.name}" not found in line {iline} of {ccl_file.filename}. '
+                                 'The file has changed since the option was read.')
+
+        edits = {iline: (field.name, new_value) for iline, (field, new_value) in self._edits.items()}
+        new_raw_lines, new_line_numbers = _apply_option_edits(ccl_file._raw_lines, ccl_file.line_numbers, edits)
+        _atomic_write(ccl_file.filename, new_raw_lines, backup=self.backup)
+        logger.debug(f'Changed {len(edits)} option(s) in {ccl_file.filename}')
+
+        ccl_file._raw_lines = new_raw_lines
+        ccl_file.line_numbers[:] = new_line_numbers
+        for iline, (name, value) in edits.items():
+            line = ccl_file.lines[iline]
+            ccl_file.lines[iline] = f'{line[:len(line) - len(line.lstrip())]}{name} = {value}'
+            for grp in ccl_file._group_path(iline, iline + 1):
+                grp.line_hash = None
+        for field, new_value in self._edits.values():
+            field.value = new_value
+        st = ccl_file.filename.stat()
+        ccl_file.mtime = st.st_mtime
+        ccl_file.size = st.st_size
+        self._edits = {}
+        return True
 
 
 class CCLGroup:
 
     def __init__(self, filename, grp_line, end_line, indentation_length,
                  intendation_step, all_lines,
-                 all_indentation, name=None, verbose=False):
+                 all_indentation, name=None, verbose=False, sub_groups: Dict = None):
+        """If `sub_groups` is None, the sub groups are searched recursively (legacy and
+        slow for large files). `parse_ccl_lines()` passes an empty dict and fills it itself."""
         self.filename = filename
 
         self.all_lines = all_lines
@@ -80,9 +244,13 @@ class CCLGroup:
         self.indentation_length = indentation_length
         self.intendation_step = intendation_step
         self.verbose = verbose
+        self.line_hash = None  # hash of the line range, set by CCLTextFile.update()
 
-        self.sub_groups = {}
-        self.find_subgroup()
+        if sub_groups is None:
+            self.sub_groups = {}
+            self.find_subgroup()
+        else:
+            self.sub_groups = sub_groups
 
     def __repr__(self):
         return self.name
@@ -100,7 +268,7 @@ class CCLGroup:
     def _lines_to_data(self, lines):
         data = {}
         for iline, line in enumerate(lines):
-            linedata = line.strip().split('=')
+            linedata = line.strip().split('=', 1)
             if len(linedata) > 1:
                 name = linedata[0].strip()
                 value = linedata[1].strip()
@@ -112,7 +280,19 @@ class CCLGroup:
 
     @property
     def data(self):
-        return self._lines_to_data(self.get_lines())
+        # iterate over the line indices instead of slicing: options are only at the top of
+        # the group and slicing the lines of a large group (e.g. FLOW) is expensive
+        return self._lines_to_data(self.all_lines[i] for i in range(self.grp_line + 1, self.end_line))
+
+    def option_names(self) -> List[str]:
+        """Names of the options of the group (without creating `CCLDataField` objects)"""
+        names = []
+        for i in range(self.grp_line + 1, self.end_line):
+            name, sep, _ = self.all_lines[i].partition('=')
+            if not sep:
+                break
+            names.append(name.strip())
+        return names
 
     def find_subgroup(self):
         if self.verbose:
@@ -156,75 +336,323 @@ class CCLGroup:
 
         grp_ind_spaces = ' ' * self.indentation_length
 
-        # is set to false if first line in group is not an attribute of this group (no line with "=")
-        grp_values_flag = True
+        # all options are at the top of a group: the first line without "=" starts a sub group.
+        # Split at the first "=" only, values may contain "=" (e.g. CEL "t<=1 [s]")
         for line in grp_lines:
             if line[0:self.indentation_length] == grp_ind_spaces:
-                if grp_values_flag:
-                    try:
-                        name, value = line.split('=')
-                        g.attrs[name.strip()] = value.strip()
-                    except:
-                        grp_values_flag = False
+                name, sep, value = line.partition('=')
+                if not sep:
+                    break
+                g.attrs[name.strip()] = value.strip()
 
         for name, subg in self.sub_groups.items():
             # logger.debug(name)
             subg.create_h5_group(g, overwrite=overwrite)
 
 
-# def cclupdate(func):
-#     def cclupdate_wrapper(*args, **kwargs):
-#         current_mtime = pathlib.Path(args[0].filename).stat().st_mtime
-#         if current_mtime > args[0].mtime:
-#             _new_args = list(args)
-#             _new_args[0] = CCLTextFile(args[0].filename, args[0].intendation_step)
-#             return func(*tuple(_new_args), **kwargs)
-#         return func(*args, **kwargs)
-#
-#     return cclupdate_wrapper
-
-
 def hdf_to_ccl(hdf_filename: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None,
                intendation_step: int = 2) -> pathlib.Path:
-    """converts a HDF file with CCL content into a CCL text file"""
+    """converts a HDF file with CCL content into a CCL text file
+
+    The HDF5 groups are walked iteratively in the order of `h5py.Group.items()` (hard linked
+    groups are written at every link) and the lines are streamed into a buffered file.
+    """
     hdf_filename = pathlib.Path(hdf_filename)
     if ccl_filename is None:
         ccl_filename = hdf_filename.parent.joinpath(f'{hdf_filename.stem}.ccl')
     else:
         ccl_filename = pathlib.Path(ccl_filename)
 
-    def _write_to_file(writer, h5obj):
-        ret_string = ''
-        nlevel = len(h5obj.name.split('/')) - 2
-        _spaces = ''.join([' '] * nlevel * intendation_step)
-        name_stem = pathlib.Path(h5obj.name).stem
-        if ':' in name_stem:
-            # ret_string += f'{_spaces}{name_stem.upper()}\n'
-            ret_string += f'{_spaces}{name_stem}\n'
+    indentations = []  # (group indentation, option indentation) per level
+
+    def _get_indentation(nlevel):
+        while len(indentations) <= nlevel:
+            _spaces = ' ' * (len(indentations) * intendation_step)
+            # options are indented by this (unusual) join. kept for unchanged output:
+            indentations.append((_spaces, _spaces.join([' '] * intendation_step)))
+        return indentations[nlevel]
+
+    with open(ccl_filename, 'w', buffering=HDF_TO_CCL_BUFFER_SIZE) as f:
+        with open_h5(hdf_filename) as h5:
+            # stack of (level, name, object). object None closes the group of the level:
+            stack = [(0, k, v) for k, v in reversed(list(h5.items()))]
+            while stack:
+                nlevel, name, h5obj = stack.pop()
+                _spaces, _option_spaces = _get_indentation(nlevel)
+                if h5obj is None:
+                    f.write(f'{_spaces}END\n')
+                    continue
+                basename = name.rsplit('/', 1)[-1]
+                if ':' in basename:
+                    lines = [f'{_spaces}{basename}\n']
+                else:
+                    lines = [f'{_spaces}{basename.upper()}:\n']
+                lines.extend(f'{_option_spaces}{_k} = {_v}\n' for _k, _v in h5obj.attrs.items())
+                f.writelines(lines)
+
+                stack.append((nlevel, name, None))
+                stack.extend((nlevel + 1, k, v) for k, v in reversed(list(h5obj.items())))
+
+    return ccl_filename
+
+
+HDF_TO_CCL_BUFFER_SIZE = 1024 * 1024
+
+INTENDATION_STEP = 2
+
+
+def _is_end_marker(token: str) -> bool:
+    """Whether a stripped CCL line closes a group, e.g. "END" or "END # FLOW: Flow Analysis 1" """
+    return token == 'END' or (token.startswith('END') and token[3:].lstrip().startswith('#'))
+
+
+def _tokenize_ccl(raw_lines: List[str]) -> Tuple[List[str], List[int]]:
+    """Joins lines continued with a trailing backslash and drops empty and comment lines
+    in a single pass.
+
+    Returns
+    -------
+    lines: List[str]
+        The logical CCL lines (indentation is kept)
+    line_numbers: List[int]
+        Index of the first raw line of every logical line
+    """
+    lines = []
+    line_numbers = []
+    continued = False
+    for iline, raw_line in enumerate(raw_lines):
+        _line = raw_line.rstrip('\n')
+        if continued:
+            _line = _line.strip()
+            continued = _line.endswith('\\')
+            lines[-1] += _line[:-1] if continued else _line
+            continue
+        if _line.strip() == '' or _line.lstrip()[0] == '#':
+            continue
+        continued = _line.endswith('\\')
+        lines.append(_line[:-1] if continued else _line)
+        line_numbers.append(iline)
+    return lines, line_numbers
+
+
+def parse_ccl_lines(lines: List[str], filename: PATHLIKE = None,
+                    intendation_step: int = INTENDATION_STEP,
+                    indentation: List[Tuple[int, int]] = None,
+                    verbose: bool = False) -> CCLGroup:
+    """Builds the CCL group tree from logical CCL lines (see `_tokenize_ccl`) in a single
+    pass using a stack of open groups. Every line is either an option ("name = value"),
+    a group header or an END marker, thus parsing is O(lines).
+
+    Returns
+    -------
+    CCLGroup
+        The root group named "root"
+    """
+    if indentation is None:
+        indentation = [(i, len(line) - len(line.lstrip(' '))) for i, line in enumerate(lines)]
+    root_indentation = indentation[0][1] if len(indentation) > 0 else 0
+    root = CCLGroup(filename, 0, -1, indentation_length=root_indentation,
+                    intendation_step=intendation_step, all_lines=lines,
+                    all_indentation=indentation, name='root', verbose=verbose, sub_groups={})
+    _parse_ccl_range(root, lines, 0, len(lines), indentation, filename, intendation_step, verbose)
+    return root
+
+
+def _parse_ccl_range(parent: CCLGroup, lines: List[str], start: int, stop: int,
+                     indentation: List[Tuple[int, int]], filename: PATHLIKE,
+                     intendation_step: int = INTENDATION_STEP, verbose: bool = False) -> None:
+    """Parses lines[start:stop] and adds the found groups to `parent`. Line numbers of the
+    created groups refer to `lines`."""
+    stack = [parent]
+    for iline in range(start, stop):
+        token = lines[iline].strip()
+        if _is_end_marker(token):
+            if len(stack) == 1:
+                logger.warning(f'Unexpected END in line {iline} of {filename}. Line is ignored.')
+                continue
+            stack.pop().end_line = iline
+        elif '=' not in token:
+            _parent = stack[-1]
+            grp = CCLGroup(filename, iline, -1,
+                           indentation_length=_parent.indentation_length + _parent.intendation_step,
+                           intendation_step=intendation_step, all_lines=lines,
+                           all_indentation=indentation, verbose=verbose, sub_groups={})
+            _parent.sub_groups[grp.name] = grp
+            stack.append(grp)
+    if len(stack) > 1:
+        logger.warning(f'{len(stack) - 1} group(s) not closed with END in {filename}, '
+                       f'e.g. "{stack[-1].name}"')
+
+
+def _common_prefix_length(a: List[str], b: List[str]) -> int:
+    """Number of equal leading items of two lists (bisection using C-level slice comparison)"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_length(a: List[str], b: List[str], max_length: int) -> int:
+    """Number of equal trailing items of two lists but at most `max_length`"""
+    na, nb = len(a), len(b)
+    lo, hi = 0, max_length
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[na - mid:na - lo] == b[nb - mid:nb - lo]:
+            lo = mid
         else:
-            ret_string += f'{_spaces}{name_stem.upper()}:\n'
+            hi = mid - 1
+    return lo
 
-        for _k, _v in h5obj.attrs.items():
-            # ret_string += _spaces.join([' '] * intendation_step) + f'{capitalize_phrase(_k)} = {capitalize_phrase(_v)}\n'
-            ret_string += _spaces.join([' '] * intendation_step) + f'{_k} = {_v}\n'
 
-        writer.write(ret_string)
+class _UnbalancedCCLError(ValueError):
+    """A group body contains unclosed groups or too many END markers"""
 
-        for _v in h5obj.values():
-            _write_to_file(writer, _v)
 
-        ret_string = f'{_spaces}END\n'
-        writer.write(ret_string)
+def _line_range_hash(lines: List[str], start: int, stop: int) -> bytes:
+    """Hash of lines[start:stop]"""
+    return hashlib.blake2b('\n'.join(lines[start:stop]).encode(), digest_size=16).digest()
 
-    with open(ccl_filename, 'w') as f:
-        with h5py.File(hdf_filename) as h5:
-            for k, v in h5.items():
-                _write_to_file(f, v)
 
-    return ccl_filename
+def _child_spans(lines: List[str], start: int, stop: int) -> Tuple[List[Tuple[str, int, int]], bool]:
+    """Returns name, header line and END line of the direct sub groups found in lines[start:stop]
+    and whether all groups in the range are closed (and no END is left over)"""
+    spans = []
+    depth = 0
+    balanced = True
+    for iline in range(start, stop):
+        token = lines[iline].strip()
+        if _is_end_marker(token):
+            if depth == 0:
+                balanced = False
+                continue
+            depth -= 1
+            if depth == 0:
+                spans[-1][2] = iline
+        elif '=' not in token:
+            if depth == 0:
+                spans.append([token[:-1] if token.endswith(':') else token, iline, stop])
+            depth += 1
+    return [tuple(span) for span in spans], balanced and depth == 0
 
 
-INTENDATION_STEP = 2
+def _shift_lines(grp: CCLGroup, offset: int) -> None:
+    """Shifts the line numbers of a group and all its sub groups"""
+    stack = [grp]
+    while stack:
+        _grp = stack.pop()
+        _grp.grp_line += offset
+        _grp.end_line += offset
+        stack.extend(_grp.sub_groups.values())
+
+
+def cclupdate(func):
+    """Decorator for `CCLTextFile` methods: Updates the parsed tree if the file has
+    changed on disk before calling the method"""
+
+    @functools.wraps(func)
+    def cclupdate_wrapper(self, *args, **kwargs):
+        self.update()
+        return func(self, *args, **kwargs)
+
+    return cclupdate_wrapper
+
+
+class CCLIndex:
+    """Lookup tables over a parsed CCL tree, built in one walk over all groups.
+
+    Groups are addressed by their full path, which are the group names joined by "/", e.g.
+    "FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL". Exact lookups by path, group
+    type and option name are dictionary lookups. `find()` and `find_options()` accept glob
+    patterns (note, that "*" also matches "/") or regular expressions, which must match the
+    full path. Groups are returned in file order.
+
+    Works with `CCLGroup` and `CCLNode` trees.
+
+    Example
+    -------
+    index = CCLTextFile('mycase.ccl').index
+    index['FLOW: Flow Analysis 1/SOLVER CONTROL']
+    index.of_type('BOUNDARY')
+    index.find('FLOW: */DOMAIN: */BOUNDARY: *')
+    index.find_options('Maximum Number of Iterations')
+    """
+
+    def __init__(self, root_group):
+        self.root_group = root_group
+        self.paths = {}  # path -> group
+        self.types = {}  # group type -> [group, ...]
+        self.options = {}  # option name -> [path, ...]
+        stack = [('', root_group)]
+        while stack:
+            path, grp = stack.pop()
+            self.paths[path] = grp
+            if grp.group_type is not None and grp is not root_group:
+                self.types.setdefault(grp.group_type, []).append(grp)
+            for name in grp.option_names():
+                self.options.setdefault(name, []).append(path)
+            prefix = f'{path}/' if path else ''
+            stack.extend((f'{prefix}{name}', sub_grp)
+                         for name, sub_grp in reversed(list(grp.sub_groups.items())))
+
+    def __repr__(self):
+        return f'<CCLIndex ({len(self.paths)} groups, {len(self.types)} group types, ' \
+               f'{len(self.options)} option names)>'
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths
+
+    def __getitem__(self, path: str):
+        try:
+            return self.paths[path]
+        except KeyError:
+            raise KeyError(f'No group with path "{path}"') from None
+
+    def get(self, path: str, default=None):
+        """Return the group with the given full path or `default`"""
+        return self.paths.get(path, default)
+
+    def of_type(self, group_type: str) -> List:
+        """All groups of a type, e.g. "BOUNDARY" or "DOMAIN"."""
+        return list(self.types.get(group_type, ()))
+
+    def with_option(self, name: str) -> Dict:
+        """Groups which have the option `name`: {path: group}"""
+        return {path: self.paths[path] for path in self.options.get(name, ())}
+
+    def find(self, pattern: str, regex: bool = False) -> Dict:
+        """Groups whose full path matches the glob pattern (or regular expression): {path: group}"""
+        match = _compile_pattern(pattern, regex)
+        return {path: grp for path, grp in self.paths.items() if match(path)}
+
+    def find_options(self, name_pattern: str, path_pattern: str = None, regex: bool = False) -> Dict:
+        """Options whose name matches `name_pattern` in groups whose path matches
+        `path_pattern` (all groups if None): {"<group path>/<option name>": CCLDataField}"""
+        match_name = _compile_pattern(name_pattern, regex)
+        match_path = None if path_pattern is None else _compile_pattern(path_pattern, regex)
+        fields = {}
+        for name, paths in self.options.items():
+            if not match_name(name):
+                continue
+            for path in paths:
+                if match_path is None or match_path(path):
+                    fields[f'{path}/{name}' if path else name] = self.paths[path].data[name]
+        return fields
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_pattern(pattern: str, regex: bool):
+    """Return a function matching a full string against a glob pattern or regular expression"""
+    if regex:
+        return re.compile(pattern).fullmatch
+    return re.compile(fnmatch.translate(pattern)).match
 
 
 class CCLTextFile:
@@ -242,19 +670,207 @@ class CCLTextFile:
         self.lines = self._remove_linebreaks()
         self.indentation = self._get_indentation()
         self.intendation_step = INTENDATION_STEP
-        self.root_group = CCLGroup(self.filename, 0, -1, indentation_length=self.indentation[0][1],
-                                   intendation_step=self.intendation_step,
-                                   all_lines=self.lines,
-                                   all_indentation=self.indentation, name='root', verbose=verbose)
-        self.mtime = self.filename.stat().st_mtime
+        self.verbose = verbose
+        self.root_group = parse_ccl_lines(self.lines, self.filename,
+                                          intendation_step=self.intendation_step,
+                                          indentation=self.indentation, verbose=verbose)
+        st = self.filename.stat()
+        self.mtime = st.st_mtime
+        self.size = st.st_size
+        self._index = None
+
+    @staticmethod
+    def lazy(filename: PATHLIKE, verbose: bool = False):
+        """Opens a large file memory-mapped and parses its groups on first access instead
+        of reading the whole file (see `ccllazy.LazyCCLTextFile`)"""
+        from .ccllazy import LazyCCLTextFile
+        return LazyCCLTextFile(filename, verbose=verbose)
 
-    def get_flow_group(self):
-        for grp in self.root_group.sub_groups.values():
-            if grp.group_type == 'FLOW':
-                return grp
+    @property
+    def index(self) -> CCLIndex:
+        """Path, group type and option name index of the parsed tree. It is built on first
+        use. Lookups do not check the file for changes: call `update()` after the file
+        was changed by other means than `edit()`, which rebuilds the index."""
+        if self._index is None:
+            self._index = CCLIndex(self.root_group)
+        return self._index
+
+    @property
+    def is_outdated(self) -> bool:
+        """Whether the file has changed on disk since it was parsed"""
+        st = self.filename.stat()
+        return st.st_mtime != self.mtime or st.st_size != self.size
+
+    def update(self) -> bool:
+        """Re-parses the file if it has changed on disk (size or modification time).
+
+        Only the changed part of the file is tokenized again. The deepest group enclosing
+        the change is re-parsed: its sub groups are compared by the hash of their line range
+        and only changed or new ones are parsed again and spliced into the existing tree.
+        Line numbers of the groups behind the change are shifted.
+
+        Returns
+        -------
+        bool
+            Whether the file had changed
+        """
+        if not self.is_outdated:
+            return False
+        logger.debug(f'{self.filename} has changed. Updating the parsed CCL tree.')
+        self._index = None
+        with open(self.filename, 'r') as f:
+            new_raw_lines = f.readlines()
+        old_raw_lines = self._raw_lines
+        st = self.filename.stat()
+        self.mtime = st.st_mtime
+        self.size = st.st_size
+        self._raw_lines = new_raw_lines
+        if len(self.lines) == 0:
+            self.lines[:] = self._remove_linebreaks(new_raw_lines)
+            self.indentation[:] = self._get_indentation()
+            self._reparse()
+            return True
+
+        # changed raw lines: old_raw_lines[prefix:-suffix] -> new_raw_lines[prefix:-suffix]
+        prefix = _common_prefix_length(old_raw_lines, new_raw_lines)
+        suffix = _common_suffix_length(old_raw_lines, new_raw_lines,
+                                       min(len(old_raw_lines), len(new_raw_lines)) - prefix)
+        raw_delta = len(new_raw_lines) - len(old_raw_lines)
+
+        # changed logical lines: self.lines[start:stop]
+        start = bisect.bisect_right(self.line_numbers, prefix) - 1
+        if start < 0:
+            start, raw_start = 0, 0
+        else:
+            raw_start = self.line_numbers[start]
+        stop = bisect.bisect_left(self.line_numbers, len(old_raw_lines) - suffix)
+        while True:
+            raw_stop = self.line_numbers[stop] if stop < len(self.lines) else len(old_raw_lines)
+            if stop == len(self.lines) or raw_stop + raw_delta <= raw_start or \
+                    not new_raw_lines[raw_stop + raw_delta - 1].rstrip('\n').endswith('\\'):
+                break
+            stop += 1  # the changed region now continues into the next logical line
+        new_lines, new_line_numbers = _tokenize_ccl(new_raw_lines[raw_start:raw_stop + raw_delta])
+
+        old_lines = self.lines[:]
+        delta = len(new_lines) - (stop - start)
+        self.lines[start:stop] = new_lines
+        self.line_numbers[start:stop] = [raw_start + n for n in new_line_numbers]
+        if raw_delta != 0:
+            _stop = start + len(new_lines)
+            self.line_numbers[_stop:] = [n + raw_delta for n in self.line_numbers[_stop:]]
+        if delta == 0:
+            self.indentation[start:stop] = [(i, len(line) - len(line.strip(' ')))
+                                            for i, line in enumerate(new_lines, start)]
+        else:
+            self.indentation[start:] = [(i, len(line) - len(line.strip(' ')))
+                                        for i, line in enumerate(self.lines[start:], start)]
+        if old_lines[start:stop] == new_lines:
+            return True  # only empty lines or comments have changed
+        if len(self.lines) == 0 or self.indentation[0][1] != self.root_group.indentation_length:
+            self._reparse()
+            return True
+
+        path = self._group_path(start, stop)
+        for grp, child in zip(path[:-1], path[1:]):
+            grp.line_hash = None
+            grp.end_line += delta
+            if delta != 0:
+                for sub_grp in grp.sub_groups.values():
+                    if sub_grp.grp_line > child.grp_line:
+                        _shift_lines(sub_grp, delta)
+        grp = path[-1]
+        grp.line_hash = None
+        try:
+            if grp is self.root_group:
+                grp.end_line = len(self.lines)
+                self._reconcile_children(grp, old_lines, 0, len(self.lines))
+            else:
+                grp.end_line += delta
+                self._reconcile_children(grp, old_lines, grp.grp_line + 1, grp.end_line)
+        except _UnbalancedCCLError:
+            # groups are not closed properly. the change affects the whole tree:
+            logger.debug(f'Unbalanced group in changed lines of {self.filename}. Parsing the full file.')
+            self._reparse()
+        return True
+
+    def diff(self, other) -> CCLDiff:
+        """Structural diff of `other` (e.g. a `CCLTextFile` or `CCLFile`) compared to this file.
+        Use `ccldiff.CCLDiffer` to compare many files against this one."""
+        return ccl_diff(self, other)
+
+    def overlay(self) -> CCLOverlayBase:
+        """Returns the base for copy-on-write variants of this file (see `ccloverlay`)"""
+        return CCLOverlayBase.from_text_file(self)
+
+    def edit(self, backup: bool = True) -> CCLEditSession:
+        """Returns an edit session which writes multiple value changes at once:
+
+        with ccl.edit() as tx:
+            tx.set(grp.data['Option'], 'Total Time')
+            tx.set(grp.data['Total Time'], '1 [s]')
+        """
+        return CCLEditSession(self, backup=backup)
+
+    def _group_path(self, start: int, stop: int) -> List[CCLGroup]:
+        """Returns the groups from the root group to the deepest group with header before
+        and END behind the lines [start, stop)"""
+        path = [self.root_group]
+        while True:
+            for sub_grp in path[-1].sub_groups.values():
+                if sub_grp.grp_line < start and sub_grp.end_line >= stop:
+                    path.append(sub_grp)
+                    break
+            else:
+                return path
+
+    def _reparse(self) -> None:
+        """Parses all lines again"""
+        self.root_group = parse_ccl_lines(self.lines, self.filename,
+                                          intendation_step=self.intendation_step,
+                                          indentation=self.indentation, verbose=self.verbose)
+
+    def _reconcile_children(self, grp: CCLGroup, old_lines: List[str], start: int, stop: int) -> None:
+        """Updates the sub groups of `grp` whose body is now found in self.lines[start:stop]"""
+        spans, balanced = _child_spans(self.lines, start, stop)
+        if not balanced and grp is not self.root_group:
+            raise _UnbalancedCCLError(grp.name)
+        old_sub_groups = grp.sub_groups
+        grp.sub_groups = {}
+        for name, new_start, new_end in spans:
+            sub_grp = old_sub_groups.pop(name, None)
+            if sub_grp is None:
+                sub_grp = CCLGroup(self.filename, new_start, -1,
+                                   indentation_length=grp.indentation_length + grp.intendation_step,
+                                   intendation_step=self.intendation_step, all_lines=self.lines,
+                                   all_indentation=self.indentation, verbose=self.verbose, sub_groups={})
+                sub_grp.end_line = new_end
+                _parse_ccl_range(sub_grp, self.lines, new_start + 1, new_end, self.indentation,
+                                 self.filename, self.intendation_step, self.verbose)
+            else:
+                new_hash = _line_range_hash(self.lines, new_start, new_end + 1)
+                if sub_grp.line_hash is None:
+                    sub_grp.line_hash = _line_range_hash(old_lines, sub_grp.grp_line, sub_grp.end_line + 1)
+                if sub_grp.line_hash == new_hash:
+                    if new_start != sub_grp.grp_line:
+                        _shift_lines(sub_grp, new_start - sub_grp.grp_line)
+                else:
+                    self._reconcile_children(sub_grp, old_lines, new_start + 1, new_end)
+                    sub_grp.grp_line, sub_grp.end_line = new_start, new_end
+                sub_grp.line_hash = new_hash
+            grp.sub_groups[name] = sub_grp
 
-    def to_hdf(self, hdf_filename: Union[PATHLIKE, None] = None, overwrite=True) -> pathlib.Path:
-        """Write ccl content to HDF5"""
+    def get_flow_group(self):
+        flow_groups = self.index.of_type('FLOW')
+        if flow_groups:
+            return flow_groups[0]
+
+    @cclupdate
+    def to_hdf(self, hdf_filename: Union[PATHLIKE, None] = None, overwrite=True,
+               layout: str = 'attributes') -> pathlib.Path:
+        """Write ccl content to HDF5. The default layout writes one HDF5 group per CCL group
+        and one attribute per option (used by `CCLFile`). `layout="columnar"` writes the whole
+        tree into a few datasets (see `CCLColumns`)"""
         if hdf_filename is None:
             hdf_filename = change_suffix(self.filename, CCLFile.SUFFIX)
         else:
@@ -263,38 +879,23 @@ class CCLTextFile:
         if hdf_filename.is_file() and not overwrite:
             raise FileExistsError(f'Target HDF file exists and overwrite is set to False!')
 
+        if layout == COLUMNAR_LAYOUT:
+            return CCLColumns.from_group(self.root_group).to_hdf(hdf_filename)
+        if layout != 'attributes':
+            raise ValueError(f'Unknown layout "{layout}". Must be "attributes" or "{COLUMNAR_LAYOUT}"')
+
         with h5py.File(hdf_filename, 'w') as h5:
             self.root_group.create_h5_group(h5['/'], root_group=True, overwrite=True)
 
         return hdf_filename
 
-    def _remove_linebreaks(self):
-        with open(self.filename, 'r') as f:
-            lines = f.readlines()
-        single_lines = []
-
-        append_line = False
-        for line in lines:
-            _line = line.strip('\n')
-            if _line != '':
-                if _line[0] != '#':
-                    if append_line:
-                        if _line[-1] == '\\':
-                            single_lines[-1] += _line[:-1]
-                        else:
-                            append_line = False
-                            single_lines[-1] += _line.strip()
-                    else:
-                        if _line[-1] == '\\':
-                            if append_line:
-                                single_lines[-1] += _line[:-1]
-                            else:
-                                single_lines.append(_line[:-1])
-                            append_line = True
-                        else:
-                            append_line = False
-                            single_lines.append(_line)
-        return single_lines
+    def _remove_linebreaks(self, raw_lines: List[str] = None):
+        if raw_lines is None:
+            with open(self.filename, 'r') as f:
+                raw_lines = f.readlines()
+        self._raw_lines = raw_lines
+        lines, self.line_numbers = _tokenize_ccl(raw_lines)
+        return lines
 
     def _get_indentation(self):
         indentation = []
@@ -305,9 +906,23 @@ class CCLTextFile:
         return indentation
 
 
+def _seconds(text: str) -> Union[float, str]:
+    """Time option value in seconds, e.g. "2 [min]" -> 120.0. Expressions are returned as
+    they are."""
+    value = parse_value(text)
+    if not isinstance(value, CCLValue):
+        return value
+    if value.unit is None:
+        return float(value)
+    quantity = CELQuantity.from_unit(float(value), value.unit.text)
+    if quantity.dims != parse_unit('s')[1]:
+        raise CELUnitError(f'Expected a time but got "{text}"')
+    return quantity.value
+
+
 def _list_of_instances_by_keyword_substring(filename, root_group, substring, cls):
     instances = []
-    with h5py.File(filename) as h5:
+    with open_h5(filename) as h5:
         for k in h5[root_group].keys():
             if substring in k:
                 if root_group == '/':
@@ -324,14 +939,14 @@ class CCLHDFAttributeWrapper:
     values: dict
 
     def __delitem__(self, key):
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if key in h5[self.path].attrs:
                 del h5[self.path].attrs[key]
             else:
                 logger.info(f'Note, that the requested key {key} does not exist and thus could not be deleted.')
 
     def __setitem__(self, key, value):
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             # if key not in h5[self.path].attrs.keys():
             if key not in h5[self.path].attrs:
                 raise AttributeError(f'HDF5 attribute {key} not in {self.path}')
@@ -359,27 +974,37 @@ class CCLHDFGroup:
 
     @property
     def options(self):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             attr_dict = dict(h5[self.path].attrs.items())
             return CCLHDFAttributeWrapper(self.filename, self.path, attr_dict)
 
+    @property
+    def typed_options(self) -> Dict[str, Union[CCLValue, str]]:
+        """Attributes of the group parsed by `cclvalue.parse_value()`"""
+        with open_h5(self.filename) as h5:
+            return {k: parse_value(v) for k, v in h5[self.path].attrs.items()}
+
     def __repr__(self):
         return f'CCLHDFGroup {self.path} of file {self.filename}'
 
+    def session(self, mode: str = 'r') -> HDFSession:
+        """Keeps the file open for all wrapper objects of the file while the session is active"""
+        return HDFSession(self.filename, mode)
+
     def __str__(self):
         return self.__repr__()
 
     def _repr_html_(self):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             return h5file_html_repr(h5[self.path], 50, collapsed=False)
 
     def dump(self):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             display(HTML((h5file_html_repr(h5[self.path], 50))))
 
     def __getattr__(self, item):
         _item = item.replace('_', ' ')
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             if _item in h5[self.path]:
                 return CCLHDFGroup(f'{self.path}/{_item.upper()}', self.filename)
             else:
@@ -388,14 +1013,14 @@ class CCLHDFGroup:
         raise KeyError(f'{item} not found in {self.path}')
 
     def __getitem__(self, item):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             if item in h5[self.path]:
                 return CCLHDFGroup(f'{self.path}/{item}', self.filename)
             else:
                 raise KeyError(f'{item} not found in {self.path}')
 
     def keys(self) -> List[str]:
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             keys = list(h5[self.path].keys())
         return keys
 
@@ -416,7 +1041,7 @@ class CCLHDFGroup:
         """renames hdf group. call h5py.move()"""
         if self.path == '/':
             raise KeyError(f'Cannot rename roote group!')
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             parent_path = self.get_parent_path()
             if new_name[0] == '/':
                 new_name = new_name[1:]
@@ -437,12 +1062,12 @@ class CCLHDFBoundary(CCLHDFGroup):
     @property
     def name(self):
         """Returns boundary name defined by user"""
-        return pathlib.Path(self.path).stem.split(':', 1)[1]
+        return self.path.rsplit('/', 1)[-1].split(':', 1)[1].strip()
 
     @property
     def type(self):
         """Returns boundary type, e.g. INLET"""
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             return h5[self.path].attrs['Boundary Type']
 
     @property
@@ -474,7 +1099,7 @@ class CCLHDFMonitorObject(CCLHDFGroup):
             value = MonitorObject(**value)
 
         mp_name = f'MONITOR POINT: {key}'
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if mp_name not in h5[self.path]:
                 h5[self.path].create_group(mp_name)
             h5[self.path][mp_name].attrs['Option'] = 'Expression'
@@ -483,7 +1108,7 @@ class CCLHDFMonitorObject(CCLHDFGroup):
 
     def __delitem__(self, monitor_object_name: str):
         mp_name = f'MONITOR POINT: {monitor_object_name}'
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if mp_name in h5[self.path]:
                 del h5[self.path][mp_name]
             else:
@@ -495,7 +1120,7 @@ class CCLHDFDomainGroup(CCLHDFGroup):
 
     @property
     def name(self):
-        return pathlib.Path(self.path).stem.split(':', 1)[1]
+        return self.path.rsplit('/', 1)[-1].split(':', 1)[1].strip()
 
     @property
     def boundaries(self):
@@ -547,7 +1172,7 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def output_control(self):
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             root = h5[self.path]
             if 'OUTPUT CONTROL' not in root:
                 output_control_grp = root.create_group('OUTPUT CONTROL')
@@ -592,8 +1217,8 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def min_iterations(self):
-        with h5py.File(self.filename, 'r') as h5:
-            if 'Minimum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL']:
+        with open_h5(self.filename) as h5:
+            if 'Minimum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs:
                 return int(h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Minimum Number of Iterations'])
             else:
                 return h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Minimum Number of Coefficient Loops']
@@ -601,8 +1226,8 @@ class CCLHDFFlowGroup(CCLHDFGroup):
     @min_iterations.setter
     def min_iterations(self, min_iter):
         """Sets the maximum iterations for steady state or the max iterations per time step of a transient run"""
-        with h5py.File(self.filename, 'r+') as h5:
-            if 'Minimum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL']:
+        with open_h5(self.filename, 'r+') as h5:
+            if 'Minimum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs:
                 h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Minimum Number of Iterations'] = int(
                     min_iter)
             else:
@@ -611,16 +1236,16 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def max_iterations(self):
-        with h5py.File(self.filename, 'r') as h5:
-            if 'Minimum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL']:
+        with open_h5(self.filename) as h5:
+            if 'Maximum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs:
                 return int(h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Maximum Number of Iterations'])
             else:
                 return h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Maximum Number of Coefficient Loops']
 
     @max_iterations.setter
     def max_iterations(self, max_iter):
-        with h5py.File(self.filename, 'r+') as h5:
-            if 'Maximum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL']:
+        with open_h5(self.filename, 'r+') as h5:
+            if 'Maximum Number of Iterations' in h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs:
                 h5[self.path]['SOLVER CONTROL/CONVERGENCE CONTROL'].attrs['Maximum Number of Iterations'] = int(
                     max_iter)
             else:
@@ -629,42 +1254,42 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def time_steps(self):
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             if 'TIME STEPS' in h5[self.path]['ANALYSIS TYPE']:
-                return int(h5[self.path]['ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'].split(' [')[0])
+                return _seconds(h5[self.path]['ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'])
             else:
                 raise AttributeError(f'This is a steady state run!')
 
     @time_steps.setter
     def time_steps(self, time_step):
         """time step in seconds"""
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if 'TIME STEPS' in h5[self.path]['ANALYSIS TYPE']:
-                h5[self.path]['ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'] = f'{int(time_step)} [s]'
+                h5[self.path]['ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'] = format_value(time_step, 's')
             else:
                 raise AttributeError(f'This is a steady state run!')
 
     @property
     def total_time(self):
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
-                return int(h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'].split(' [')[0])
+                return _seconds(h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'])
             else:
                 raise AttributeError(f'This is a steady state run!')
 
     @total_time.setter
     def total_time(self, time_step):
         """time step in seconds"""
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
-                h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'] = f'{int(time_step)} [s]'
+                h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'] = format_value(time_step, 's')
                 h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Option'] = 'Total Time'
             else:
                 raise AttributeError(f'This is a steady state run!')
 
     @property
     def max_number_of_timesteps(self) -> int:
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
                 return int(h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Maximum Number of Timesteps'])
             else:
@@ -673,7 +1298,7 @@ class CCLHDFFlowGroup(CCLHDFGroup):
     @max_number_of_timesteps.setter
     def max_number_of_timesteps(self, time_step):
         """max number of timesteps"""
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
                 h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Maximum Number of Timesteps'] = f'{int(time_step)}'
                 h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Option'] = 'Maximum Number of Timesteps'
@@ -682,9 +1307,9 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def time_duration(self):
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
-                return int(h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'].split(' [')[0])
+                return _seconds(h5[self.path]['ANALYSIS TYPE/TIME DURATION'].attrs['Total Time'])
             else:
                 raise AttributeError(f'This is a steady state run!')
 
@@ -707,18 +1332,18 @@ class CCLHDFFlowGroup(CCLHDFGroup):
 
     @property
     def initial_time(self):
-        with h5py.File(self.filename, 'r') as h5:
+        with open_h5(self.filename) as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
-                return int(h5[self.path]['ANALYSIS TYPE/INITIAL TIME'].attrs['Time'].split(' [')[0])
+                return _seconds(h5[self.path]['ANALYSIS TYPE/INITIAL TIME'].attrs['Time'])
             else:
                 raise AttributeError(f'This is a steady state run!')
 
     @initial_time.setter
     def initial_time(self, time_step):
         """time step in seconds"""
-        with h5py.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+') as h5:
             if 'TIME DURATION' in h5[self.path]['ANALYSIS TYPE']:
-                h5[self.path]['ANALYSIS TYPE/INITIAL TIME'].attrs['Time'] = f'{int(time_step)} [s]'
+                h5[self.path]['ANALYSIS TYPE/INITIAL TIME'].attrs['Time'] = format_value(time_step, 's')
             else:
                 raise AttributeError(f'This is a steady state run!')
 
@@ -734,15 +1359,32 @@ class CCLFile:
     """Interface class to the HDF file containing CCL data"""
 
     SUFFIX = '.ccl_hdf'
+    _locator = None
 
-    def __init__(self, filename: PATHLIKE, aux_dir: PATHLIKE = None, take_existing: bool = True):
+    def __init__(self, filename: PATHLIKE, aux_dir: PATHLIKE = None, take_existing: bool = True,
+                 cache: bool = True):
         """
         Note: if the cfx file is younger than the ccl file, the ccl file will be rewritten
         from the cfx file! All data in the existing ccl hdf file will be overwritten.
+
+        For .res, .def and .cfx files, the CCL text generated by cfx5cmds is cached by the
+        content hash of the file (see `cache.cached_file()`). An existing ccl hdf file is
+        taken if `take_existing` and the file was generated from the same content.
+        `cache=False` always calls `generate()`.
+
+        `filename` may also be an `H5GroupRef` to a group holding a CCL tree, e.g. a case of
+        a `CCLStudy` (see `CCLStudy.__getitem__()`).
         """
         # logger.debug('reading ccl')
+        if isinstance(filename, H5GroupRef):
+            self.filename = filename
+            self.aux_dir = filename.parent
+            return
         filename = pathlib.Path(filename)
         if filename.suffix == self.SUFFIX:
+            if is_columnar(filename):
+                raise ValueError(f'{filename} uses the columnar layout. Convert it with '
+                                 f'CCLFile.from_columnar() first.')
             self.filename = filename
             self.aux_dir = filename.parent
         elif filename.suffix == '.ccl':
@@ -758,17 +1400,45 @@ class CCLFile:
                 self.aux_dir = aux_dir
                 _ccl_fname = _ccl_fname.parent.joinpath(self.aux_dir).joinpath(_ccl_fname.name)
             _hdf_fname = change_suffix(_ccl_fname, self.SUFFIX)
-            if _hdf_fname.exists() and take_existing:
-                logger.info('Found existing ccl.hdf-file. In case the cfx file has changed in the meantime, '
-                            'changes are likely to be lost. You may regenerate the ccl.hdf-file ')
-                self.filename = _hdf_fname
-            self.filename = CCLTextFile(generate(filename, ccl_filename=_ccl_fname)).to_hdf(_hdf_fname)
+            if not cache:
+                self.filename = CCLTextFile(generate(filename, ccl_filename=_ccl_fname)).to_hdf(_hdf_fname)
+            else:
+                if aux_dir is None:
+                    cache_dir = default_cache_dir(filename)
+                else:
+                    cache_dir = _ccl_fname.parent.joinpath(CCL_CACHE_DIRNAME)
+                self.filename = self._from_cache(filename, _ccl_fname, _hdf_fname, cache_dir, take_existing)
 
         else:
             raise ValueError(f'Unexpected suffix: {filename.suffix}. Must be .hdf, .ccl, .def or .cfx!')
 
+    @staticmethod
+    def _from_cache(filename: pathlib.Path, ccl_filename: pathlib.Path, hdf_filename: pathlib.Path,
+                    cache_dir: pathlib.Path, take_existing: bool) -> pathlib.Path:
+        """Returns the ccl hdf file of the case file `filename`. cfx5cmds is only called if
+        no CCL text is cached for the content of `filename`."""
+        digest = file_digest(filename, cache_dir)
+        if hdf_filename.exists() and take_existing:
+            source_digest = recorded_source(hdf_filename, cache_dir)
+            if source_digest == digest:
+                logger.debug(f'Taking existing {hdf_filename}. {filename.name} has not changed.')
+                return hdf_filename
+            if source_digest is None and hdf_filename.stat().st_mtime >= filename.stat().st_mtime:
+                logger.info('Found existing ccl.hdf-file. In case the cfx file has changed in the meantime, '
+                            'changes are likely to be lost. You may regenerate the ccl.hdf-file ')
+                return hdf_filename
+            logger.info(f'{filename.name} has changed since {hdf_filename.name} was generated. Regenerating it.')
+
+        cached_ccl = cached_file(filename, '.ccl',
+                                 lambda src, dst: generate(src, ccl_filename=dst), cache_dir)
+        ccl_filename.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached_ccl, ccl_filename)
+        hdf_filename = CCLTextFile(ccl_filename).to_hdf(hdf_filename)
+        record_source(hdf_filename, digest, cache_dir)
+        return hdf_filename
+
     def __getitem__(self, item):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             if item not in h5:
                 return KeyError(f'Key not found in {h5.name}')
         return CCLHDFGroup(item, self.filename)
@@ -776,22 +1446,83 @@ class CCLFile:
     def __repr__(self):
         return f'CCLFile {self.filename}'
 
+    def session(self, mode: str = 'r') -> HDFSession:
+        """Keeps the file open while the session is active. All wrapper objects (`CCLHDFGroup`,
+        `CCLHDFFlowGroup`, ...) of the file use this handle and writes are flushed at the end:
+
+        with ccl.session('r+'):
+            flow = ccl.flow[0]
+            flow.max_iterations = 100
+            flow.min_iterations = 10
+        """
+        return HDFSession(self.filename, mode)
+
     def __str__(self):
         return f'CCLFile {self.filename}'
 
     def dump(self):
         """dumps the content in pretty html style (only in notebooks)"""
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             display(HTML((h5file_html_repr(h5['/'], 50))))
 
     def _repr_html_(self):
-        with h5py.File(self.filename) as h5:
+        with open_h5(self.filename) as h5:
             return h5file_html_repr(h5['/'], 50)
 
+    @property
+    def locator(self) -> CCLLocator:
+        """Paths of the groups by type and name. Built on first access and again when the
+        file has changed on disk."""
+        if self._locator is None:
+            self._locator = CCLLocator(self.filename)
+        return self._locator
+
+    @contextlib.contextmanager
+    def _edit_groups(self):
+        """Opens the file for writing and yields the file and the locator. Groups created or
+        deleted must be registered with `locator.rescan()`. Afterwards, the locator is marked
+        as up to date with the written file instead of walking the file again."""
+        locator = self.locator
+        locator.update()
+        try:
+            with open_h5(self.filename, 'r+', h5tbx.File) as h5:
+                yield h5, locator
+        except BaseException:
+            self._locator = None
+            raise
+        locator.stamp()
+
     @property
     def cel(self) -> CCLHDFCELGroup:
-        with h5tbx.File(self.filename) as h5:
-            return CCLHDFGroup(self.filename, h5.find_one({'$name': '/LIBRARY/CEL'}, '$group').name)
+        return CCLHDFCELGroup(self.locator.get('CEL', within='LIBRARY'), self.filename)
+
+    def domains(self, name: str = None, flow: str = None) -> List[CCLHDFDomainGroup]:
+        """Domains of all flows (or of the flow named `flow`). `name` may be a glob pattern."""
+        within = None if flow is None else self.locator.get('FLOW', flow)
+        return [CCLHDFDomainGroup(path, self.filename) for path in self.locator.find('DOMAIN', name, within)]
+
+    def boundaries(self, name: str = None, boundary_type: str = None, flow: str = None) -> List[CCLHDFBoundary]:
+        """Boundaries of all flows (or of the flow named `flow`). `name` may be a glob
+        pattern, `boundary_type` is e.g. "INLET"."""
+        within = None if flow is None else self.locator.get('FLOW', flow)
+        return [CCLHDFBoundary(path, self.filename)
+                for path in self.locator.find('BOUNDARY', name, within, boundary_type)]
+
+    def _inlet_paths(self, boundary: Union[str, Iterable[str], None], flow: Union[str, None]) -> List[str]:
+        """Paths of the boundaries selected by name(s) or glob pattern. Without a name, the
+        file (or the flow) must have exactly one inlet."""
+        within = None if flow is None else self.locator.get('FLOW', flow)
+        if boundary is None:
+            paths = self.locator.find('BOUNDARY', within=within, boundary_type='INLET')
+            if len(paths) != 1:
+                raise ValueError(f'Found {len(paths)} inlets in {self.filename}. Select the boundaries by '
+                                 f'name, list of names or glob pattern (parameter "boundary") and/or "flow".')
+            return paths
+        names = [boundary] if isinstance(boundary, str) else list(boundary)
+        paths = [path for name in names for path in self.locator.find('BOUNDARY', name, within)]
+        if not paths:
+            raise KeyError(f'No boundary "{boundary}" in {self.filename}')
+        return paths
 
     @property
     def flow(self) -> List[CCLHDFFlowGroup]:
@@ -809,21 +1540,68 @@ class CCLFile:
         """Returns a the group 'LIBRARY/CEL/EXPRESSIONS'"""
         return CCLHDFGroup('LIBRARY/CEL/EXPRESSIONS', self.filename)
 
+    def diff(self, other) -> CCLDiff:
+        """Structural diff of `other` (e.g. a `CCLTextFile` or `CCLFile`) compared to this file.
+        Use `ccldiff.CCLDiffer` to compare many files against this one."""
+        return ccl_diff(self, other)
+
+    def snapshot(self) -> CCLSnapshot:
+        """Loads the whole file into an immutable, picklable in-memory tree with the same
+        navigation API as `CCLHDFGroup`. Use it to read many values."""
+        with open_h5(self.filename) as h5:
+            return CCLSnapshot.from_hdf(h5['/'])
+
+    def overlay(self) -> CCLOverlayBase:
+        """Returns the base for copy-on-write variants of this file (see `ccloverlay`).
+        The CCL text is generated and parsed once. Variants are patches over it, which are
+        written with `CCLOverlay.to_ccl()` without copying this file:
+
+        base = ccl.overlay()
+        base.variant({'LIBRARY/CEL/EXPRESSIONS/Um': '2 [m/s]'}).to_ccl('variant.ccl')
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ccl_filename = self.to_ccl(pathlib.Path(tmpdir) / f'{self.filename.stem}.ccl')
+            return CCLTextFile(ccl_filename).overlay()
+
+    def to_columnar(self, filename: Union[PATHLIKE, None] = None) -> pathlib.Path:
+        """Write the content in the columnar layout (see `CCLColumns`). By default the
+        file is written next to this file with the suffix ".columnar.ccl_hdf"."""
+        if isinstance(self.filename, H5GroupRef):
+            raise ValueError(f'{self.filename} is a group of a larger file. Export it to a separate file first '
+                             f'(see CCLStudy.export())')
+        if filename is None:
+            filename = self.filename.with_suffix(f'.{COLUMNAR_LAYOUT}{self.SUFFIX}')
+        return CCLColumns.from_attribute_hdf(self.filename).to_hdf(filename)
+
+    @classmethod
+    def from_columnar(cls, columnar_filename: PATHLIKE, filename: PATHLIKE) -> "CCLFile":
+        """Convert a file in the columnar layout into the attribute layout used by `CCLFile`"""
+        filename = pathlib.Path(filename)
+        if filename.suffix != cls.SUFFIX:
+            raise ValueError(f'Unexpected suffix: {filename.suffix}. Must be {cls.SUFFIX}')
+        return cls(CCLColumns.from_hdf(columnar_filename).to_attribute_hdf(filename))
+
     def to_ccl(self, ccl_filename: Union[PATHLIKE, None]) -> pathlib.Path:
         """convert to original .ccl file format"""
         if ccl_filename is None:
-            ccl_filename = change_suffix(self.filename, '.ccl')
+            if isinstance(self.filename, H5GroupRef):
+                ccl_filename = self.filename.parent.joinpath(f'{self.filename.stem}.ccl')
+            else:
+                ccl_filename = change_suffix(self.filename, '.ccl')
         return hdf_to_ccl(self.filename, ccl_filename, intendation_step=INTENDATION_STEP)
 
     def set_steady_state_max_iterations(self, max_iter: int):
         """sets the maximum number of iterations for steady state run. Note: This assumes, that the file
         is steady state! Is not checked!!!"""
-        with h5tbx.File(self.filename, 'r+') as h5:
+        with open_h5(self.filename, 'r+', h5tbx.File) as h5:
             convctrl_grp = h5['FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL']
             convctrl_grp.attrs['Maximum Number of Iterations'] = str(int(max_iter))
 
-    def set_inlet_velocity_from_file(self, csv_filename):
-        """Sets the inlet velocity profile from a csv file
+    def set_inlet_velocity_from_file(self, csv_filename, boundary: Union[str, Iterable[str], None] = None,
+                                     flow: str = None):
+        """Sets the inlet velocity profile from a csv file. By default, the file must have a
+        single inlet. Otherwise, select the boundaries by name, list of names or glob pattern
+        (`boundary`) and/or by the name of the flow (`flow`).
         Note: Assumes that the csv file looks like this:
 
         [Name]
@@ -842,8 +1620,10 @@ class CCLFile:
         ...
 
         """
-        with h5tbx.File(self.filename, 'r+') as h5:
-            cel_grp = h5.find_one({'$name': '/LIBRARY/CEL'}, '$group')
+        bdry_paths = self._inlet_paths(boundary, flow)
+        with self._edit_groups() as (h5, locator):
+            cel_path = locator.get('CEL', within='LIBRARY')
+            cel_grp = h5[cel_path]
             g = cel_grp.create_group('FUNCTION: inlet', overwrite=True)
             g.attrs['Argument Units'] = '[m]'
             g.attrs['Extend Max'] = 'true'
@@ -859,24 +1639,27 @@ class CCLFile:
             gds = g.create_group('DATA SOURCE')
             gds.attrs['File Name'] = str(csv_filename)
             gds.attrs['Option'] = 'From File'
+            locator.rescan(h5, f'{cel_path}/FUNCTION: inlet')
 
-            bdry_grp = h5['FLOW: Flow Analysis 1'].find_one({'$basename': 'BOUNDARY: INLET'}, '$group')
-            bdry_grp.attrs['Use Profile Data'] = 'On'
+            for bdry_path in bdry_paths:
+                bdry_grp = h5[bdry_path]
+                bdry_grp.attrs['Use Profile Data'] = 'On'
 
-            g = bdry_grp.create_group('BOUNDARY CONDITIONS', overwrite=True)
-            g.create_group('FLOW REGIME', attrs={'Option': 'Subsonic'})
-            g.create_group('MASS AND MOMENTUM', attrs={'Option': 'Cartesian Velocity Components',
-                                                       'U': '0 [m s^-1]',
-                                                       'V': '0 [m s^-1]',
-                                                       'W': 'inlet.Velocity in Stn Frame w(r)',
-                                                       })
-            g.create_group('TURBULENCE', attrs={'Option': 'Low Intensity and Eddy Viscosity Ratio'})
+                g = bdry_grp.create_group('BOUNDARY CONDITIONS', overwrite=True)
+                g.create_group('FLOW REGIME', attrs={'Option': 'Subsonic'})
+                g.create_group('MASS AND MOMENTUM', attrs={'Option': 'Cartesian Velocity Components',
+                                                           'U': '0 [m s^-1]',
+                                                           'V': '0 [m s^-1]',
+                                                           'W': 'inlet.Velocity in Stn Frame w(r)',
+                                                           })
+                g.create_group('TURBULENCE', attrs={'Option': 'Low Intensity and Eddy Viscosity Ratio'})
 
-            bdry_grp.create_group('BOUNDARY PROFILE', attrs={'Profile Name': 'inlet'}, overwrite=True)
+                bdry_grp.create_group('BOUNDARY PROFILE', attrs={'Profile Name': 'inlet'}, overwrite=True)
+                locator.rescan(h5, bdry_path)
 
     def set_expression(self, h5=None, **expression_dict):
         if h5 is None:
-            with h5tbx.File(self.filename, 'r+') as h5:
+            with open_h5(self.filename, 'r+', h5tbx.File) as h5:
                 return self.set_expression(h5=h5, **expression_dict)
         for k, v in expression_dict.items():
             curr_value = h5['LIBRARY/CEL/EXPRESSIONS'].attrs.get(k, None)
@@ -888,10 +1671,14 @@ class CCLFile:
                          mfr: Union[float, str, Dict],
                          flow_regime: str = 'Subsonic',
                          mass_flow_rate_area: str = 'As Specified',
-                         turbulence_intensity: str = 'Low Intensity and Eddy Viscosity Ratio'):
+                         turbulence_intensity: str = 'Low Intensity and Eddy Viscosity Ratio',
+                         boundary: Union[str, Iterable[str], None] = None,
+                         flow: str = None):
         """
         Set the mass flow rate. Either set it with value and unit or provide an expression. If the latter,
         then make sure you set the expression value using `.set_expression()`.
+        By default, the file must have a single inlet. Otherwise, select the boundaries with
+        `boundary` and/or `flow`.
 
         Parameters
         ----------
@@ -907,7 +1694,10 @@ class CCLFile:
             - 'Low Intensity and Eddy Viscosity Ratio' or 'low'
             - 'Medium Intensity and Eddy Viscosity Ratio' or 'medium'
             - 'High Intensity and Eddy Viscosity Ratio' or 'high'
-
+        boundary: Union[str, Iterable[str], None]
+            Name, list of names or glob pattern of the boundaries, e.g. "Inlet*"
+        flow: str
+            Name of the flow, e.g. "Flow Analysis 1"
         """
         if 'low' in turbulence_intensity.lower():
             turbulence_intensity = 'Low Intensity and Eddy Viscosity Ratio'
@@ -916,43 +1706,46 @@ class CCLFile:
         if 'high' in turbulence_intensity.lower():
             turbulence_intensity = 'High Intensity and Eddy Viscosity Ratio'
 
-        with h5tbx.File(self.filename, 'r+') as h5:
-            bdry_grp = h5['FLOW: Flow Analysis 1'].find_one({'$basename': 'BOUNDARY: INLET'}, '$group')
-            if 'Use Profile Data' in bdry_grp:
-                del bdry_grp.attrs['Use Profile Data']
-
-            bdry_condition_grp = bdry_grp['BOUNDARY CONDITIONS']
-            bdry_condition_grp.create_group('FLOW REGIME',
-                                            attrs={'Option': flow_regime.capitalize()}, overwrite=True)
-            bdry_condition_grp.create_group('FLOW DIRECTION',
-                                            attrs={'Option': 'Normal to Boundary Condition'}, overwrite=True)
-            if isinstance(mfr, str):
-                # expecting an existing expression
-                bdry_condition_grp.create_group('MASS AND MOMENTUM', attrs={'Mass Flow Rate': mfr,
-                                                                            'Mass Flow Rate Area': mass_flow_rate_area,
-                                                                            'Option': 'Mass Flow Rate'},
-                                                overwrite=True)
-            elif isinstance(mfr, Dict):
-                if len(mfr) != 1:
-                    raise ValueError(f'Unexpected input: {mfr}. Expecting something like'
-                                     ' EXsetvolflowrate="0.01 [m^3/s]"')
-                self.set_expression(mfr)
-                expr_name = list(mfr.keys())[0]
-                bdry_condition_grp.create_group('MASS AND MOMENTUM', attrs={'Mass Flow Rate': expr_name,
-                                                                            'Mass Flow Rate Area': mass_flow_rate_area,
-                                                                            'Option': 'Mass Flow Rate'},
-                                                overwrite=True)
-            else:
-                bdry_condition_grp.create_group('MASS AND MOMENTUM', attrs={'Mass Flow Rate': f'{mfr} [kg s^-1]',
+        if isinstance(mfr, str):
+            # expecting an existing expression
+            mfr_value = mfr
+        elif isinstance(mfr, Dict):
+            if len(mfr) != 1:
+                raise ValueError(f'Unexpected input: {mfr}. Expecting something like'
+                                 ' EXsetvolflowrate="0.01 [m^3/s]"')
+            mfr_value = list(mfr.keys())[0]
+        else:
+            mfr_value = format_value(mfr, 'kg s^-1')
+
+        bdry_paths = self._inlet_paths(boundary, flow)
+        with self._edit_groups() as (h5, locator):
+            if isinstance(mfr, Dict):
+                self.set_expression(h5=h5, **mfr)
+            for bdry_path in bdry_paths:
+                bdry_grp = h5[bdry_path]
+                if 'Use Profile Data' in bdry_grp.attrs:
+                    del bdry_grp.attrs['Use Profile Data']
+
+                bdry_condition_grp = bdry_grp['BOUNDARY CONDITIONS']
+                bdry_condition_grp.create_group('FLOW REGIME',
+                                                attrs={'Option': flow_regime.capitalize()}, overwrite=True)
+                bdry_condition_grp.create_group('FLOW DIRECTION',
+                                                attrs={'Option': 'Normal to Boundary Condition'}, overwrite=True)
+                bdry_condition_grp.create_group('MASS AND MOMENTUM', attrs={'Mass Flow Rate': mfr_value,
                                                                             'Mass Flow Rate Area': mass_flow_rate_area,
                                                                             'Option': 'Mass Flow Rate'},
                                                 overwrite=True)
-            bdry_condition_grp.create_group('TURBULENCE', attrs={'Option': turbulence_intensity}, overwrite=True)
+                bdry_condition_grp.create_group('TURBULENCE', attrs={'Option': turbulence_intensity}, overwrite=True)
+                locator.rescan(h5, f'{bdry_path}/BOUNDARY CONDITIONS')
 
     def set_normalspeed(self,
                         normal_speed,
-                         flow_regime: str = 'Subsonic',
-                        turbulence_intensity: str = 'Low Intensity and Eddy Viscosity Ratio'):
+                        flow_regime: str = 'Subsonic',
+                        turbulence_intensity: str = 'Low Intensity and Eddy Viscosity Ratio',
+                        boundary: Union[str, Iterable[str], None] = None,
+                        flow: str = None):
+        """Sets the normal speed at the inlet. The boundaries are selected like in
+        `set_massflowrate()`."""
         if 'low' in turbulence_intensity.lower():
             turbulence_intensity = 'Low Intensity and Eddy Viscosity Ratio'
         if 'medium' in turbulence_intensity.lower():
@@ -960,20 +1753,22 @@ class CCLFile:
         if 'high' in turbulence_intensity.lower():
             turbulence_intensity = 'High Intensity and Eddy Viscosity Ratio'
 
-        with h5tbx.File(self.filename, 'r+') as h5:
-            bdry_grp = h5['FLOW: Flow Analysis 1'].find_one({'$basename': 'BOUNDARY: INLET'}, '$group')
-
-            bdry_condition_grp = bdry_grp['BOUNDARY CONDITIONS']
-            bdry_condition_grp.create_group('FLOW REGIME',
-                                            attrs={'Option': flow_regime.capitalize()}, overwrite=True)
+        bdry_paths = self._inlet_paths(boundary, flow)
+        with self._edit_groups() as (h5, locator):
+            for bdry_path in bdry_paths:
+                bdry_condition_grp = h5[bdry_path]['BOUNDARY CONDITIONS']
+                bdry_condition_grp.create_group('FLOW REGIME',
+                                                attrs={'Option': flow_regime.capitalize()}, overwrite=True)
 
-            bdry_condition_grp.create_group('MASS AND MOMENTUM', attrs={'Normal Speed': f'{normal_speed:f} [m s^-1]',
-                                                                        'Option': 'Normal Speed'},
-                                            overwrite=True)
-            if 'FLOW DIRECTION' in bdry_condition_grp:
-                del bdry_condition_grp['FLOW DIRECTION']
+                bdry_condition_grp.create_group('MASS AND MOMENTUM',
+                                                attrs={'Normal Speed': format_value(normal_speed, 'm s^-1'),
+                                                       'Option': 'Normal Speed'},
+                                                overwrite=True)
+                if 'FLOW DIRECTION' in bdry_condition_grp:
+                    del bdry_condition_grp['FLOW DIRECTION']
 
-            bdry_condition_grp.create_group('TURBULENCE', attrs={'Option': turbulence_intensity}, overwrite=True)
+                bdry_condition_grp.create_group('TURBULENCE', attrs={'Option': turbulence_intensity}, overwrite=True)
+                locator.rescan(h5, f'{bdry_path}/BOUNDARY CONDITIONS')
 
 
 def generate(input_file: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None,
@@ -1019,6 +1814,89 @@ def generate(input_file: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None,
     return _generate_from_def(input_file, ccl_filename, overwrite)
 
 
+@dataclass
+class CCLBatchResult:
+    """Result of `generate_many()`. Both dicts are in the order of the input files."""
+    filenames: Dict[pathlib.Path, pathlib.Path] = field(default_factory=dict)  # input file -> generated file
+    errors: Dict[pathlib.Path, Exception] = field(default_factory=dict)  # input file -> error
+
+    def __bool__(self):
+        """True if all files have been converted"""
+        return not self.errors
+
+    def raise_errors(self) -> None:
+        """Raises a RuntimeError listing all failed files"""
+        if self.errors:
+            msg = '\n'.join(f'{filename}: {err}' for filename, err in self.errors.items())
+            raise RuntimeError(f'{len(self.errors)} of {len(self.errors) + len(self.filenames)} '
+                               f'files could not be converted:\n{msg}')
+
+
+def generate_many(input_files: Iterable[PATHLIKE], max_workers: int = None, to_hdf: bool = True,
+                  aux_dir: PATHLIKE = None, cache: bool = True) -> CCLBatchResult:
+    """
+    Converts many .res, .cfx or .def files concurrently. Every conversion runs cfx5cmds
+    (and cfx5pre for .res and .cfx files) in its own subprocess, hence at most `max_workers`
+    of them run at the same time. A failing file does not abort the others. Its error is
+    collected in the result.
+
+    Parameters
+    ----------
+    input_files: Iterable[PATHLIKE]
+        *.res, *.cfx or *.def files
+    max_workers: int
+        Maximum number of concurrent conversions. Default is the number of CPUs
+    to_hdf: bool
+        Convert the CCL text into a ccl hdf file as `CCLFile` does (including its cache).
+        Otherwise only the .ccl files are written by `generate()`
+    aux_dir: PATHLIKE
+        Directory relative to each input file to write the files to (see `CCLFile`).
+        Default writes them next to the input files
+    cache: bool
+        Use the CCL cache of `CCLFile` (only if `to_hdf`)
+
+    Returns
+    -------
+    CCLBatchResult
+        Generated .ccl_hdf (or .ccl) file and error per input file
+    """
+    input_files = list(dict.fromkeys(pathlib.Path(f) for f in input_files))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers < 1:
+        raise ValueError(f'max_workers must be at least 1, not {max_workers}')
+
+    def _convert(filename: pathlib.Path) -> pathlib.Path:
+        if to_hdf:
+            return CCLFile(filename, aux_dir=aux_dir, cache=cache).filename
+        ccl_filename = change_suffix(filename, '.ccl')
+        if aux_dir is not None:
+            ccl_filename = ccl_filename.parent.joinpath(aux_dir, ccl_filename.name)
+            ccl_filename.parent.mkdir(parents=True, exist_ok=True)
+        return generate(filename, ccl_filename=ccl_filename)
+
+    # threads are sufficient: they wait for the cfx5cmds processes
+    outcomes = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_convert, filename): filename for filename in input_files}
+        for future in concurrent.futures.as_completed(futures):
+            filename = futures[future]
+            try:
+                outcomes[filename] = future.result()
+            except Exception as e:
+                logger.error(f'Could not generate the CCL of {filename}: {e}')
+                outcomes[filename] = e
+
+    result = CCLBatchResult()
+    for filename in input_files:
+        outcome = outcomes[filename]
+        if isinstance(outcome, Exception):
+            result.errors[filename] = outcome
+        else:
+            result.filenames[filename] = outcome
+    return result
+
+
 # def _generate_from_res_or_cfx(res_cfx_filename: PATHLIKE,
 #                               ccl_filename: pathlib.Path, cfx5pre: str, overwrite=True) -> pathlib.Path:
 #     if overwrite and ccl_filename.exists():
@@ -1041,15 +1919,38 @@ def generate(input_file: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None,
 #     return ccl_filename
 
 
-def _generate_from_def(def_filename: PATHLIKE,
-                       ccl_filename: PATHLIKE,
-                       overwrite: bool = True) -> pathlib.Path:
-    """generates a ccl file from a def file"""
+def _generate_from_def_args(def_filename: PATHLIKE, ccl_filename: pathlib.Path, overwrite: bool) -> List[str]:
     if ccl_filename.exists() and overwrite:
         ccl_filename.unlink()
-    cmd = f'"{CFX5CMDS}" -read -def "{def_filename}" -text "{ccl_filename}"'
-    subprocess.run(cmd, shell=True)
+    return [str(CFX5CMDS), '-read', '-def', str(def_filename), '-text', str(ccl_filename)]
 
+
+def _check_generated(cmd: List[str], ccl_filename: pathlib.Path,
+                     completed_process: subprocess.CompletedProcess) -> pathlib.Path:
     if not ccl_filename.exists():
-        raise RuntimeError(f'Failed running bash script "{cmd}"')
+        raise RuntimeError(f'Failed running "{" ".join(cmd)}" (return code {completed_process.returncode}): '
+                           f'{completed_process.stderr.strip() or completed_process.stdout.strip()}')
     return ccl_filename
+
+
+def _generate_from_def(def_filename: PATHLIKE,
+                       ccl_filename: PATHLIKE,
+                       overwrite: bool = True) -> pathlib.Path:
+    """generates a ccl file from a def file"""
+    ccl_filename = pathlib.Path(ccl_filename)
+    cmd = _generate_from_def_args(def_filename, ccl_filename, overwrite)
+    completed_process = subprocess.run(cmd, capture_output=True, text=True)
+    return _check_generated(cmd, ccl_filename, completed_process)
+
+
+async def _generate_from_def_async(def_filename: PATHLIKE,
+                                   ccl_filename: PATHLIKE,
+                                   overwrite: bool = True,
+                                   timeout: Union[float, None] = None) -> pathlib.Path:
+    """Coroutine of `_generate_from_def()`"""
+    ccl_filename = pathlib.Path(ccl_filename)
+    cmd = _generate_from_def_args(def_filename, ccl_filename, overwrite)
+    completed_process = await run_async(cmd, timeout=timeout)
+    completed_process.stdout = completed_process.stdout.decode(errors='replace')
+    completed_process.stderr = completed_process.stderr.decode(errors='replace')
+    return _check_generated(cmd, ccl_filename, completed_process)
@@ -0,0 +1,208 @@
+"""Columnar HDF5 layout of CCL content.
+
+The default layout of a `.ccl_hdf` file (see `CCLTextFile.to_hdf()`) stores one HDF5 group
+per CCL group and one attribute per option. Writing and reading it is dominated by many tiny
+HDF5 metadata operations. `CCLColumns` stores the whole tree in a few datasets instead:
+
+    group_path    full path of each group ("" is the root group), in file order
+    group_parent  index of the parent group (-1 for the root group)
+    option_group  index of the group each option belongs to (options are sorted by group)
+    option_key    index into key_names (option names repeat a lot)
+    key_names     unique option names
+    option_value  option values
+
+so that it is written with one bulk operation per dataset and loaded with one read each.
+Paths are the group names joined by "/" as in `CCLIndex`.
+"""
+import pathlib
+from typing import Dict, List, Union
+
+import h5py
+import numpy as np
+
+from ..typing import PATHLIKE
+
+LAYOUT_ATTR_NAME = 'ccl_layout'
+COLUMNAR_LAYOUT = 'columnar'
+DATASET_NAMES = ('group_path', 'group_parent', 'option_group', 'option_key', 'key_names', 'option_value')
+
+
+def is_columnar(filename: PATHLIKE) -> bool:
+    """Whether the HDF5 file uses the columnar CCL layout"""
+    with h5py.File(filename, 'r') as h5:
+        return h5.attrs.get(LAYOUT_ATTR_NAME, None) == COLUMNAR_LAYOUT
+
+
+class CCLColumns:
+    """CCL tree stored as columns. Build it from a parsed tree (`from_group()`), from a
+    file in the attribute layout (`from_attribute_hdf()`) or from a columnar file (`from_hdf()`).
+
+    Example
+    -------
+    columns = CCLColumns.from_group(CCLTextFile('mycase.ccl').root_group)
+    columns.to_hdf('mycase.ccl_hdf')
+    CCLColumns.from_hdf('mycase.ccl_hdf').options('FLOW: Flow Analysis 1/SOLVER CONTROL')
+    """
+
+    def __init__(self, group_path: List[str], group_parent, option_group, option_key,
+                 key_names: List[str], option_value: List[str]):
+        self.group_path = np.asarray(group_path, dtype=object)
+        self.group_parent = np.asarray(group_parent, dtype=np.int32)
+        self.option_group = np.asarray(option_group, dtype=np.int32)
+        self.option_key = np.asarray(option_key, dtype=np.int32)
+        self.key_names = np.asarray(key_names, dtype=object)
+        self.option_value = np.asarray(option_value, dtype=object)
+        if np.any(np.diff(self.option_group) < 0):
+            raise ValueError('Options must be sorted by their group index')
+        self._path_index = None
+        self._option_offsets = None
+
+    def __repr__(self):
+        return f'<CCLColumns ({len(self)} groups, {len(self.option_value)} options)>'
+
+    def __len__(self) -> int:
+        """Number of groups including the root group"""
+        return len(self.group_path)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.path_index
+
+    def __eq__(self, other):
+        if not isinstance(other, CCLColumns):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    @property
+    def path_index(self) -> Dict[str, int]:
+        """{path: group index}"""
+        if self._path_index is None:
+            self._path_index = {path: i for i, path in enumerate(self.group_path)}
+        return self._path_index
+
+    def index(self, path: str) -> int:
+        """Index of the group with the given path"""
+        try:
+            return self.path_index[path]
+        except KeyError:
+            raise KeyError(f'No group with path "{path}"') from None
+
+    def options(self, path: str) -> Dict[str, str]:
+        """Options of a group: {name: value}"""
+        if self._option_offsets is None:
+            self._option_offsets = np.searchsorted(self.option_group, np.arange(len(self) + 1))
+        igrp = self.index(path)
+        sl = slice(self._option_offsets[igrp], self._option_offsets[igrp + 1])
+        return dict(zip(self.key_names[self.option_key[sl]], self.option_value[sl]))
+
+    def children(self, path: str) -> List[str]:
+        """Paths of the sub groups of a group"""
+        return list(self.group_path[self.group_parent == self.index(path)])
+
+    def to_dict(self) -> Dict[str, Dict[str, str]]:
+        """{path: {option name: value}} of all groups"""
+        data = {path: {} for path in self.group_path}
+        for igrp, ikey, value in zip(self.option_group, self.option_key, self.option_value):
+            data[self.group_path[igrp]][self.key_names[ikey]] = value
+        return data
+
+    @classmethod
+    def from_group(cls, root_group) -> "CCLColumns":
+        """Build the columns from a parsed tree (`CCLGroup` or `CCLNode`) in file order"""
+        group_path, group_parent = [], []
+        option_group, option_key, option_value = [], [], []
+        keys = {}
+        stack = [('', -1, root_group)]
+        while stack:
+            path, iparent, grp = stack.pop()
+            igrp = len(group_path)
+            group_path.append(path)
+            group_parent.append(iparent)
+            for name, field in grp.data.items():
+                option_group.append(igrp)
+                option_key.append(keys.setdefault(name, len(keys)))
+                option_value.append(field.value)
+            prefix = f'{path}/' if path else ''
+            stack.extend((f'{prefix}{name}', igrp, sub_grp)
+                         for name, sub_grp in reversed(list(grp.sub_groups.items())))
+        return cls(group_path, group_parent, option_group, option_key, list(keys), option_value)
+
+    @classmethod
+    def from_attribute_hdf(cls, filename: PATHLIKE) -> "CCLColumns":
+        """Read a `.ccl_hdf` file in the attribute layout (one HDF5 group per CCL group)"""
+        group_path, group_parent = [], []
+        option_group, option_key, option_value = [], [], []
+        keys = {}
+        path_index = {}
+
+        def _add_group(path, h5grp):
+            igrp = len(group_path)
+            path_index[path] = igrp
+            group_path.append(path)
+            group_parent.append(path_index[path.rpartition('/')[0]] if path else -1)
+            for name, value in h5grp.attrs.items():
+                option_group.append(igrp)
+                option_key.append(keys.setdefault(name, len(keys)))
+                option_value.append(str(value))
+
+        with h5py.File(filename, 'r') as h5:
+            _add_group('', h5)
+            # visititems visits parents before their children
+            h5.visititems(lambda name, obj: _add_group(name, obj) if isinstance(obj, h5py.Group) else None)
+        return cls(group_path, group_parent, option_group, option_key, list(keys), option_value)
+
+    @classmethod
+    def from_hdf(cls, filename: PATHLIKE) -> "CCLColumns":
+        """Read a `.ccl_hdf` file in the columnar layout"""
+        with h5py.File(filename, 'r') as h5:
+            layout = h5.attrs.get(LAYOUT_ATTR_NAME, None)
+            if layout != COLUMNAR_LAYOUT:
+                raise ValueError(f'{filename} is not in the columnar CCL layout (layout: {layout})')
+            columns = {}
+            for name in DATASET_NAMES:
+                ds = h5[name]
+                columns[name] = ds.asstr()[()] if h5py.check_string_dtype(ds.dtype) else ds[()]
+        return cls(**columns)
+
+    def to_hdf(self, filename: PATHLIKE, overwrite: bool = True) -> pathlib.Path:
+        """Write the columnar layout (one dataset write per column)"""
+        filename = pathlib.Path(filename)
+        if filename.is_file() and not overwrite:
+            raise FileExistsError(f'Target HDF file exists and overwrite is set to False!')
+        with h5py.File(filename, 'w') as h5:
+            h5.attrs[LAYOUT_ATTR_NAME] = COLUMNAR_LAYOUT
+            for name in DATASET_NAMES:
+                data = getattr(self, name)
+                if data.dtype == object:
+                    h5.create_dataset(name, data=data, dtype=h5py.string_dtype())
+                else:
+                    h5.create_dataset(name, data=data)
+        return filename
+
+    def to_attribute_hdf(self, filename: PATHLIKE, overwrite: bool = True) -> pathlib.Path:
+        """Write the attribute layout (one HDF5 group per CCL group) as used by `CCLFile`"""
+        filename = pathlib.Path(filename)
+        if filename.is_file() and not overwrite:
+            raise FileExistsError(f'Target HDF file exists and overwrite is set to False!')
+        with h5py.File(filename, 'w') as h5:
+            h5grps = []
+            for path in self.group_path:
+                h5grps.append(h5.create_group(path) if path else h5)
+            for igrp, ikey, value in zip(self.option_group, self.option_key, self.option_value):
+                h5grps[igrp].attrs[self.key_names[ikey]] = value
+        return filename
+
+
+def convert_layout(src: PATHLIKE, dst: PATHLIKE, layout: Union[str, None] = None) -> pathlib.Path:
+    """Convert a `.ccl_hdf` file between the attribute and the columnar layout. By default
+    the layout of `dst` is the other one of `src`"""
+    if is_columnar(src):
+        columns = CCLColumns.from_hdf(src)
+        layout = layout or 'attributes'
+    else:
+        columns = CCLColumns.from_attribute_hdf(src)
+        layout = layout or COLUMNAR_LAYOUT
+    if layout == COLUMNAR_LAYOUT:
+        return columns.to_hdf(dst)
+    if layout == 'attributes':
+        return columns.to_attribute_hdf(dst)
+    raise ValueError(f'Unknown layout "{layout}". Must be "attributes" or "{COLUMNAR_LAYOUT}"')
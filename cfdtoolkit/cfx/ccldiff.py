@@ -0,0 +1,145 @@
+"""Structural diff of CCL trees.
+
+Each group is hashed bottom-up from its options and the hashes of its sub groups (Merkle
+tree). Options and sub groups are hashed in sorted order, so a tree parsed from CCL text
+(`CCLTextFile`) and one read from HDF5 (`CCLFile`, alphabetical order) of the same case
+have the same hash. The diff only descends into sub groups with different hashes, hence
+identical subtrees are skipped in O(1).
+
+Example
+-------
+differ = CCLDiffer(CCLTextFile('base.ccl'))
+for d in differ.diff_many([CCLFile('variant1.ccl_hdf'), CCLTextFile('variant2.ccl')]):
+    print(d.changed_options)
+"""
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from .cclsnapshot import CCLSnapshotGroup
+
+_SEP = b'\x00'
+
+
+class CCLHashNode:
+    """Options, sub groups and hash of one group"""
+
+    __slots__ = ('options', 'sub_groups', 'digest')
+
+    def __init__(self, options: Dict[str, str], sub_groups: Dict[str, "CCLHashNode"]):
+        self.options = options
+        self.sub_groups = sub_groups
+        h = hashlib.blake2b(digest_size=16)
+        for name in sorted(options):
+            h.update(b'o' + name.encode() + _SEP + options[name].encode() + _SEP)
+        for name in sorted(sub_groups):
+            h.update(b'g' + name.encode() + _SEP + sub_groups[name].digest)
+        self.digest = h.digest()
+
+    def __repr__(self):
+        return f'<CCLHashNode {self.digest.hex()} ({len(self.options)} options, {len(self.sub_groups)} groups)>'
+
+
+def hash_tree(source) -> CCLHashNode:
+    """Builds the hash tree of a parsed CCL tree. `source` may be a `CCLTextFile`, a `CCLFile`
+    (loaded via `snapshot()`), a `CCLGroup`, a `CCLNode` or a `CCLSnapshotGroup`."""
+    if isinstance(source, CCLHashNode):
+        return source
+    if isinstance(source, CCLSnapshotGroup):
+        return _hash_snapshot_group(source)
+    if hasattr(source, 'root_group'):  # CCLTextFile
+        source.update()
+        return _hash_group(source.root_group)
+    if hasattr(source, 'snapshot'):  # CCLFile
+        return _hash_snapshot_group(source.snapshot())
+    if hasattr(source, 'sub_groups'):  # CCLGroup or CCLNode
+        return _hash_group(source)
+    raise TypeError(f'Cannot hash CCL tree of type {type(source)}')
+
+
+def _hash_group(grp) -> CCLHashNode:
+    return CCLHashNode({name: f.value for name, f in grp.data.items()},
+                       {name: _hash_group(sub_grp) for name, sub_grp in grp.sub_groups.items()})
+
+
+def _hash_snapshot_group(grp) -> CCLHashNode:
+    return CCLHashNode({name: str(value) for name, value in grp.options.items()},
+                       {name: _hash_snapshot_group(grp[name]) for name in grp.keys()})
+
+
+@dataclass
+class CCLDiff:
+    """Differences of a CCL tree compared to a base tree. Paths are the group names joined
+    by "/" (see `CCLIndex`), option paths are "<group path>/<option name>". Options of added
+    and removed groups are listed in `added_options` and `removed_options`."""
+    added_groups: List[str] = field(default_factory=list)
+    removed_groups: List[str] = field(default_factory=list)
+    added_options: Dict[str, str] = field(default_factory=dict)
+    removed_options: Dict[str, str] = field(default_factory=dict)
+    changed_options: Dict[str, Tuple[str, str]] = field(default_factory=dict)  # path: (base, other)
+
+    def __bool__(self):
+        return bool(self.added_groups or self.removed_groups or self.added_options
+                    or self.removed_options or self.changed_options)
+
+    def __str__(self):
+        lines = [f'+ {path}' for path in self.added_groups]
+        lines += [f'- {path}' for path in self.removed_groups]
+        lines += [f'+ {path} = {value}' for path, value in self.added_options.items()]
+        lines += [f'- {path} = {value}' for path, value in self.removed_options.items()]
+        lines += [f'~ {path} = {old} -> {new}' for path, (old, new) in self.changed_options.items()]
+        return '\n'.join(lines)
+
+
+def _add_subtree(node: CCLHashNode, path: str, groups: List[str], options: Dict[str, str]) -> None:
+    """Adds the paths of the group and all its sub groups and their options"""
+    groups.append(path)
+    for name, value in node.options.items():
+        options[f'{path}/{name}'] = value
+    for name, sub_node in node.sub_groups.items():
+        _add_subtree(sub_node, f'{path}/{name}', groups, options)
+
+
+def _diff_nodes(base: CCLHashNode, other: CCLHashNode, path: str, diff: CCLDiff) -> None:
+    if base.digest == other.digest:
+        return
+    prefix = f'{path}/' if path else ''
+    if base.options != other.options:
+        for name, value in base.options.items():
+            other_value = other.options.get(name, None)
+            if other_value is None:
+                diff.removed_options[f'{prefix}{name}'] = value
+            elif other_value != value:
+                diff.changed_options[f'{prefix}{name}'] = (value, other_value)
+        for name, value in other.options.items():
+            if name not in base.options:
+                diff.added_options[f'{prefix}{name}'] = value
+    for name, sub_node in base.sub_groups.items():
+        other_sub_node = other.sub_groups.get(name, None)
+        if other_sub_node is None:
+            _add_subtree(sub_node, f'{prefix}{name}', diff.removed_groups, diff.removed_options)
+        else:
+            _diff_nodes(sub_node, other_sub_node, f'{prefix}{name}', diff)
+    for name, sub_node in other.sub_groups.items():
+        if name not in base.sub_groups:
+            _add_subtree(sub_node, f'{prefix}{name}', diff.added_groups, diff.added_options)
+
+
+def diff(base, other) -> CCLDiff:
+    """Structural diff of `other` compared to `base` (see `hash_tree()` for the accepted types)"""
+    return CCLDiffer(base).diff(other)
+
+
+class CCLDiffer:
+    """Compares many CCL trees against one base tree, which is hashed only once"""
+
+    def __init__(self, base):
+        self.base = hash_tree(base)
+
+    def diff(self, other) -> CCLDiff:
+        d = CCLDiff()
+        _diff_nodes(self.base, hash_tree(other), '', d)
+        return d
+
+    def diff_many(self, others: Iterable) -> List[CCLDiff]:
+        return [self.diff(other) for other in others]
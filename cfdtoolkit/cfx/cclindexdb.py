@@ -0,0 +1,410 @@
+"""SQLite index of the CCL options of many cases.
+
+Questions like "which cases use a mass flow inlet above 0.5 kg/s" otherwise require
+opening every `.ccl_hdf` file and walking its tree. `CCLIndexDB` stores one row per option
+of all indexed cases in a SQLite file next to the cases:
+
+    (case, path, group_type, key, value, typed_value, dims)
+
+`value` is the CCL text. Scalar values are also stored as `typed_value` in SI units with
+their SI unit `dims` (see `cel.CELQuantity`), so values given in different units compare
+correctly. Queries return `CCLHDFGroup` and `CCLFile` handles of the matching groups and
+cases.
+
+The index registers a write hook (see `hdfsession.add_write_hook()`): whenever a `CCLFile`
+of an indexed case is written, the options of this case are indexed again. Writing a study
+file by its filename (e.g. `CCLStudy.add()`) indexes those cases of the study again whose
+tree was replaced or removed. Files changed by other processes are detected by `refresh()`,
+which compares size and modification time.
+
+Example
+-------
+db = CCLIndexDB('cases.ccl_index')
+db.add(pathlib.Path('cases').glob('*.ccl_hdf'))
+inlets = (db.query(group_type='MASS AND MOMENTUM')
+          .where('Option', '==', 'Mass Flow Rate')
+          .where('Mass Flow Rate', '>', '0.5 [kg s^-1]')
+          .within('BOUNDARY', 'Boundary Type', '==', 'INLET'))
+inlets.cases()  # [CCLFile, ...]
+inlets.groups()  # [CCLHDFGroup, ...]
+"""
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import weakref
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import h5py
+
+from .cclsnapshot import CCLSnapshotGroup
+from .cclstudy import CASES, CCLStudy, CCLStudyCase
+from .cclvalue import CCLValue, parse_value
+from .cel import CELQuantity, CELUnitError
+from .hdfsession import H5GroupRef, add_write_hook, open_h5, remove_write_hook
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    object INTEGER,  -- address of the tree of a study case in the study file
+    UNIQUE (filename, name)
+);
+CREATE TABLE IF NOT EXISTS options (
+    case_id INTEGER NOT NULL REFERENCES cases (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    group_type TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    typed_value REAL,
+    dims TEXT
+);
+CREATE INDEX IF NOT EXISTS options_group ON options (case_id, path, key);
+CREATE INDEX IF NOT EXISTS options_key ON options (key, typed_value);
+CREATE INDEX IF NOT EXISTS options_type ON options (group_type, key, case_id);
+"""
+
+_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', 'glob': 'GLOB'}
+
+
+def _typed(text: str) -> Tuple[Union[float, None], Union[str, None]]:
+    """SI value and SI unit of a scalar CCL value. (None, None) for other values. Units
+    unknown to `cel` are kept as "[unit]" and the value is not converted."""
+    value = parse_value(text)
+    if not isinstance(value, CCLValue) or value.is_vector:
+        return None, None
+    if value.unit is None:
+        return float(value.value), ''
+    try:
+        q = CELQuantity.from_unit(value.value, value.unit.text)
+    except CELUnitError:
+        return float(value.value), f'[{value.unit.text}]'
+    return q.value, q.unit
+
+
+def _group_type(path: str) -> str:
+    return path.rsplit('/', 1)[-1].split(':', 1)[0].strip()
+
+
+def _iter_rows(grp: CCLSnapshotGroup, path: str = '') -> Iterator[Tuple]:
+    """Yields (path, group_type, key, value, typed_value, dims) of all options of a tree"""
+    group_type = _group_type(path)
+    for key, value in grp.options.items():
+        value = str(value)
+        yield (path, group_type, key, value) + _typed(value)
+    prefix = f'{path}/' if path else ''
+    for name in grp.keys():
+        yield from _iter_rows(grp[name], f'{prefix}{name}')
+
+
+def _case_key(source) -> Tuple[str, str]:
+    """(absolute filename, study case name or "") of a case"""
+    if hasattr(source, 'snapshot'):  # CCLFile
+        source = source.filename
+    name = source.name if isinstance(source, CCLStudyCase) else ''
+    if isinstance(source, H5GroupRef) and not name:
+        raise ValueError(f'Cannot index {source!r}. Only cases of a CCLStudy are supported.')
+    return os.path.abspath(os.fspath(source)), name
+
+
+def _object_addresses(filename: str, names: Iterable[str]) -> Dict[str, Union[int, None]]:
+    """Addresses of the trees of study cases in the study file (None if the case is missing).
+    `CCLStudy` replaces the tree of a case by another object if it changes it."""
+    with open_h5(filename) as h5:
+        cases = h5[CASES]
+        return {name: h5py.h5o.get_info(cases[name].id).addr if name in cases else None for name in names}
+
+
+def _handle(filename: str, name: str) -> PATHLIKE:
+    """Filename to pass to `CCLFile` and `CCLHDFGroup`"""
+    return CCLStudyCase(filename, name) if name else pathlib.Path(filename)
+
+
+class CCLQuery:
+    """Query of groups of a `CCLIndexDB`. `where()` and `within()` return a new query with
+    the additional condition. Conditions on numbers are evaluated in SI units.
+
+    Values are compared as follows: a value with unit, e.g. "0.5 [kg s^-1]", is converted to
+    SI and only options with the same dimensions match. Numbers without unit are compared
+    with the SI value of all numeric options. Other strings are compared with the CCL text
+    ("==", "!=" and "glob").
+    """
+
+    def __init__(self, db: "CCLIndexDB", conditions: Tuple[str, ...] = (), params: Tuple = (),
+                 option: Tuple[str, Tuple] = None):
+        self._db = db
+        self._conditions = conditions
+        self._params = params
+        # condition of the first where() on the selected rows, i.e. one row per group. This
+        # lets SQLite search the option index instead of all options of the group type
+        self._option = option
+
+    def __repr__(self):
+        return f'<CCLQuery ({len(self._conditions)} conditions) of {self._db.filename}>'
+
+    def _add(self, condition: str, params: Tuple) -> "CCLQuery":
+        return CCLQuery(self._db, self._conditions + (condition,), self._params + params, self._option)
+
+    @staticmethod
+    def _compare(alias: str, key: str, op: str, value) -> Tuple[str, Tuple]:
+        """SQL condition on the option `key` of table `alias`"""
+        if value is None:
+            return f'{alias}.key = ?', (key,)
+        if op not in _OPERATORS:
+            raise ValueError(f'Invalid operator "{op}". Must be one of {", ".join(_OPERATORS)}')
+        sql_op = _OPERATORS[op]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            typed_value, dims = float(value), None
+        elif op == 'glob':
+            typed_value, dims = None, None
+        else:
+            typed_value, dims = _typed(str(value))
+        if typed_value is None:
+            if op not in ('==', '!=', 'glob'):
+                raise ValueError(f'Operator "{op}" requires a number, not "{value}"')
+            return f'{alias}.key = ? AND {alias}.value {sql_op} ?', (key, str(value))
+        if dims is None or dims == '':
+            return f'{alias}.key = ? AND {alias}.typed_value {sql_op} ?', (key, typed_value)
+        return (f'{alias}.key = ? AND {alias}.dims = ? AND {alias}.typed_value {sql_op} ?',
+                (key, dims, typed_value))
+
+    def where(self, key: str, op: str = '==', value=None) -> "CCLQuery":
+        """Groups having the option `key` which compares to `value`. If `value` is None,
+        the option only needs to exist."""
+        if self._option is None:
+            return CCLQuery(self._db, self._conditions, self._params, self._compare('o', key, op, value))
+        condition, params = self._compare('w', key, op, value)
+        return self._add('EXISTS (SELECT 1 FROM options w WHERE w.case_id = o.case_id '
+                         f'AND w.path = o.path AND {condition})', params)
+
+    def within(self, group_type: str, key: str = None, op: str = '==', value=None) -> "CCLQuery":
+        """Groups inside a group of type `group_type`, e.g. "BOUNDARY", whose option `key`
+        compares to `value`"""
+        condition, params = ('1', ()) if key is None else self._compare('a', key, op, value)
+        return self._add('EXISTS (SELECT 1 FROM options a WHERE a.case_id = o.case_id '
+                         'AND a.group_type = ? AND substr(o.path, 1, length(a.path) + 1) = a.path || \'/\' '
+                         f'AND {condition})', (group_type,) + params)
+
+    def _select(self, columns: str) -> List[Tuple]:
+        conditions, params = self._conditions, self._params
+        if self._option is not None:
+            conditions, params = (self._option[0],) + conditions, self._option[1] + params
+        sql = f'SELECT DISTINCT {columns} FROM options o JOIN cases c ON c.id = o.case_id'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return self._db._execute(f'{sql} ORDER BY c.filename, c.name, o.path', params)
+
+    def paths(self) -> List[Tuple[str, str, str]]:
+        """(filename, study case name or "", group path) of the matching groups"""
+        return [tuple(row) for row in self._select('c.filename, c.name, o.path')]
+
+    def count(self) -> int:
+        """Number of matching groups"""
+        return len(self.paths())
+
+    def groups(self) -> List["CCLHDFGroup"]:
+        """The matching groups"""
+        from .ccl import CCLHDFGroup
+        return [CCLHDFGroup(path, _handle(filename, name)) for filename, name, path in self.paths()]
+
+    def cases(self) -> List["CCLFile"]:
+        """The cases having a matching group"""
+        from .ccl import CCLFile
+        return [CCLFile(_handle(filename, name)) for filename, name in self._select('c.filename, c.name')]
+
+
+class CCLIndexDB:
+    """SQLite index of the CCL options of `.ccl_hdf` files and `CCLStudy` cases.
+
+    Parameters
+    ----------
+    filename: PATHLIKE
+        The SQLite file. It is created if it does not exist. Use ":memory:" for an index
+        which is not stored.
+    watch: bool
+        Index a case again whenever it is written in this process (see
+        `hdfsession.add_write_hook()`)
+    """
+
+    SUFFIX = '.ccl_index'
+
+    def __init__(self, filename: PATHLIKE, watch: bool = True):
+        self.filename = filename if filename == ':memory:' else pathlib.Path(filename)
+        # the write hook may be called from worker threads (e.g. generate_many)
+        self._con = sqlite3.connect(os.fspath(self.filename), check_same_thread=False)
+        self._con.execute('PRAGMA foreign_keys = ON')
+        self._lock = threading.RLock()
+        with self._lock, self._con:
+            self._con.executescript(_SCHEMA)
+            if 'object' not in (row[1] for row in self._con.execute('PRAGMA table_info(cases)')):
+                self._con.execute('ALTER TABLE cases ADD COLUMN object INTEGER')  # older index
+        self._hook = None
+        if watch:
+            ref = weakref.ref(self)
+
+            def _hook(filename):
+                db = ref()
+                if db is None:
+                    remove_write_hook(_hook)
+                else:
+                    db._on_write(filename)
+
+            self._hook = _hook
+            add_write_hook(_hook)
+
+    def __repr__(self):
+        return f'<CCLIndexDB {self.filename} ({len(self)} cases)>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Unregisters the write hook and closes the database"""
+        if self._hook is not None:
+            remove_write_hook(self._hook)
+            self._hook = None
+        self._con.close()
+
+    def _execute(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._con.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM cases')[0][0]
+
+    def __contains__(self, source) -> bool:
+        return bool(self._execute('SELECT 1 FROM cases WHERE filename = ? AND name = ?', _case_key(source)))
+
+    @property
+    def cases(self) -> List[Tuple[str, str]]:
+        """(filename, study case name or "") of the indexed cases"""
+        return [tuple(row) for row in self._execute('SELECT filename, name FROM cases ORDER BY filename, name')]
+
+    def add(self, sources) -> int:
+        """Indexes cases. `sources` may be a `CCLFile`, a `.ccl_hdf` filename, a `CCLStudy`
+        (all its cases) or an iterable of those. Cases are indexed again if they are already
+        in the index. Returns the number of indexed cases."""
+        n = 0
+        for filename, name in self._case_keys(sources):
+            self._index(filename, name)
+            n += 1
+        if n:
+            # statistics for the query planner. Without, it may search the correlated
+            # conditions by the value index, i.e. through the options of all cases
+            with self._lock, self._con:
+                self._con.execute('ANALYZE')
+        return n
+
+    def _case_keys(self, sources) -> Iterator[Tuple[str, str]]:
+        if isinstance(sources, CCLStudy):
+            for name in sources.cases:
+                yield _case_key(CCLStudyCase(sources.filename, name))
+        elif isinstance(sources, (str, os.PathLike)) or hasattr(sources, 'snapshot'):
+            yield _case_key(sources)
+        else:
+            for source in sources:
+                yield from self._case_keys(source)
+
+    def remove(self, source) -> None:
+        """Removes a case from the index"""
+        with self._lock, self._con:
+            self._con.execute('DELETE FROM cases WHERE filename = ? AND name = ?', _case_key(source))
+
+    def _index(self, filename: str, name: str) -> None:
+        """Replaces the rows of a case"""
+        from .ccl import CCLFile
+        st = os.stat(filename)
+        snapshot = CCLFile(_handle(filename, name)).snapshot()
+        address = _object_addresses(filename, [name])[name] if name else None
+        with self._lock, self._con:
+            self._con.execute('DELETE FROM cases WHERE filename = ? AND name = ?', (filename, name))
+            case_id = self._con.execute('INSERT INTO cases (filename, name, size, mtime_ns, object) '
+                                        'VALUES (?, ?, ?, ?, ?)',
+                                        (filename, name, st.st_size, st.st_mtime_ns, address)).lastrowid
+            self._con.executemany('INSERT INTO options VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                  ((case_id,) + row for row in _iter_rows(snapshot)))
+        logger.debug(f'Indexed {filename}{f" ({name})" if name else ""}')
+
+    def _update(self, cases: Iterable[Tuple[str, str]], force: bool) -> int:
+        """Indexes the cases again which changed on disk (or all if `force`). Cases whose
+        file or study case no longer exists are removed."""
+        n = 0
+        for filename, name, size, mtime_ns in cases:
+            try:
+                st = os.stat(filename)
+                if force or (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    self._index(filename, name)
+                    n += 1
+                    if name:
+                        # the other cases of the study are still up to date if they were before
+                        with self._lock, self._con:
+                            self._con.execute('UPDATE cases SET size = ?, mtime_ns = ? WHERE filename = ? '
+                                              'AND size = ? AND mtime_ns = ?',
+                                              (st.st_size, st.st_mtime_ns, filename, size, mtime_ns))
+            except (FileNotFoundError, KeyError):
+                logger.debug(f'Removing {filename}{f" ({name})" if name else ""} from the index')
+                with self._lock, self._con:
+                    self._con.execute('DELETE FROM cases WHERE filename = ? AND name = ?', (filename, name))
+        return n
+
+    def refresh(self) -> int:
+        """Indexes the cases again which changed on disk since they were indexed. Returns
+        the number of indexed cases."""
+        return self._update(self._execute('SELECT filename, name, size, mtime_ns FROM cases'), force=False)
+
+    def _on_write(self, filename: PATHLIKE) -> None:
+        """Write hook. Writing a study file without referring to a case indexes the cases
+        whose tree was replaced or removed."""
+        key = os.path.abspath(os.fspath(filename))
+        if isinstance(filename, CCLStudyCase):
+            rows = self._execute('SELECT filename, name, size, mtime_ns FROM cases WHERE filename = ? AND name = ?',
+                                 (key, filename.name))
+            self._update(rows, force=True)
+            return
+        rows = self._execute('SELECT filename, name, size, mtime_ns, object FROM cases WHERE filename = ?', (key,))
+        if not rows or not rows[0][1]:  # not indexed or a plain file
+            self._update([row[:4] for row in rows], force=True)
+            return
+        try:
+            addresses = _object_addresses(key, [row[1] for row in rows])
+        except FileNotFoundError:
+            addresses = {}
+        changed, unchanged, removed = [], [], []
+        for filename, name, size, mtime_ns, address in rows:
+            if addresses.get(name, None) is None:
+                removed.append(name)
+            elif addresses[name] == address:
+                unchanged.append(name)
+            else:
+                changed.append((filename, name, size, mtime_ns))
+        if removed:
+            logger.debug(f'Removing the cases {removed} of {key} from the index')
+            with self._lock, self._con:
+                self._con.executemany('DELETE FROM cases WHERE filename = ? AND name = ?',
+                                      ((key, name) for name in removed))
+        self._update(changed, force=True)
+        if unchanged:
+            st = os.stat(key)
+            with self._lock, self._con:
+                self._con.executemany('UPDATE cases SET size = ?, mtime_ns = ? WHERE filename = ? AND name = ?',
+                                      ((st.st_size, st.st_mtime_ns, key, name) for name in unchanged))
+
+    def query(self, group_type: str = None, path: str = None) -> CCLQuery:
+        """Query of the groups of type `group_type` (e.g. "BOUNDARY") whose path matches the
+        glob pattern `path`. Add conditions with `CCLQuery.where()` and `CCLQuery.within()`."""
+        q = CCLQuery(self)
+        if group_type is not None:
+            q = q._add('o.group_type = ?', (group_type,))
+        if path is not None:
+            q = q._add('o.path GLOB ?', (path,))
+        return q
@@ -0,0 +1,257 @@
+"""Lazy, memory-mapped reading of large CCL files.
+
+`CCLTextFile` reads and tokenizes all lines and builds the complete group tree. Often only
+one group is needed, e.g. the flow group or one domain. `LazyCCLTextFile` memory-maps the
+file instead and only scans it for the byte offsets of the top level groups. A group is
+parsed when it is accessed: its header and options are tokenized and its sub groups are
+located by scanning its byte range for lines at the indentation of its body. Sub groups are
+again parsed on access. Thus, memory and time scale with the accessed part of the file.
+
+The groups are `CCLGroup` objects whose `sub_groups` is a lazy mapping.
+
+Example
+-------
+with LazyCCLTextFile('huge.ccl') as ccl:
+    domain = ccl['FLOW: Flow Analysis 1/DOMAIN: dom3']
+    domain.data['Location'].value
+"""
+import functools
+import logging
+import mmap
+import pathlib
+import re
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .ccl import CCLGroup, CCLIndex, INTENDATION_STEP, _is_end_marker, _tokenize_ccl
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+_CONTENT_LINE = re.compile(rb'^( *)[^ \t\r\n#]', re.M)
+
+
+@functools.lru_cache(maxsize=64)
+def _line_pattern(indentation: int):
+    """Matches the content lines with exactly `indentation` leading spaces including the
+    preceding line break. A literal prefix is searched much faster than "^" in multiline mode."""
+    return re.compile(b'\n' + b' ' * indentation + rb'([^ \t\r\n#][^\r\n]*)')
+
+
+class _LazyGroups(Mapping):
+    """Sub groups {name: CCLGroup} which are parsed on first access"""
+
+    def __init__(self, ccl_file: "LazyCCLTextFile", spans: Dict[str, Tuple[int, int]]):
+        self._ccl_file = ccl_file
+        self._spans = spans  # name -> byte range of the group (header to END line)
+        self._groups = {}
+
+    def __getitem__(self, name: str) -> CCLGroup:
+        grp = self._groups.get(name, None)
+        if grp is None:
+            start, stop = self._spans[name]
+            grp = self._ccl_file._parse_group(start, stop)
+            self._groups[name] = grp
+        return grp
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __contains__(self, name) -> bool:
+        return name in self._spans
+
+    def __repr__(self):
+        return f'<LazyGroups ({len(self._groups)}/{len(self._spans)} parsed)>'
+
+    @property
+    def parsed(self) -> List[str]:
+        """Names of the groups parsed so far"""
+        return list(self._groups)
+
+
+class LazyCCLTextFile:
+    """Memory-mapped CCL file whose groups are parsed on first access. Use it as a context
+    manager or call `close()` to release the file.
+
+    Parameters
+    ----------
+    filename: PATHLIKE
+        The CCL file
+    verbose: bool
+        Passed to the created `CCLGroup` objects
+    """
+
+    def __init__(self, filename: PATHLIKE, verbose: bool = False):
+        self.filename = pathlib.Path(filename)
+        self.verbose = verbose
+        self.intendation_step = INTENDATION_STEP
+        self._file = None
+        self._mm = b''
+        self._open()
+
+    def __repr__(self):
+        return f'<LazyCCLTextFile "{self.filename}" ({len(self.root_group.sub_groups)} top level groups)>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open(self) -> None:
+        st = self.filename.stat()
+        self.mtime = st.st_mtime
+        self.size = st.st_size
+        self._file = open(self.filename, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b''
+        indentation = self._body_indentation(0, len(self._mm))
+        spans = {} if indentation is None else self._scan(0, len(self._mm), indentation)[1]
+        self.root_group = CCLGroup(self.filename, 0, -1, indentation_length=indentation or 0,
+                                   intendation_step=self.intendation_step, all_lines=[],
+                                   all_indentation=[], name='root', verbose=self.verbose,
+                                   sub_groups=_LazyGroups(self, spans))
+        self._index = None
+
+    def close(self) -> None:
+        """Releases the memory map. Groups parsed so far remain usable."""
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._mm = b''
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def is_outdated(self) -> bool:
+        """Whether the file has changed on disk since it was opened"""
+        st = self.filename.stat()
+        return st.st_mtime != self.mtime or st.st_size != self.size
+
+    def update(self) -> bool:
+        """Maps the file again and drops the parsed groups if it has changed on disk"""
+        if not self.is_outdated:
+            return False
+        logger.debug(f'{self.filename} has changed. Scanning it again.')
+        self.close()
+        self._open()
+        return True
+
+    def keys(self):
+        """Names of the top level groups"""
+        return self.root_group.sub_groups.keys()
+
+    def __getitem__(self, path: str) -> CCLGroup:
+        """Group by its path, e.g. "FLOW: Flow Analysis 1/DOMAIN: Default Domain". Only the
+        groups along the path are parsed."""
+        grp = self.root_group
+        for name in path.split('/'):
+            try:
+                grp = grp.sub_groups[name]
+            except KeyError:
+                raise KeyError(f'No group with path "{path}"') from None
+        return grp
+
+    def get(self, path: str, default=None) -> Union[CCLGroup, None]:
+        """Group by its path or `default`"""
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def get_flow_group(self) -> Union[CCLGroup, None]:
+        """The first FLOW group. Only this group is parsed."""
+        for name in self.keys():
+            if name.split(':', 1)[0] == 'FLOW':
+                return self.root_group.sub_groups[name]
+        return None
+
+    @property
+    def index(self) -> CCLIndex:
+        """Index of the complete tree. Note, that this parses all groups. Like
+        `CCLTextFile.index`, it is not checked for changes of the file (see `update()`)."""
+        if self._index is None:
+            self._index = CCLIndex(self.root_group)
+        return self._index
+
+    def _body_indentation(self, start: int, stop: int) -> Union[int, None]:
+        """Indentation of the first content line in [start, stop) or None if there is none"""
+        m = _CONTENT_LINE.search(self._mm, start, stop)
+        if m is None:
+            return None
+        return len(m.group(1))
+
+    def _is_continuation(self, pos: int) -> bool:
+        """Whether the line at `pos` continues the previous line (trailing backslash)"""
+        end = pos - 1
+        if end > 0 and self._mm[end - 1:end] == b'\r':
+            end -= 1
+        return end > 0 and self._mm[end - 1:end] == b'\\'
+
+    def _lines_at(self, start: int, stop: int, indentation: int) -> Iterator[Tuple[int, int, bytes]]:
+        """Yields start, end and content of the lines in [start, stop) with exactly
+        `indentation` leading spaces. `start` must be the beginning of a line."""
+        pattern = _line_pattern(indentation)
+        if start == 0:  # the first line has no preceding line break
+            if pattern.match(b'\n' + self._mm[:indentation + 1]):
+                end = self._mm.find(b'\n', 0, stop)
+                end = stop if end < 0 else end
+                yield 0, end, self._mm[indentation:end]
+        else:
+            start -= 1
+        for m in pattern.finditer(self._mm, start, stop):
+            yield m.start() + 1, m.end(), m.group(1)
+
+    def _scan(self, start: int, stop: int, indentation: int) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+        """Scans the group body [start, stop) for lines at the body indentation. Returns the
+        offset of the first sub group header (i.e. behind the options) and the byte ranges
+        of the sub groups {name: (start, stop)}"""
+        spans = {}
+        option_stop = None
+        header, header_start = None, None
+        for line_start, line_end, line in self._lines_at(start, stop, indentation):
+            if self._is_continuation(line_start):
+                continue
+            token = line.strip().decode(errors='replace')
+            if header is None:
+                if _is_end_marker(token):
+                    logger.warning(f'Unexpected END at byte {line_start} of {self.filename}. Line is ignored.')
+                elif '=' not in token:
+                    if option_stop is None:
+                        option_stop = line_start
+                    header, header_start = token[:-1] if token.endswith(':') else token, line_start
+            elif _is_end_marker(token):
+                end = self._mm.find(b'\n', line_end, stop)
+                spans[header] = (header_start, stop if end < 0 else end + 1)
+                header = None
+        if header is not None:
+            logger.warning(f'Group "{header}" is not closed in {self.filename}')
+            spans[header] = (header_start, stop)
+        return stop if option_stop is None else option_stop, spans
+
+    def _is_group_end(self, pos: int, stop: int) -> bool:
+        """Whether the line at `pos` is an END marker"""
+        end = self._mm.find(b'\n', pos, stop)
+        return _is_end_marker(self._mm[pos:stop if end < 0 else end].strip().decode(errors='replace'))
+
+    def _parse_group(self, start: int, stop: int) -> CCLGroup:
+        """Parses the header and the options of the group in [start, stop) and locates its
+        sub groups"""
+        header_end = self._mm.find(b'\n', start, stop)
+        header_end = stop if header_end < 0 else header_end + 1
+        m = _CONTENT_LINE.search(self._mm, header_end, stop)
+        if m is None or self._is_group_end(m.start(), stop):  # empty group
+            option_stop, spans = stop, {}
+        else:
+            option_stop, spans = self._scan(header_end, stop, len(m.group(1)))
+        text = self._mm[start:option_stop].decode(errors='replace')
+        lines, _ = _tokenize_ccl(text.splitlines())
+        if len(lines) > 1 and _is_end_marker(lines[-1].strip()):
+            lines.pop()
+        indentation_length = len(lines[0]) - len(lines[0].lstrip(' '))
+        return CCLGroup(self.filename, 0, -1, indentation_length=indentation_length,
+                        intendation_step=self.intendation_step, all_lines=lines,
+                        all_indentation=[(i, len(line) - len(line.lstrip(' '))) for i, line in enumerate(lines)],
+                        verbose=self.verbose, sub_groups=_LazyGroups(self, spans))
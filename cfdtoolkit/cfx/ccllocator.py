@@ -0,0 +1,173 @@
+"""Lookup of the groups of a `.ccl_hdf` file by type and name.
+
+Finding a group like the inlet boundary with `h5tbx.find_one()` walks the whole HDF5 tree
+for every call. `CCLLocator` walks it once and keeps the group paths by type and by name,
+e.g. ("BOUNDARY", "inlet"), so lookups are dictionary accesses. Group names are compared
+case-insensitively and may be glob patterns. The "Boundary Type" of boundaries is kept as
+well to find all inlets or outlets.
+
+The locator is built again if the file changed on disk (size or modification time) or was
+written through `open_h5()` since, e.g. by another wrapper within a session (see
+`hdfsession.write_count()`). Code which creates or deletes groups itself can keep the locator
+valid with `rescan()` and `stamp()` instead, see `CCLFile.set_massflowrate()`.
+
+Example
+-------
+locator = CCLLocator('case.ccl_hdf')
+locator.find('BOUNDARY', boundary_type='INLET')  # paths of all inlets of all flows
+locator.get('DOMAIN', 'Default Domain')
+"""
+import fnmatch
+import os
+from typing import Dict, List, Tuple, Union
+
+import h5py
+
+from .hdfsession import open_h5, write_count
+from ..typing import PATHLIKE
+
+BOUNDARY_TYPE = 'Boundary Type'
+
+
+def _split(path: str) -> Tuple[str, str]:
+    """Group type and lower case name of the last group of `path`, e.g. ("BOUNDARY", "inlet")"""
+    group_type, _, name = path.rsplit('/', 1)[-1].partition(':')
+    return group_type.strip(), name.strip().lower()
+
+
+def _is_pattern(name: str) -> bool:
+    return any(c in name for c in '*?[')
+
+
+class CCLLocator:
+    """Paths of all groups of a `.ccl_hdf` file by group type and name
+
+    Parameters
+    ----------
+    filename: PATHLIKE
+        The HDF5 file (or a `H5GroupRef`)
+    """
+
+    def __init__(self, filename: PATHLIKE):
+        self.filename = filename
+        self._stamp = None
+        self._paths: Dict[str, Union[str, None]] = {}  # path -> boundary type (None for other groups)
+        self._by_type: Dict[str, Dict[str, None]] = {}  # group type -> ordered set of paths
+        self._by_name: Dict[Tuple[str, str], Dict[str, None]] = {}  # (type, lower case name) -> paths
+        self.update()
+
+    def __repr__(self):
+        return f'<CCLLocator {self.filename} ({len(self)} groups)>'
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._paths
+
+    def _stat(self) -> Tuple[int, int, int]:
+        st = os.stat(os.fspath(self.filename))
+        return st.st_mtime_ns, st.st_size, write_count(self.filename)
+
+    @property
+    def is_outdated(self) -> bool:
+        """Whether the file has changed on disk or was written through `open_h5()` since the
+        locator was built or stamped"""
+        return self._stat() != self._stamp
+
+    def stamp(self) -> None:
+        """Marks the locator as up to date with the file, e.g. after writing options only"""
+        self._stamp = self._stat()
+
+    def update(self) -> bool:
+        """Walks the file again if it has changed on disk"""
+        if self._stamp is not None and not self.is_outdated:
+            return False
+        self._paths.clear()
+        self._by_type.clear()
+        self._by_name.clear()
+        with open_h5(self.filename) as h5:
+            self._walk(h5, '')
+        self.stamp()
+        return True
+
+    def _walk(self, grp: h5py.Group, prefix: str) -> None:
+        # explicit recursion: h5py's visit() skips groups linked more than once (see CCLStudy)
+        for name, obj in grp.items():
+            path = f'{prefix}{name}'
+            self.add(path, obj.attrs.get(BOUNDARY_TYPE, None) if name.startswith('BOUNDARY:') else None)
+            self._walk(obj, f'{path}/')
+
+    def add(self, path: str, boundary_type: str = None) -> None:
+        """Registers a group created in the file"""
+        path = path.strip('/')
+        self._paths[path] = None if boundary_type is None else str(boundary_type).upper()
+        key = _split(path)
+        self._by_type.setdefault(key[0], {})[path] = None
+        self._by_name.setdefault(key, {})[path] = None
+
+    def discard(self, path: str) -> None:
+        """Unregisters a group deleted from the file and its sub groups"""
+        path = path.strip('/')
+        prefix = f'{path}/'
+        for p in [p for p in self._paths if p == path or p.startswith(prefix)]:
+            del self._paths[p]
+            key = _split(p)
+            self._by_type[key[0]].pop(p, None)
+            self._by_name[key].pop(p, None)
+
+    def rescan(self, h5: h5py.Group, path: str) -> None:
+        """Registers the group `path` of the open file `h5` and its sub groups again after
+        they were created, replaced or deleted"""
+        path = path.strip('/')
+        self.discard(path)
+        if path in h5:
+            grp = h5[path]
+            self.add(path, grp.attrs.get(BOUNDARY_TYPE, None) if _split(path)[0] == 'BOUNDARY' else None)
+            self._walk(grp, f'{path}/')
+
+    def find(self, group_type: str, name: str = None, within: str = None,
+             boundary_type: str = None) -> List[str]:
+        """Paths of the groups of type `group_type`, e.g. "BOUNDARY".
+
+        Parameters
+        ----------
+        group_type: str
+            Type of the groups, i.e. the part of the group name before ":"
+        name: str
+            Name of the group (part behind ":") or a glob pattern. Case-insensitive.
+        within: str
+            Path of a group which must contain the groups, e.g. a flow
+        boundary_type: str
+            Only boundaries of this type, e.g. "INLET"
+        """
+        self.update()
+        group_type = group_type.upper()
+        if name is None:
+            paths = self._by_type.get(group_type, {})
+        elif _is_pattern(name):
+            pattern = name.lower()
+            paths = [p for p in self._by_type.get(group_type, {}) if fnmatch.fnmatchcase(_split(p)[1], pattern)]
+        else:
+            paths = self._by_name.get((group_type, name.strip().lower()), {})
+        if within is not None:
+            prefix = f'{within.strip("/")}/'
+            paths = [p for p in paths if p.startswith(prefix)]
+        if boundary_type is not None:
+            boundary_type = boundary_type.upper()
+            paths = [p for p in paths if self._paths[p] == boundary_type]
+        return list(paths)
+
+    def get(self, group_type: str, name: str = None, within: str = None) -> str:
+        """Path of the one group of type `group_type` and `name`. Raises a KeyError if there
+        is no or more than one such group."""
+        paths = self.find(group_type, name, within)
+        if len(paths) != 1:
+            what = group_type if name is None else f'{group_type}: {name}'
+            raise KeyError(f'Expected one group "{what}" in {self.filename} but found {len(paths)}')
+        return paths[0]
+
+    def boundary_type(self, path: str) -> Union[str, None]:
+        """The "Boundary Type" of a boundary"""
+        self.update()
+        return self._paths[path.strip('/')]
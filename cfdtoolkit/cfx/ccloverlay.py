@@ -0,0 +1,286 @@
+"""Copy-on-write overlays of a CCL tree for generating many variants of a case.
+
+A `CCLOverlayBase` holds the CCL text of a case together with the line spans of its groups
+and options. It is parsed once. A variant (`CCLOverlay`) is a small dict of patches
+{path: value} over the shared base. Rendering a variant writes the base text with the
+patched spans replaced. The base is neither copied nor parsed again.
+
+Paths are the group names joined by "/" (see `CCLIndex`), option paths are
+"<group path>/<option name>". Patch values:
+
+- str (or number): sets the option. A missing option is added to the group
+- dict: replaces the group with the given options (nested dicts are sub groups). A missing
+  group is added to its parent group
+- None: removes the option or group
+
+Example
+-------
+base = CCLFile('mycase.ccl_hdf').overlay()
+bc = 'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY CONDITIONS'
+for i, speed in enumerate(speeds):
+    base.variant({f'{bc}/MASS AND MOMENTUM': {'Normal Speed': f'{speed} [m s^-1]',
+                                              'Option': 'Normal Speed'},
+                  f'{bc}/FLOW DIRECTION': None,
+                  'LIBRARY/CEL/EXPRESSIONS/Um': '1.5 [m/s]'}).to_ccl(f'variant{i}.ccl')
+"""
+import itertools
+import pathlib
+from typing import Dict, Iterator, List, Tuple, Union
+
+from ..typing import PATHLIKE
+
+PATCH_VALUE = Union[str, int, float, Dict, None]
+
+_OPTION_EDIT = 0  # options are written before the sub groups at the same line
+_GROUP_EDIT = 1
+
+
+class _GroupSpan:
+    """Line numbers of a group in the base text"""
+
+    __slots__ = ('start', 'stop', 'end', 'option_stop', 'options', 'indentation', 'option_indentation')
+
+    def __init__(self, start: int, stop: int, end: int, option_stop: int, options: Dict[str, int],
+                 indentation: int, option_indentation: int):
+        self.start = start  # header line
+        self.stop = stop  # line behind END
+        self.end = end  # END line, i.e. where new sub groups are inserted
+        self.option_stop = option_stop  # line behind the last option, i.e. where new options are inserted
+        self.options = options  # option name -> line
+        self.indentation = indentation  # of the header
+        self.option_indentation = option_indentation  # of options and sub group headers
+
+
+def _indentation(line: str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+def _group_header(name: str) -> str:
+    # e.g. "BOUNDARY: Inlet" or "SOLVER CONTROL:"
+    return name if ':' in name else f'{name}:'
+
+
+def _render_group(name: str, content: Dict, indentation: int, intendation_step: int) -> List[str]:
+    spaces = ' ' * indentation
+    option_spaces = ' ' * (indentation + intendation_step)
+    lines = [f'{spaces}{_group_header(name)}\n']
+    sub_groups = []
+    for k, v in content.items():
+        if isinstance(v, dict):
+            sub_groups.append((k, v))
+        elif v is None:
+            raise ValueError(f'Invalid value None for option "{k}" of new group "{name}"')
+        else:
+            lines.append(f'{option_spaces}{k} = {v}\n')
+    for k, v in sub_groups:
+        lines.extend(_render_group(k, v, indentation + intendation_step, intendation_step))
+    lines.append(f'{spaces}END\n')
+    return lines
+
+
+class CCLOverlayBase:
+    """Parsed base of CCL variants. Create it with `CCLTextFile.overlay()` or
+    `CCLFile.overlay()`.
+
+    Parameters
+    ----------
+    lines: List[str]
+        Logical CCL lines without line breaks (see `_tokenize_ccl`)
+    root_group: CCLGroup
+        The group tree parsed from `lines`
+    intendation_step: int
+        Indentation of new groups relative to their parent
+    raw_lines: List[str], optional
+        Lines as read from the file. If given, unpatched parts are written unchanged
+        (including comments and continued lines), otherwise the logical lines are written.
+    line_numbers: List[int], optional
+        Index of the first raw line of every logical line. Required with `raw_lines`.
+    """
+
+    def __init__(self, lines: List[str], root_group, intendation_step: int = 2,
+                 raw_lines: List[str] = None, line_numbers: List[int] = None):
+        self.intendation_step = intendation_step
+        if raw_lines is None:
+            raw_lines = lines
+            line_numbers = range(len(lines))
+        self.text = ''.join(line if line.endswith('\n') else f'{line}\n' for line in raw_lines)
+        raw_offsets = [0] + list(itertools.accumulate(len(line) if line.endswith('\n') else len(line) + 1
+                                                      for line in raw_lines))
+        # character span of every logical line:
+        self._starts = [raw_offsets[i] for i in line_numbers]
+        self._ends = []
+        for i in line_numbers:
+            while i < len(raw_lines) - 1 and raw_lines[i].rstrip('\n').endswith('\\'):
+                i += 1
+            self._ends.append(raw_offsets[i + 1])
+        self._starts.append(len(self.text))  # insertions behind the last line
+
+        n = len(lines)
+        self._groups: Dict[str, _GroupSpan] = {'': _GroupSpan(0, n, n, 0, {}, 0, 0)}
+        stack = [('', grp) for grp in reversed(list(root_group.sub_groups.values()))]
+        while stack:
+            parent_path, grp = stack.pop()
+            path = f'{parent_path}/{grp.name}' if parent_path else grp.name
+            options = {name: field.line for name, field in grp.data.items()}
+            end = min(grp.end_line, n)
+            indentation = _indentation(lines[grp.grp_line])
+            if options:
+                option_indentation = _indentation(lines[next(iter(options.values()))])
+            else:
+                option_indentation = indentation + intendation_step
+            self._groups[path] = _GroupSpan(grp.grp_line, min(end + 1, n), end,
+                                            grp.grp_line + 1 + len(options), options,
+                                            indentation, option_indentation)
+            stack.extend((path, sub_grp) for sub_grp in reversed(list(grp.sub_groups.values())))
+
+    def __repr__(self):
+        return f'<CCLOverlayBase ({len(self._groups) - 1} groups, {len(self.text)} characters)>'
+
+    def __contains__(self, path: str) -> bool:
+        """Whether the group or option exists in the base"""
+        if path in self._groups:
+            return True
+        group_path, _, name = path.rpartition('/')
+        grp = self._groups.get(group_path, None)
+        return grp is not None and name in grp.options
+
+    @classmethod
+    def from_text_file(cls, ccl_text_file) -> "CCLOverlayBase":
+        """Base from a `CCLTextFile`"""
+        ccl_text_file.update()
+        return cls(ccl_text_file.lines, ccl_text_file.root_group, ccl_text_file.intendation_step,
+                   raw_lines=ccl_text_file._raw_lines, line_numbers=ccl_text_file.line_numbers)
+
+    def variant(self, patches: Dict[str, PATCH_VALUE]) -> "CCLOverlay":
+        """Returns the variant of the base with the given patches {path: value}"""
+        return CCLOverlay(self, patches)
+
+    def render_many(self, variants: Dict[PATHLIKE, Dict[str, PATCH_VALUE]]) -> List[pathlib.Path]:
+        """Writes one CCL file per variant {ccl_filename: patches}"""
+        return [CCLOverlay(self, patches).to_ccl(filename) for filename, patches in variants.items()]
+
+    def _replace(self, start: int, stop: int, kind: int, replacement: str) -> Tuple[int, int, int, str]:
+        """Edit replacing the logical lines [start, stop)"""
+        return self._starts[start], kind, self._ends[stop - 1], replacement
+
+    def _insert(self, line: int, kind: int, insertion: str) -> Tuple[int, int, int, str]:
+        """Edit inserting before the logical line `line`"""
+        return self._starts[line], kind, self._starts[line], insertion
+
+    def _compile(self, patches: Dict[str, PATCH_VALUE]) -> List[Tuple[int, int, int, str]]:
+        """Translates the patches into sorted text edits (start, kind, stop, replacement)"""
+        edits = []
+        for path, value in patches.items():
+            grp = self._groups.get(path, None)
+            if grp is not None:
+                if path == '':
+                    raise ValueError('The root group cannot be patched')
+                if value is None:
+                    edits.append(self._replace(grp.start, grp.stop, _GROUP_EDIT, ''))
+                elif isinstance(value, dict):
+                    name = path.rpartition('/')[2]
+                    edits.append(self._replace(grp.start, grp.stop, _GROUP_EDIT, ''.join(
+                        _render_group(name, value, grp.indentation, self.intendation_step))))
+                else:
+                    raise TypeError(f'"{path}" is a group. Expected a dict or None but got {value!r}')
+                continue
+
+            group_path, _, name = path.rpartition('/')
+            parent = self._groups.get(group_path, None)
+            if parent is None:
+                raise KeyError(f'No group "{group_path}" to apply the patch "{path}" to')
+            if isinstance(value, dict):
+                edits.append(self._insert(parent.end, _GROUP_EDIT, ''.join(
+                    _render_group(name, value, parent.option_indentation, self.intendation_step))))
+                continue
+            line = parent.options.get(name, None)
+            if value is None:
+                if line is None:
+                    raise KeyError(f'Cannot remove "{path}". No such group or option')
+                edits.append(self._replace(line, line + 1, _OPTION_EDIT, ''))
+            elif line is None:
+                edits.append(self._insert(parent.option_stop, _OPTION_EDIT,
+                                          f'{" " * parent.option_indentation}{name} = {value}\n'))
+            else:
+                edits.append(self._replace(line, line + 1, _OPTION_EDIT,
+                                           f'{" " * parent.option_indentation}{name} = {value}\n'))
+        edits.sort(key=lambda e: (e[0], e[1], e[2]))
+        stop = 0
+        for start, _, _stop, _ in edits:
+            if start < stop:
+                raise ValueError('Overlapping patches, e.g. an option patch inside a replaced group. '
+                                 'Patch the group dict instead.')
+            stop = _stop
+        return edits
+
+    def _render(self, edits: List[Tuple[int, int, int, str]]) -> Iterator[str]:
+        text = self.text
+        pos = 0
+        for start, _, stop, replacement in edits:
+            yield text[pos:start]
+            yield replacement
+            pos = stop
+        yield text[pos:]
+
+
+def _merge_patches(patches: Dict[str, PATCH_VALUE], new_patches: Dict[str, PATCH_VALUE]) -> Dict[str, PATCH_VALUE]:
+    """Applies `new_patches` on top of `patches`"""
+    merged = dict(patches)
+    for path, value in new_patches.items():
+        if value is None or isinstance(value, dict):
+            prefix = f'{path}/'
+            for p in [p for p in merged if p.startswith(prefix)]:
+                del merged[p]
+        # a patch inside a group replaced by an earlier patch modifies the group dict:
+        parts = path.split('/')
+        for i in range(len(parts) - 1, 0, -1):
+            group_path = '/'.join(parts[:i])
+            group_value = merged.get(group_path, None)
+            if isinstance(group_value, dict):
+                group_value = _copy_group(group_value)
+                target = group_value
+                for part in parts[i:-1]:
+                    target = target.setdefault(part, {})
+                if value is None:
+                    target.pop(parts[-1], None)
+                else:
+                    target[parts[-1]] = value
+                merged[group_path] = group_value
+                break
+        else:
+            merged[path] = value
+    return merged
+
+
+def _copy_group(content: Dict) -> Dict:
+    return {k: _copy_group(v) if isinstance(v, dict) else v for k, v in content.items()}
+
+
+class CCLOverlay:
+    """A variant of a `CCLOverlayBase` defined by patches {path: value}. The patches are
+    checked against the base when the overlay is created."""
+
+    __slots__ = ('base', 'patches', '_edits')
+
+    def __init__(self, base: CCLOverlayBase, patches: Dict[str, PATCH_VALUE]):
+        self.base = base
+        self.patches = dict(patches)
+        self._edits = base._compile(self.patches)
+
+    def __repr__(self):
+        return f'<CCLOverlay ({len(self.patches)} patches)>'
+
+    def overlay(self, patches: Dict[str, PATCH_VALUE]) -> "CCLOverlay":
+        """Returns a new variant with `patches` applied on top of the patches of this one"""
+        return CCLOverlay(self.base, _merge_patches(self.patches, patches))
+
+    def text(self) -> str:
+        """The CCL text of the variant"""
+        return ''.join(self.base._render(self._edits))
+
+    def to_ccl(self, ccl_filename: PATHLIKE) -> pathlib.Path:
+        """Writes the CCL text of the variant"""
+        ccl_filename = pathlib.Path(ccl_filename)
+        with open(ccl_filename, 'w') as f:
+            f.writelines(self.base._render(self._edits))
+        return ccl_filename
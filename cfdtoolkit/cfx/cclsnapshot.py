@@ -0,0 +1,174 @@
+"""Read-only in-memory mirror of a `.ccl_hdf` file.
+
+`CCLHDFGroup` reads from the file on every access. `CCLSnapshot` loads all groups and
+attributes in one `visititems` pass into an immutable tree with the same navigation API
+(`options`, `keys()`, item and attribute access, `parent`). It can be pickled, e.g. to send
+it to worker processes.
+"""
+import pathlib
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Union
+
+import h5py
+
+from ..typing import PATHLIKE
+
+
+class CCLSnapshotGroup:
+    """Immutable group of a `CCLSnapshot`"""
+
+    __slots__ = ('path', 'filename', '_options', '_sub_groups', '_parent')
+
+    def __init__(self, path: str, filename: PATHLIKE, options: Dict, parent: Union["CCLSnapshotGroup", None]):
+        object.__setattr__(self, 'path', path)
+        object.__setattr__(self, 'filename', filename)
+        object.__setattr__(self, '_options', options)
+        object.__setattr__(self, '_sub_groups', {})
+        object.__setattr__(self, '_parent', parent)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{self.__class__.__name__} is read-only')
+
+    def __delattr__(self, item):
+        raise AttributeError(f'{self.__class__.__name__} is read-only')
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in CCLSnapshotGroup.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            object.__setattr__(self, k, v)
+
+    def __repr__(self):
+        return f'CCLSnapshotGroup {self.path} of file {self.filename}'
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def options(self) -> Mapping:
+        """Attributes of the group (read-only)"""
+        return MappingProxyType(self._options)
+
+    def keys(self) -> List[str]:
+        return list(self._sub_groups.keys())
+
+    def __contains__(self, item) -> bool:
+        return item in self._sub_groups
+
+    def __iter__(self):
+        return iter(self._sub_groups)
+
+    def __len__(self) -> int:
+        return len(self._sub_groups)
+
+    def __getitem__(self, item) -> "CCLSnapshotGroup":
+        grp = self
+        for name in item.strip('/').split('/'):
+            try:
+                grp = grp._sub_groups[name]
+            except KeyError:
+                raise KeyError(f'{item} not found in {self.path}') from None
+        return grp
+
+    def __getattr__(self, item) -> "CCLSnapshotGroup":
+        if item.startswith('_'):
+            raise AttributeError(item)
+        _item = item.replace('_', ' ')
+        for name in (_item, _item.upper()):
+            if name in self._sub_groups:
+                return self._sub_groups[name]
+        raise KeyError(f'{item} not found in {self.path}')
+
+    @property
+    def parent(self) -> "CCLSnapshotGroup":
+        if self._parent is None:
+            return self
+        return self._parent
+
+    def get_parent_path(self) -> str:
+        return self.parent.path
+
+
+def _add_linked_groups(h5: h5py.Group, root: CCLSnapshotGroup, prefix: str, filename: pathlib.Path) -> None:
+    """Adds the groups below `h5` to `root` by walking the links. The content of groups with
+    multiple hard links is read once."""
+    contents = {}  # object id -> (options, [(name, h5py.Group), ...])
+
+    def _content(obj):
+        content = contents.get(obj.id, None)
+        if content is None:
+            content = (dict(obj.attrs.items()), [(k, v) for k, v in obj.items() if isinstance(v, h5py.Group)])
+            contents[obj.id] = content
+        return content
+
+    stack = [(root, '', _content(h5)[1])]
+    while stack:
+        parent, path, sub_groups = stack.pop()
+        for name, obj in sub_groups:
+            options, obj_sub_groups = _content(obj)
+            sub_path = f'{path}/{name}'
+            grp = CCLSnapshotGroup(f'{prefix}{sub_path}', filename, options, parent)
+            parent._sub_groups[name] = grp
+            stack.append((grp, sub_path, obj_sub_groups))
+
+
+class CCLSnapshot(CCLSnapshotGroup):
+    """Root group of the snapshot. Provides the same shortcuts as `CCLFile`
+
+    Example
+    -------
+    snapshot = CCLFile('mycase.ccl_hdf').snapshot()
+    snapshot.flow[0]['SOLVER CONTROL/CONVERGENCE CONTROL'].options['Maximum Number of Iterations']
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f'CCLSnapshot of file {self.filename}'
+
+    @property
+    def flow(self) -> List[CCLSnapshotGroup]:
+        """Returns a list of groups starting with 'FLOW: '"""
+        return [grp for name, grp in self._sub_groups.items() if 'FLOW: ' in name]
+
+    @property
+    def library(self) -> CCLSnapshotGroup:
+        return self['LIBRARY']
+
+    @property
+    def cel(self) -> CCLSnapshotGroup:
+        return self['LIBRARY/CEL']
+
+    @property
+    def expressions(self) -> CCLSnapshotGroup:
+        return self['LIBRARY/CEL/EXPRESSIONS']
+
+    @classmethod
+    def from_hdf(cls, h5: Union[PATHLIKE, h5py.Group]) -> "CCLSnapshot":
+        """Loads all groups and attributes in one `visititems` pass. Note, that `visititems`
+        visits a group with multiple hard links only once. If `h5` itself is such a group
+        (e.g. a case of a `CCLStudy` whose subtrees are shared), the links are walked
+        instead and every shared group is read once."""
+        if not isinstance(h5, h5py.Group):
+            with h5py.File(h5, 'r') as h5file:
+                return cls.from_hdf(h5file)
+        filename = pathlib.Path(h5.file.filename)
+        root = cls(h5.name, filename, dict(h5.attrs.items()), None)
+        prefix = '' if h5.name == '/' else h5.name
+        if h5py.h5o.get_info(h5.id).rc > 1:
+            _add_linked_groups(h5, root, prefix, filename)
+            return root
+        groups = {'': root}
+
+        def _add_group(name, obj):
+            if isinstance(obj, h5py.Group):
+                parent_name, _, basename = name.rpartition('/')
+                parent = groups[parent_name]
+                grp = CCLSnapshotGroup(f'{prefix}/{name}', filename, dict(obj.attrs.items()), parent)
+                parent._sub_groups[basename] = grp
+                groups[name] = grp
+
+        h5.visititems(_add_group)
+        return root
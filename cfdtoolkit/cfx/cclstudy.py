@@ -0,0 +1,276 @@
+"""Study-level container of the CCL trees of many cases.
+
+Every case of a parameter study usually gets its own `.ccl_hdf` file, although most of the
+CCL (library, materials, mesh assembly, solver control) is identical across the study.
+`CCLStudy` stores the CCL trees of all cases in one HDF5 file. Every group is stored once
+per content: "/objects/<hash>" holds the group with the hash of its options and sub groups
+(see `ccldiff.hash_tree()`) and its sub groups are hard links to their objects. A case
+"/cases/<name>" is a hard link to the object of its root group. Hence, identical subtrees
+of all cases (and within a case) are stored once.
+
+Cases are exposed through the `CCLFile` API. Writing to a case (opening it in mode "r+")
+first replaces its tree by a private copy, so other cases sharing the subtrees are not
+changed (copy-on-write per case). `deduplicate()` shares the subtrees of modified cases
+again. Cross-case queries (`values()`, `find_options()`) read every shared group once.
+
+Example
+-------
+study = CCLStudy('study.ccl_study')
+for name, ccl_filename in ccl_files.items():
+    study.add(name, CCLTextFile(ccl_filename))
+study['case_001'].flow[0].max_iterations
+study.values('FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL/Maximum Number of Iterations')
+"""
+import logging
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Union
+
+import h5py
+
+from .ccl import CCLFile, _compile_pattern
+from .ccldiff import CCLDiff, CCLHashNode, diff as ccl_diff, hash_tree
+from .hdfsession import H5GroupRef, H5GroupView, open_h5
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+CASES = 'cases'
+OBJECTS = 'objects'
+
+
+class CCLStudyCase(H5GroupRef):
+    """Reference to a case of a `CCLStudy`. Opening it for writing makes its tree private."""
+
+    def __init__(self, filename: PATHLIKE, name: str):
+        super().__init__(filename, f'/{CASES}/{name}')
+        self.name = name
+
+    def view(self, h5: h5py.File, mode: str) -> H5GroupView:
+        if mode != 'r':
+            _make_private(h5, self.name)
+        return super().view(h5, mode)
+
+
+def _store(objects: h5py.Group, node: CCLHashNode) -> h5py.Group:
+    """Returns the object of the group `node`. Missing objects are written."""
+    key = node.digest.hex()
+    grp = objects.get(key, None)
+    if grp is not None:
+        return grp
+    grp = objects.create_group(key, track_order=True)
+    for name, value in node.options.items():
+        grp.attrs[name] = value
+    for name, sub_node in node.sub_groups.items():
+        grp[name] = _store(objects, sub_node)
+    return grp
+
+
+def _copy_tree(source: h5py.Group, target: h5py.Group) -> None:
+    """Copies options and sub groups. Unlike `h5py.Group.copy()`, groups linked more than
+    once are copied per link. Groups are created with tracked order, which also selects the
+    compact group format (about a third of the size of the default format)."""
+    for name, value in source.attrs.items():
+        target.attrs[name] = value
+    for name, obj in source.items():
+        _copy_tree(obj, target.create_group(name, track_order=True))
+
+
+def _is_shared(grp: h5py.Group) -> bool:
+    return h5py.h5o.get_info(grp.id).rc > 1
+
+
+def _make_private(h5: h5py.File, name: str) -> None:
+    """Replaces the tree of a case by a copy which shares no groups"""
+    cases = h5[CASES]
+    if not _is_shared(cases[name]):
+        return
+    logger.debug(f'Copying the shared CCL tree of case "{name}" before writing')
+    tmp_name = f'.{name}.tmp'
+    _copy_tree(cases[name], cases.create_group(tmp_name, track_order=True))
+    del cases[name]
+    cases.move(tmp_name, name)
+
+
+def _hash_h5(grp: h5py.Group, hashes: Dict) -> CCLHashNode:
+    """Hash tree of an HDF5 group. Nodes of groups with multiple links are built once."""
+    node = hashes.get(grp.id, None)
+    if node is None:
+        node = CCLHashNode({k: str(v) for k, v in grp.attrs.items()},
+                           {k: _hash_h5(v, hashes) for k, v in grp.items()})
+        hashes[grp.id] = node
+    return node
+
+
+class CCLStudy:
+    """HDF5 file holding the CCL trees of many cases with identical subtrees stored once.
+
+    Parameters
+    ----------
+    filename: PATHLIKE
+        The study file. It is created if it does not exist.
+    """
+
+    SUFFIX = '.ccl_study'
+
+    def __init__(self, filename: PATHLIKE):
+        self.filename = pathlib.Path(filename)
+        with open_h5(self.filename, 'a') as h5:
+            h5.require_group(CASES)  # listed alphabetically
+            if OBJECTS not in h5:
+                h5.create_group(OBJECTS, track_order=True)
+
+    def __repr__(self):
+        return f'<CCLStudy {self.filename} ({len(self)} cases)>'
+
+    def __len__(self) -> int:
+        with open_h5(self.filename) as h5:
+            return len(h5[CASES])
+
+    def __contains__(self, name: str) -> bool:
+        with open_h5(self.filename) as h5:
+            return name in h5[CASES]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.cases)
+
+    @property
+    def cases(self) -> List[str]:
+        """Names of the cases"""
+        with open_h5(self.filename) as h5:
+            return list(h5[CASES].keys())
+
+    def __getitem__(self, name: str) -> CCLFile:
+        """The case as `CCLFile`"""
+        if name not in self:
+            raise KeyError(f'No case "{name}" in {self.filename}')
+        return CCLFile(CCLStudyCase(self.filename, name))
+
+    def add(self, name: str, source, overwrite: bool = False) -> CCLFile:
+        """Adds the CCL tree of a case. `source` may be a `CCLTextFile`, a `CCLFile`, a
+        hash tree or a filename accepted by `CCLFile` (.ccl, .ccl_hdf, .def, .res, .cfx).
+        Only groups not yet stored in the study are written."""
+        if '/' in name or name.startswith('.'):
+            raise ValueError(f'Invalid case name "{name}"')
+        if isinstance(source, (str, pathlib.Path)):
+            source = CCLFile(source)
+        node = hash_tree(source)
+        with open_h5(self.filename, 'r+') as h5:
+            cases = h5[CASES]
+            if name in cases:
+                if not overwrite:
+                    raise KeyError(f'Case "{name}" exists in {self.filename} and overwrite is False')
+                del cases[name]
+            cases[name] = _store(h5[OBJECTS], node)
+        return self[name]
+
+    def remove(self, name: str) -> None:
+        """Removes a case. Its objects are kept until `prune()`"""
+        with open_h5(self.filename, 'r+') as h5:
+            del h5[CASES][name]
+
+    def export(self, name: str, filename: PATHLIKE) -> CCLFile:
+        """Writes a case into a separate `.ccl_hdf` file"""
+        filename = pathlib.Path(filename)
+        if filename.suffix != CCLFile.SUFFIX:
+            raise ValueError(f'Unexpected suffix: {filename.suffix}. Must be {CCLFile.SUFFIX}')
+        with open_h5(self.filename) as h5, h5py.File(filename, 'w') as target:
+            _copy_tree(h5[CASES][name], target)
+        return CCLFile(filename)
+
+    def tree(self, name: str) -> CCLHashNode:
+        """Hash tree of a case (see `ccldiff`)"""
+        return self.trees([name])[name]
+
+    def trees(self, names: Iterable[str] = None) -> Dict[str, CCLHashNode]:
+        """Hash trees of the cases (default: all). Shared groups are read once and their
+        nodes are shared by the trees."""
+        return self._trees(names, {})
+
+    def _trees(self, names: Union[Iterable[str], None], hashes: Dict) -> Dict[str, CCLHashNode]:
+        with open_h5(self.filename) as h5:
+            cases = h5[CASES]
+            if names is None:
+                names = list(cases.keys())
+            return {name: _hash_h5(cases[name], hashes) for name in names}
+
+    def diff(self, base: str, other: str) -> CCLDiff:
+        """Structural diff of case `other` compared to case `base`"""
+        trees = self.trees([base, other])
+        return ccl_diff(trees[base], trees[other])
+
+    def values(self, option_path: str, names: Iterable[str] = None) -> Dict[str, Union[str, None]]:
+        """Value of the option "<group path>/<option name>" in every case (None if missing)"""
+        group_path, _, option = option_path.rpartition('/')
+        values = {}
+        with open_h5(self.filename) as h5:
+            cases = h5[CASES]
+            for name in (cases.keys() if names is None else names):
+                grp = cases[name].get(group_path, None) if group_path else cases[name]
+                value = grp.attrs.get(option, None) if isinstance(grp, h5py.Group) else None
+                values[name] = None if value is None else str(value)
+        return values
+
+    def find_options(self, name_pattern: str, path_pattern: str = None,
+                     regex: bool = False) -> Dict[str, Dict[str, str]]:
+        """Options whose name matches `name_pattern` in groups whose path matches
+        `path_pattern` (glob or regular expression, see `CCLIndex.find_options()`) of all
+        cases: {case: {"<group path>/<option name>": value}}"""
+        match_name = _compile_pattern(name_pattern, regex)
+        match_path = None if path_pattern is None else _compile_pattern(path_pattern, regex)
+        found = {}
+        for case, tree in self.trees().items():
+            options = {}
+            stack = [('', tree)]
+            while stack:
+                path, node = stack.pop()
+                if match_path is None or match_path(path):
+                    prefix = f'{path}/' if path else ''
+                    options.update((f'{prefix}{k}', v) for k, v in node.options.items() if match_name(k))
+                prefix = f'{path}/' if path else ''
+                stack.extend((f'{prefix}{k}', sub_node) for k, sub_node in reversed(list(node.sub_groups.items())))
+            found[case] = options
+        return found
+
+    def deduplicate(self) -> int:
+        """Shares the subtrees of cases which were made private by writing to them again.
+        Returns the number of deduplicated cases."""
+        n = 0
+        with open_h5(self.filename, 'r+') as h5:
+            cases = h5[CASES]
+            objects = h5[OBJECTS]
+            for name in list(cases.keys()):
+                if _is_shared(cases[name]):
+                    continue
+                node = _hash_h5(cases[name], {})
+                del cases[name]
+                cases[name] = _store(objects, node)
+                n += 1
+        return n
+
+    def prune(self) -> int:
+        """Deletes the objects no case refers to. Returns the number of deleted objects.
+        Note, that HDF5 does not shrink the file. Use h5repack to reclaim the space."""
+        n = 0
+        with open_h5(self.filename, 'r+') as h5:
+            objects = h5[OBJECTS]
+            while True:
+                # an object is only referenced by /objects if its reference count is 1. deleting
+                # it decrements the counts of its sub groups, which may be unreferenced then
+                unreferenced = [key for key, grp in objects.items() if not _is_shared(grp)]
+                if not unreferenced:
+                    return n
+                for key in unreferenced:
+                    del objects[key]
+                n += len(unreferenced)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of cases, of the groups of all cases and of the stored groups they use"""
+        hashes = {}  # HDF5 object id -> node, i.e. one entry per stored group
+        trees = self._trees(None, hashes)
+        n_groups = 0
+        stack = list(trees.values())
+        while stack:
+            node = stack.pop()
+            n_groups += 1
+            stack.extend(node.sub_groups.values())
+        return {'cases': len(trees), 'groups': n_groups, 'stored_groups': len(hashes)}
@@ -0,0 +1,245 @@
+"""Compact, array-backed representation of a parsed CCL file.
+
+A `CCLGroup` tree keeps references to all lines of the file, a dict of children per group
+and a `CCLDataField` per option. For large cases (or many cases in one process) this costs
+much more memory than the CCL text itself. `CCLTree` stores the same information as a
+struct-of-arrays with all names and values interned into a single string buffer.
+`CCLNode` is a light-weight view on one group providing the `CCLGroup`-like API.
+"""
+import pathlib
+from typing import Dict, List, Union
+
+import numpy as np
+
+from .ccl import CCLDataField, CCLIndex, _is_end_marker, _tokenize_ccl
+from ..typing import PATHLIKE
+
+
+class CCLNode:
+    """View on a group of a `CCLTree`. Has the same navigation API as `CCLGroup`"""
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree: "CCLTree", index: int):
+        self.tree = tree
+        self.index = index
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, CCLNode) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __getitem__(self, item) -> "CCLNode":
+        for ichild in self.tree.children(self.index):
+            if self.tree.group_name(ichild) == item:
+                return CCLNode(self.tree, ichild)
+        raise KeyError(f'{item} not found in {self.name}')
+
+    def __contains__(self, item) -> bool:
+        return item in self.keys()
+
+    def __len__(self) -> int:
+        return len(self.tree.children(self.index))
+
+    def keys(self) -> List[str]:
+        """Names of the sub groups"""
+        return [self.tree.group_name(i) for i in self.tree.children(self.index)]
+
+    @property
+    def name(self) -> str:
+        return self.tree.group_name(self.index)
+
+    @property
+    def group_type(self) -> Union[str, None]:
+        """Type of the group, e.g. "BOUNDARY" for "BOUNDARY: inlet". None for the root group"""
+        if self.index == 0:
+            return None
+        return self.name.split(':', 1)[0]
+
+    @property
+    def parent(self) -> Union["CCLNode", None]:
+        iparent = int(self.tree.parent[self.index])
+        if iparent < 0:
+            return None
+        return CCLNode(self.tree, iparent)
+
+    @property
+    def depth(self) -> int:
+        return int(self.tree.depth[self.index])
+
+    @property
+    def grp_line(self) -> int:
+        return int(self.tree.grp_line[self.index])
+
+    @property
+    def end_line(self) -> int:
+        return int(self.tree.end_line[self.index])
+
+    @property
+    def sub_groups(self) -> Dict[str, "CCLNode"]:
+        return {self.tree.group_name(i): CCLNode(self.tree, i) for i in self.tree.children(self.index)}
+
+    @property
+    def data(self) -> Dict[str, CCLDataField]:
+        """Options of the group. The data fields are created on request and not stored"""
+        tree = self.tree
+        start = int(tree.option_start[self.index])
+        stop = start + int(tree.option_count[self.index])
+        data = {}
+        for iopt in range(start, stop):
+            name = tree.string(tree.option_name[iopt])
+            data[name] = CCLDataField(tree.filename, int(tree.option_line[iopt]), name,
+                                      tree.string(tree.option_value[iopt]))
+        return data
+
+    def option_names(self) -> List[str]:
+        """Names of the options of the group"""
+        tree = self.tree
+        start = int(tree.option_start[self.index])
+        stop = start + int(tree.option_count[self.index])
+        return [tree.string(i) for i in tree.option_name[start:stop]]
+
+
+class CCLTree:
+    """Struct-of-arrays store of a CCL group tree.
+
+    Groups are stored in file order (index 0 is the root group). Per group the parent index,
+    depth, name id, header and END line and the range of its options are stored in integer
+    arrays. Options are stored as name id, value id and line. Ids refer to unique strings
+    which are concatenated into one buffer and located via `string_offsets`.
+
+    Example
+    -------
+    tree = CCLTree.from_file('mycase.ccl')
+    tree.root['FLOW: Flow Analysis 1']['SOLVER CONTROL'].data
+    """
+
+    __slots__ = ('filename', 'buffer', 'string_offsets',
+                 'parent', 'depth', 'name', 'grp_line', 'end_line', 'option_start', 'option_count',
+                 'option_name', 'option_value', 'option_line',
+                 '_child_offsets', '_child_index')
+
+    def __init__(self, filename: Union[PATHLIKE, None], strings: List[str],
+                 parent, depth, name, grp_line, end_line, option_start, option_count,
+                 option_name, option_value, option_line):
+        self.filename = filename
+        self.buffer = ''.join(strings)
+        self.string_offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=self.string_offsets[1:])
+
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.depth = np.asarray(depth, dtype=np.int32)
+        self.name = np.asarray(name, dtype=np.int32)
+        self.grp_line = np.asarray(grp_line, dtype=np.int32)
+        self.end_line = np.asarray(end_line, dtype=np.int32)
+        self.option_start = np.asarray(option_start, dtype=np.int32)
+        self.option_count = np.asarray(option_count, dtype=np.int32)
+        self.option_name = np.asarray(option_name, dtype=np.int32)
+        self.option_value = np.asarray(option_value, dtype=np.int32)
+        self.option_line = np.asarray(option_line, dtype=np.int32)
+
+        # children in CSR layout. stable sort keeps the file order of siblings:
+        n_children = np.bincount(self.parent[1:], minlength=len(self.parent))
+        self._child_offsets = np.zeros(len(self.parent) + 1, dtype=np.int32)
+        np.cumsum(n_children, out=self._child_offsets[1:])
+        self._child_index = (np.argsort(self.parent[1:], kind='stable') + 1).astype(np.int32)
+
+    def __repr__(self):
+        return f'<CCLTree {self.filename} ({len(self)} groups, {len(self.option_name)} options)>'
+
+    def __len__(self) -> int:
+        """Number of groups including the root group"""
+        return len(self.parent)
+
+    def __getitem__(self, index: int) -> CCLNode:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f'Group index {index} out of range')
+        return CCLNode(self, index % len(self))
+
+    @property
+    def root(self) -> CCLNode:
+        return CCLNode(self, 0)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays and the string buffer (approximately)"""
+        arrays = (self.string_offsets, self.parent, self.depth, self.name, self.grp_line, self.end_line,
+                  self.option_start, self.option_count, self.option_name, self.option_value,
+                  self.option_line, self._child_offsets, self._child_index)
+        return sum(a.nbytes for a in arrays) + len(self.buffer.encode())
+
+    def string(self, string_id: int) -> str:
+        """Return the interned string with the given id"""
+        return self.buffer[self.string_offsets[string_id]:self.string_offsets[string_id + 1]]
+
+    def group_name(self, index: int) -> str:
+        return self.string(self.name[index])
+
+    def children(self, index: int) -> np.ndarray:
+        """Indices of the sub groups of group `index`"""
+        return self._child_index[self._child_offsets[index]:self._child_offsets[index + 1]]
+
+    def build_index(self) -> CCLIndex:
+        """Path, group type and option name index (see `CCLIndex`). The index holds a
+        `CCLNode` per group, so keep it only as long as the lookups are needed"""
+        return CCLIndex(self.root)
+
+    def get_flow_group(self) -> Union[CCLNode, None]:
+        for node in self.root.sub_groups.values():
+            if node.group_type == 'FLOW':
+                return node
+
+    @classmethod
+    def from_file(cls, filename: PATHLIKE) -> "CCLTree":
+        """Parse a CCL text file"""
+        filename = pathlib.Path(filename)
+        with open(filename, 'r') as f:
+            lines, _ = _tokenize_ccl(f.readlines())
+        return cls.from_lines(lines, filename)
+
+    @classmethod
+    def from_lines(cls, lines: List[str], filename: PATHLIKE = None) -> "CCLTree":
+        """Build the tree from logical CCL lines in a single pass (see `parse_ccl_lines`).
+        As for `CCLGroup.data`, only options above the first sub group belong to a group."""
+        strings = {}
+
+        def _intern(s: str) -> int:
+            return strings.setdefault(s, len(strings))
+
+        parent, depth, name, grp_line, end_line = [-1], [0], [_intern('root')], [0], [len(lines)]
+        option_start, option_count, has_children = [0], [0], [False]
+        option_name, option_value, option_line = [], [], []
+
+        stack = [0]
+        for iline, line in enumerate(lines):
+            token = line.strip()
+            if _is_end_marker(token):
+                if len(stack) > 1:
+                    end_line[stack.pop()] = iline
+            elif '=' in token:
+                igrp = stack[-1]
+                if has_children[igrp]:
+                    continue
+                key, _, value = token.partition('=')
+                option_name.append(_intern(key.strip()))
+                option_value.append(_intern(value.strip()))
+                option_line.append(iline)
+                option_count[igrp] += 1
+            else:
+                has_children[stack[-1]] = True
+                stack.append(len(parent))
+                parent.append(stack[-2])
+                depth.append(len(stack) - 1)
+                name.append(_intern(token[:-1] if token.endswith(':') else token))
+                grp_line.append(iline)
+                end_line.append(len(lines))
+                option_start.append(len(option_name))
+                option_count.append(0)
+                has_children.append(False)
+
+        return cls(filename, list(strings), parent, depth, name, grp_line, end_line,
+                   option_start, option_count, option_name, option_value, option_line)
@@ -0,0 +1,214 @@
+"""Typed values of CCL options.
+
+CCL stores all option values as text, e.g. "1.5 [m s^-1]", "0.01 [s]", "5" or
+"1.1, 0.205, 0.05". `parse_value()` converts such strings into a `CCLValue` holding the
+number (or tuple of numbers) and a `CCLUnit`. Other strings (options, expressions, names)
+are returned unchanged. Units are interned, i.e. equal unit strings share one object, and
+parsed values are cached per unique string. `str(value)` returns the original text, so
+parsing and writing back round-trips exactly.
+
+Example
+-------
+parse_value('1.5 [m s^-1]').value  # 1.5
+parse_value('1.5 [m s^-1]').unit  # CCLUnit('m s^-1')
+format_value(0.01, 's')  # '0.01 [s]'
+typed_options(CCLTextFile('mycase.ccl'))['LIBRARY/CEL/EXPRESSIONS/Um']
+"""
+import functools
+import re
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from .cclsnapshot import CCLSnapshotGroup
+
+NUMBER = Union[int, float]
+
+_NUMBER_PATTERN = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_QUANTITY = re.compile(rf'\s*({_NUMBER_PATTERN})\s*(?:\[\s*([^\[\]]*?)\s*\])?\s*')
+_INT = re.compile(r'[+-]?\d+')
+
+
+class CCLUnit:
+    """Unit of a CCL value, e.g. "m s^-1". Instances are interned: `CCLUnit('s') is CCLUnit('s')`"""
+
+    __slots__ = ('text',)
+    _units: Dict[str, "CCLUnit"] = {}
+
+    def __new__(cls, text: str):
+        unit = cls._units.get(text, None)
+        if unit is None:
+            unit = super().__new__(cls)
+            object.__setattr__(unit, 'text', text)
+            cls._units[text] = unit
+        return unit
+
+    def __setattr__(self, key, value):
+        raise AttributeError('CCLUnit is read-only')
+
+    def __reduce__(self):
+        return CCLUnit, (self.text,)
+
+    def __repr__(self):
+        return f'CCLUnit({self.text!r})'
+
+    def __str__(self):
+        return self.text
+
+
+class CCLValue:
+    """Number or vector of numbers with an optional unit, parsed from the CCL text `raw`"""
+
+    __slots__ = ('raw', 'value', 'unit')
+
+    def __init__(self, raw: str, value: Union[NUMBER, Tuple[NUMBER, ...]], unit: Union[CCLUnit, None]):
+        object.__setattr__(self, 'raw', raw)
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'unit', unit)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('CCLValue is read-only')
+
+    def __reduce__(self):
+        return CCLValue, (self.raw, self.value, self.unit)
+
+    def __repr__(self):
+        return f'CCLValue({self.value!r}, unit={None if self.unit is None else self.unit.text!r})'
+
+    def __str__(self):
+        return self.raw
+
+    def __eq__(self, other):
+        if isinstance(other, CCLValue):
+            return self.value == other.value and self.unit is other.unit
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.value, self.unit))
+
+    def __float__(self):
+        if self.is_vector:
+            raise TypeError(f'Cannot convert vector "{self.raw}" to float')
+        return float(self.value)
+
+    @property
+    def is_vector(self) -> bool:
+        return isinstance(self.value, tuple)
+
+
+def _parse_number(text: str) -> NUMBER:
+    return int(text) if _INT.fullmatch(text) else float(text)
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def parse_value(text: str) -> Union[CCLValue, str]:
+    """Parses "<number> [unit]" and comma separated lists of those into a `CCLValue`.
+    Other strings are returned unchanged. Results are cached per string."""
+    elements = text.split(',')
+    values = []
+    unit_text = None
+    for i, element in enumerate(elements):
+        m = _QUANTITY.fullmatch(element)
+        if m is None:
+            return text
+        number, _unit_text = m.groups()
+        if i == 0:
+            unit_text = _unit_text
+        elif _unit_text != unit_text:
+            return text  # mixed units
+        values.append(_parse_number(number))
+    unit = None if unit_text is None else CCLUnit(unit_text)
+    if len(values) == 1:
+        return CCLValue(text, values[0], unit)
+    return CCLValue(text, tuple(values), unit)
+
+
+def parse_values(texts: Iterable[str]) -> List[Union[CCLValue, str]]:
+    """Parses many strings. Every unique string is parsed once."""
+    texts = list(texts)
+    parsed = {text: parse_value(text) for text in dict.fromkeys(texts)}
+    return [parsed[text] for text in texts]
+
+
+def _format_number(number: NUMBER) -> str:
+    if isinstance(number, (bool, np.bool_)):
+        raise TypeError(f'Expected a number, not {number!r}')
+    if isinstance(number, (int, np.integer)):
+        return str(int(number))
+    number = float(number)
+    if number.is_integer() and abs(number) < 1e16:
+        return str(int(number))
+    return repr(number)  # shortest string which reads back as the same float
+
+
+def format_value(value: Union[CCLValue, NUMBER, Iterable[NUMBER], str],
+                 unit: Union[CCLUnit, str, None] = None) -> str:
+    """CCL text of a value. A `CCLValue` or a string is returned as is, numbers are written
+    with the shortest exact representation, e.g. `format_value(0.1, 'm s^-1')` returns
+    "0.1 [m s^-1]" and `format_value((0, 0, 1))` returns "0, 0, 1"."""
+    if isinstance(value, CCLValue):
+        return value.raw
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.number)):
+        text = _format_number(value)
+    else:
+        text = ', '.join(_format_number(v) for v in value)
+    if unit is None:
+        return text
+    return f'{text} [{unit}]'
+
+
+def to_array(texts: Iterable[str], unit: Union[CCLUnit, str, None] = None) -> np.ndarray:
+    """Float array of the scalar values of `texts`. Non numeric values and vectors are NaN.
+    If `unit` is given, all numeric values must have this unit."""
+    if isinstance(unit, str):
+        unit = CCLUnit(unit)
+    values = parse_values(texts)
+    array = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        if isinstance(value, CCLValue) and not value.is_vector:
+            if unit is not None and value.unit is not unit:
+                raise ValueError(f'Expected unit "{unit}" but "{value.raw}" has unit "{value.unit}"')
+            array[i] = value.value
+    return array
+
+
+def _iter_options(source, path: str = ''):
+    """Yields ("<group path>/<option name>", text) of all options of a tree"""
+    prefix = f'{path}/' if path else ''
+    if isinstance(source, CCLSnapshotGroup):
+        for name, value in source.options.items():
+            yield f'{prefix}{name}', str(value)
+        for name in source.keys():
+            yield from _iter_options(source[name], f'{prefix}{name}')
+    else:
+        if hasattr(source, 'all_lines'):  # CCLGroup. read the lines without creating CCLDataFields
+            lines = source.all_lines
+            for i in range(source.grp_line + 1, source.end_line):
+                name, sep, value = lines[i].partition('=')
+                if not sep:
+                    break
+                yield f'{prefix}{name.strip()}', value.strip()
+        else:
+            for name, field in source.data.items():
+                yield f'{prefix}{name}', field.value
+        for name, sub_grp in source.sub_groups.items():
+            yield from _iter_options(sub_grp, f'{prefix}{name}')
+
+
+def typed_options(source) -> Dict[str, Union[CCLValue, str]]:
+    """Typed values of all options of a tree {"<group path>/<option name>": value}. `source`
+    may be a `CCLTextFile`, a `CCLFile` (loaded via `snapshot()`), a `CCLGroup`, a `CCLNode`
+    or a `CCLSnapshotGroup`."""
+    if not isinstance(source, CCLSnapshotGroup):
+        if hasattr(source, 'root_group'):  # CCLTextFile
+            source.update()
+            source = source.root_group
+        elif hasattr(source, 'snapshot'):  # CCLFile
+            source = source.snapshot()
+    paths, texts = [], []
+    for path, text in _iter_options(source):
+        paths.append(path)
+        texts.append(text)
+    return dict(zip(paths, parse_values(texts)))
@@ -0,0 +1,594 @@
+"""Offline evaluation of CEL expressions (LIBRARY/CEL/EXPRESSIONS).
+
+`CELExpressions` parses the expressions of a case, builds their dependency graph and
+evaluates them with units and without CFX. Expressions can be overridden by parameters,
+which may be NumPy arrays. Thus a whole parameter sweep is evaluated at once, e.g. to
+check the inlet velocity derived from a Reynolds number before any run is started:
+
+    cel = CELExpressions.from_ccl(CCLFile('mycase.ccl_hdf'))
+    result = cel.evaluate(['Um'], Re=np.linspace(10, 200, 10_000))
+    valid = result['Um'].to('m s^-1') < 2.0
+
+All values are computed in SI units. Expressions using solver data, e.g.
+"ave(Density)@INLET" or "force_x()@REGION:CYLINDER", cannot be evaluated offline unless
+they (or the names they use) are given as parameters.
+"""
+import functools
+import math
+import re
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+import numpy as np
+
+from .cclsnapshot import CCLSnapshotGroup
+
+EXPRESSIONS_PATH = 'LIBRARY/CEL/EXPRESSIONS'
+
+DIMENSIONS = ('kg', 'm', 's', 'K', 'mol', 'A', 'cd')
+DIMENSIONLESS = (0.,) * len(DIMENSIONS)
+
+
+def _dims(kg=0., m=0., s=0., K=0., mol=0., A=0., cd=0.) -> Tuple[float, ...]:
+    return float(kg), float(m), float(s), float(K), float(mol), float(A), float(cd)
+
+
+#: unit symbol: (factor to SI, dimensions)
+UNITS = {
+    '': (1., DIMENSIONLESS),
+    'm': (1., _dims(m=1)), 'km': (1e3, _dims(m=1)), 'cm': (1e-2, _dims(m=1)), 'mm': (1e-3, _dims(m=1)),
+    'um': (1e-6, _dims(m=1)), 'micron': (1e-6, _dims(m=1)), 'in': (0.0254, _dims(m=1)),
+    'ft': (0.3048, _dims(m=1)),
+    's': (1., _dims(s=1)), 'ms': (1e-3, _dims(s=1)), 'min': (60., _dims(s=1)), 'hr': (3600., _dims(s=1)),
+    'h': (3600., _dims(s=1)), 'day': (86400., _dims(s=1)),
+    'kg': (1., _dims(kg=1)), 'g': (1e-3, _dims(kg=1)), 'tonne': (1e3, _dims(kg=1)),
+    'lb': (0.45359237, _dims(kg=1)),
+    'K': (1., _dims(K=1)), 'C': (1., _dims(K=1)),
+    'mol': (1., _dims(mol=1)), 'kmol': (1e3, _dims(mol=1)),
+    'A': (1., _dims(A=1)), 'cd': (1., _dims(cd=1)),
+    'N': (1., _dims(kg=1, m=1, s=-2)), 'kN': (1e3, _dims(kg=1, m=1, s=-2)),
+    'Pa': (1., _dims(kg=1, m=-1, s=-2)), 'kPa': (1e3, _dims(kg=1, m=-1, s=-2)),
+    'MPa': (1e6, _dims(kg=1, m=-1, s=-2)), 'bar': (1e5, _dims(kg=1, m=-1, s=-2)),
+    'atm': (101325., _dims(kg=1, m=-1, s=-2)), 'psi': (6894.757293168, _dims(kg=1, m=-1, s=-2)),
+    'J': (1., _dims(kg=1, m=2, s=-2)), 'kJ': (1e3, _dims(kg=1, m=2, s=-2)),
+    'W': (1., _dims(kg=1, m=2, s=-3)), 'kW': (1e3, _dims(kg=1, m=2, s=-3)),
+    'V': (1., _dims(kg=1, m=2, s=-3, A=-1)),
+    'Hz': (1., _dims(s=-1)),
+    'L': (1e-3, _dims(m=3)), 'l': (1e-3, _dims(m=3)),
+    'rad': (1., DIMENSIONLESS), 'radian': (1., DIMENSIONLESS), 'deg': (math.pi / 180, DIMENSIONLESS),
+    'degree': (math.pi / 180, DIMENSIONLESS), 'rev': (2 * math.pi, DIMENSIONLESS),
+}
+#: offset to absolute temperature of temperature units (only applied if the unit is the only factor)
+TEMPERATURE_OFFSETS = {'C': 273.15}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+
+class CELError(ValueError):
+    """Invalid CEL expression"""
+
+
+class CELSyntaxError(CELError):
+    """The expression cannot be parsed"""
+
+
+class CELUnitError(CELError):
+    """Unknown unit or inconsistent dimensions"""
+
+
+class CELEvaluationError(CELError):
+    """The expression cannot be evaluated offline, e.g. because it uses solver data"""
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_unit(text: str) -> Tuple[float, Tuple[float, ...], float]:
+    """Returns factor to SI, dimensions and offset of a CFX unit string, e.g. "m s^-1",
+    "kg m^-3" or "m/s". A "/" inverts the following factor only."""
+    factor, dims = 1., [0.] * len(DIMENSIONS)
+    tokens = text.replace('/', ' / ').replace('*', ' ').split()
+    invert = False
+    for token in tokens:
+        if token == '/':
+            invert = True
+            continue
+        symbol, _, exponent = token.partition('^')
+        try:
+            exponent = float(exponent) if exponent else 1.
+        except ValueError:
+            raise CELUnitError(f'Invalid exponent in unit "{text}"') from None
+        if invert:
+            exponent, invert = -exponent, False
+        try:
+            symbol_factor, symbol_dims = UNITS[symbol]
+        except KeyError:
+            raise CELUnitError(f'Unknown unit "{symbol}" in "{text}"') from None
+        factor *= symbol_factor ** exponent
+        for i, d in enumerate(symbol_dims):
+            dims[i] += d * exponent
+    offset = TEMPERATURE_OFFSETS.get(text.strip(), 0.)
+    return factor, tuple(dims), offset
+
+
+def _unit_string(dims: Tuple[float, ...]) -> str:
+    parts = []
+    for symbol, d in zip(DIMENSIONS, dims):
+        if d == 1:
+            parts.append(symbol)
+        elif d != 0:
+            parts.append(f'{symbol}^{int(d) if float(d).is_integer() else d}')
+    return ' '.join(parts)
+
+
+class CELQuantity:
+    """Value (number or NumPy array) in SI units with its dimensions"""
+
+    __slots__ = ('value', 'dims')
+
+    def __init__(self, value, dims: Tuple[float, ...] = DIMENSIONLESS):
+        self.value = value
+        self.dims = dims
+
+    @classmethod
+    def from_unit(cls, value, unit: str = '') -> "CELQuantity":
+        """Quantity from a value (or array) given in `unit`, e.g. `from_unit(arr, 'm s^-1')`"""
+        factor, dims, offset = parse_unit(unit)
+        value = np.asarray(value, dtype=float) if not np.isscalar(value) else float(value)
+        return cls(value * factor + offset, dims)
+
+    @property
+    def unit(self) -> str:
+        """SI unit of the value"""
+        return _unit_string(self.dims)
+
+    def to(self, unit: str):
+        """Value in the given unit"""
+        factor, dims, offset = parse_unit(unit)
+        if dims != self.dims:
+            raise CELUnitError(f'Cannot convert [{self.unit}] to [{unit}]')
+        return (self.value - offset) / factor
+
+    def __repr__(self):
+        return f'CELQuantity({self.value!r} [{self.unit}])'
+
+    def __str__(self):
+        return f'{self.value} [{self.unit}]' if self.unit else f'{self.value}'
+
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+   |(?P<unit>\[[^\[\]]*\])
+   |(?P<location>@\s*[A-Za-z_][\w:.]*(?:\ +[A-Za-z_][\w:.]*)*)
+   |(?P<name>[A-Za-z_][\w.]*(?:\ +[A-Za-z_][\w.]*)*)
+   |(?P<op><=|>=|==|!=|&&|\|\||[-+*/^(),<>!])
+)''', re.VERBOSE)
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    """Returns (kind, text, end position) of the tokens"""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if m is None or m.end() == pos:
+            raise CELSyntaxError(f'Unexpected character "{text[pos:].strip()[:1]}" at {pos} in "{text}"')
+        kind = m.lastgroup
+        pos = m.end()
+        tokens.append((kind, m.group(kind), pos))
+    return tokens
+
+
+def call_key(text: str) -> str:
+    """Normalized text of a function call, e.g. "ave(Density)@INLET", used to pass values of
+    calls which need solver data as parameters"""
+    return re.sub(r'\s+', '', text)
+
+
+class _Parser:
+    """Recursive descent parser producing nested tuples:
+    ('num', value, dims), ('name', name), ('call', name, args, location, text),
+    ('neg', x), ('not', x) and ('op', operator, a, b)"""
+
+    _BINARY = (('||',), ('&&',), ('==', '!=', '<', '>', '<=', '>='), ('+', '-'), ('*', '/'))
+
+    def __init__(self, text: str):
+        self.text = text
+        tokens = _tokenize(text)
+        self.tokens = [token[:2] for token in tokens]
+        self.ends = [token[2] for token in tokens]
+        self.pos = 0
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ('end', '')
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _start(self) -> int:
+        """Text position of the next token"""
+        return self.ends[self.pos - 1] if self.pos else 0
+
+    def _expect(self, op: str) -> None:
+        kind, value = self._next()
+        if kind != 'op' or value != op:
+            raise CELSyntaxError(f'Expected "{op}" but found "{value}" in "{self.text}"')
+
+    def parse(self):
+        node = self._binary(0)
+        if self.pos != len(self.tokens):
+            raise CELSyntaxError(f'Unexpected "{self._peek()[1]}" in "{self.text}"')
+        return node
+
+    def _binary(self, level: int):
+        if level == len(self._BINARY):
+            return self._unary()
+        node = self._binary(level + 1)
+        while True:
+            kind, value = self._peek()
+            if kind != 'op' or value not in self._BINARY[level]:
+                return node
+            self.pos += 1
+            node = ('op', value, node, self._binary(level + 1))
+
+    def _unary(self):
+        kind, value = self._peek()
+        if kind == 'op' and value in ('-', '+', '!'):
+            self.pos += 1
+            operand = self._unary()
+            if value == '+':
+                return operand
+            return ('neg' if value == '-' else 'not', operand)
+        return self._power()
+
+    def _power(self):
+        node = self._atom()
+        kind, value = self._peek()
+        if kind == 'op' and value == '^':
+            self.pos += 1
+            node = ('op', '^', node, self._unary())  # right associative
+        return node
+
+    def _atom(self):
+        start = self._start()
+        kind, value = self._next()
+        if kind == 'number':
+            number = float(value)
+            unit_kind, unit = self._peek()
+            if unit_kind == 'unit':
+                self.pos += 1
+                factor, dims, offset = parse_unit(unit[1:-1])
+                return ('num', number * factor + offset, dims)
+            return ('num', number, DIMENSIONLESS)
+        if kind == 'name':
+            if self._peek() == ('op', '('):
+                self.pos += 1
+                args = []
+                if self._peek() != ('op', ')'):
+                    args.append(self._binary(0))
+                    while self._peek() == ('op', ','):
+                        self.pos += 1
+                        args.append(self._binary(0))
+                self._expect(')')
+                location = None
+                if self._peek()[0] == 'location':
+                    location = self._next()[1][1:].strip()
+                text = ' '.join(self.text[start:self.ends[self.pos - 1]].split())
+                return ('call', value, tuple(args), location, text)
+            if self._peek()[0] == 'location':
+                raise CELSyntaxError(f'Unexpected location behind "{value}" in "{self.text}"')
+            return ('name', value)
+        if kind == 'op' and value == '(':
+            node = self._binary(0)
+            self._expect(')')
+            return node
+        raise CELSyntaxError(f'Unexpected "{value or "end of expression"}" in "{self.text}"')
+
+
+def parse_expression(text: str):
+    """Parses a CEL expression into a syntax tree (see `_Parser`)"""
+    return _Parser(text).parse()
+
+
+def _walk(node, names: Set[str], calls: Set[str]) -> None:
+    kind = node[0]
+    if kind == 'name':
+        names.add(node[1])
+    elif kind == 'call':
+        if node[3] is not None or node[1] not in _UNARY_FUNCTIONS and node[1] not in _FUNCTIONS:
+            calls.add(node[4])  # arguments are evaluated by the solver
+            return
+        for arg in node[2]:
+            _walk(arg, names, calls)
+    elif kind in ('neg', 'not'):
+        _walk(node[1], names, calls)
+    elif kind == 'op':
+        _walk(node[2], names, calls)
+        _walk(node[3], names, calls)
+
+
+def _dimensionless(q: CELQuantity, what: str) -> None:
+    if q.dims != DIMENSIONLESS:
+        raise CELUnitError(f'{what} requires a dimensionless argument, not [{q.unit}]')
+
+
+def _same_dims(a: CELQuantity, b: CELQuantity, what: str) -> None:
+    if a.dims != b.dims:
+        raise CELUnitError(f'{what}: inconsistent dimensions [{a.unit}] and [{b.unit}]')
+
+
+def _math_function(func):
+    def _f(x: CELQuantity, name) -> CELQuantity:
+        _dimensionless(x, name)
+        return CELQuantity(func(x.value))
+    return _f
+
+
+_UNARY_FUNCTIONS = {name: _math_function(func) for name, func in (
+    ('sin', np.sin), ('cos', np.cos), ('tan', np.tan), ('asin', np.arcsin), ('acos', np.arccos),
+    ('atan', np.arctan), ('sinh', np.sinh), ('cosh', np.cosh), ('tanh', np.tanh), ('exp', np.exp),
+    ('loge', np.log), ('log10', np.log10), ('int', np.trunc), ('nint', np.rint),
+    ('step', lambda x: np.heaviside(x, 0.5)))}
+
+
+class CELExpressions:
+    """Expressions of a case with their dependency graph.
+
+    Parameters
+    ----------
+    expressions: Mapping[str, str]
+        Expression name -> CEL expression, e.g. {'Um': '1.5 [m/s]', 'Re': 'Um*0.1[m]/nu'}
+
+    Raises
+    ------
+    CELSyntaxError
+        If an expression cannot be parsed
+    """
+
+    def __init__(self, expressions: Mapping[str, str]):
+        self.expressions = dict(expressions)
+        self._trees = {}
+        self._names = {}  # expression -> referenced names
+        self._calls = {}  # expression -> calls which need solver data
+        for name, text in self.expressions.items():
+            try:
+                tree = parse_expression(str(text))
+            except CELSyntaxError as e:
+                raise CELSyntaxError(f'Expression "{name}": {e}') from None
+            names, calls = set(), set()
+            _walk(tree, names, calls)
+            self._trees[name] = tree
+            self._names[name] = names
+            self._calls[name] = calls
+
+    def __repr__(self):
+        return f'<CELExpressions ({len(self.expressions)} expressions)>'
+
+    def __len__(self):
+        return len(self.expressions)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.expressions
+
+    @classmethod
+    def from_ccl(cls, source) -> "CELExpressions":
+        """Expressions of a `CCLTextFile`, `CCLFile`, `CCLSnapshot` or a dict"""
+        if isinstance(source, CCLSnapshotGroup):
+            return cls(source[EXPRESSIONS_PATH].options)
+        if hasattr(source, 'root_group'):  # CCLTextFile
+            grp = source.index.get(EXPRESSIONS_PATH, None)
+            return cls({} if grp is None else {name: f.value for name, f in grp.data.items()})
+        if hasattr(source, 'snapshot'):  # CCLFile
+            return cls.from_ccl(source.snapshot())
+        return cls(source)
+
+    @property
+    def graph(self) -> Dict[str, List[str]]:
+        """Expression -> expressions it depends on directly"""
+        return {name: self.dependencies(name) for name in self.expressions}
+
+    def dependencies(self, name: str) -> List[str]:
+        """Expressions `name` uses directly"""
+        return sorted(n for n in self._names[name] if n in self.expressions)
+
+    def variables(self, name: str) -> List[str]:
+        """Names used by `name` or its dependencies which are no expressions or constants,
+        e.g. solver variables like "t" (see also `solver_functions()`)"""
+        variables = set()
+        for n in self.order([name]):
+            variables.update(v for v in self._names[n] if v not in self.expressions and v not in CONSTANTS)
+        return sorted(variables)
+
+    def solver_functions(self, name: str) -> List[str]:
+        """Function calls used by `name` or its dependencies which need solver data, e.g.
+        "ave(Density)@INLET". Their values may be passed as parameters."""
+        calls = set()
+        for n in self.order([name]):
+            calls.update(self._calls[n])
+        return sorted(calls)
+
+    def order(self, names: Iterable[str] = None) -> List[str]:
+        """Expressions in evaluation order (dependencies first) needed for `names` (default:
+        all). Raises a CELError if the expressions depend on each other cyclically."""
+        if names is None:
+            names = list(self.expressions)
+        order, done, active = [], set(), []
+        for root in names:
+            if root not in self.expressions:
+                raise KeyError(f'No expression "{root}"')
+            stack = [(root, iter(self.dependencies(root)))]
+            if root in done:
+                continue
+            active.append(root)
+            while stack:
+                name, deps = stack[-1]
+                dep = next(deps, None)
+                if dep is None:
+                    stack.pop()
+                    active.pop()
+                    done.add(name)
+                    order.append(name)
+                elif dep in active:
+                    cycle = active[active.index(dep):] + [dep]
+                    raise CELError(f'Cyclic expressions: {" -> ".join(cycle)}')
+                elif dep not in done:
+                    active.append(dep)
+                    stack.append((dep, iter(self.dependencies(dep))))
+        return order
+
+    def evaluate(self, names: Iterable[str] = None, params: Mapping = None,
+                 **kwargs) -> Dict[str, CELQuantity]:
+        """Evaluates expressions.
+
+        Parameters
+        ----------
+        names: Iterable[str]
+            Expressions to evaluate. Default: all which can be evaluated offline
+        params: Mapping
+            Values replacing expressions, solver variables or function calls like
+            "ave(Density)@INLET" by name (use it for names with spaces). Values may be
+            numbers or arrays (dimensionless), `CELQuantity` objects or CEL strings like
+            "1.5 [m/s]"
+        kwargs:
+            Further parameters
+
+        Returns
+        -------
+        Dict[str, CELQuantity]
+            Value of each requested expression
+        """
+        values = {}
+        for name, value in {**(params or {}), **kwargs}.items():
+            if '(' in name:
+                name = call_key(name)
+            if isinstance(value, CELQuantity):
+                values[name] = value
+            elif isinstance(value, str):
+                values[name] = _evaluate(parse_expression(value), {}, self._no_lookup)
+            else:
+                values[name] = CELQuantity.from_unit(value)
+        skip_failed = names is None
+        if names is None:
+            names = [name for name in self.expressions if name not in values]
+        result = {}
+        lookup = functools.partial(self._lookup, values)
+        for name in names:
+            try:
+                result[name] = lookup(name)
+            except CELEvaluationError:
+                if not skip_failed:
+                    raise
+        return result
+
+    def _lookup(self, values: Dict[str, CELQuantity], name: str, _active=()) -> CELQuantity:
+        value = values.get(name, None)
+        if value is not None:
+            return value
+        if name in self.expressions:
+            if name in _active:
+                raise CELError(f'Cyclic expressions: {" -> ".join(_active + (name,))}')
+            value = _evaluate(self._trees[name], values,
+                              lambda n: self._lookup(values, n, _active + (name,)))
+            values[name] = value
+            return value
+        if name in CONSTANTS:
+            return CELQuantity(CONSTANTS[name])
+        raise CELEvaluationError(f'"{name}" is neither an expression nor a parameter '
+                                 f'(solver variable?). Pass it as parameter.')
+
+    @staticmethod
+    def _no_lookup(name: str) -> CELQuantity:
+        if name in CONSTANTS:
+            return CELQuantity(CONSTANTS[name])
+        raise CELEvaluationError(f'Parameter values cannot use the name "{name}"')
+
+
+def _sqrt(x: CELQuantity) -> CELQuantity:
+    return CELQuantity(np.sqrt(x.value), tuple(d / 2 for d in x.dims))
+
+
+def _abs(x: CELQuantity) -> CELQuantity:
+    return CELQuantity(np.abs(x.value), x.dims)
+
+
+def _min(a: CELQuantity, b: CELQuantity) -> CELQuantity:
+    _same_dims(a, b, 'min')
+    return CELQuantity(np.minimum(a.value, b.value), a.dims)
+
+
+def _max(a: CELQuantity, b: CELQuantity) -> CELQuantity:
+    _same_dims(a, b, 'max')
+    return CELQuantity(np.maximum(a.value, b.value), a.dims)
+
+
+def _atan2(y: CELQuantity, x: CELQuantity) -> CELQuantity:
+    _same_dims(y, x, 'atan2')
+    return CELQuantity(np.arctan2(y.value, x.value))
+
+
+def _if(condition: CELQuantity, a: CELQuantity, b: CELQuantity) -> CELQuantity:
+    _dimensionless(condition, 'if')
+    _same_dims(a, b, 'if')
+    return CELQuantity(np.where(np.asarray(condition.value) != 0, a.value, b.value), a.dims)
+
+
+_FUNCTIONS = {'sqrt': _sqrt, 'abs': _abs, 'min': _min, 'max': _max, 'atan2': _atan2, 'if': _if}
+
+
+def _evaluate(node, values: Dict[str, CELQuantity], lookup) -> CELQuantity:
+    kind = node[0]
+    if kind == 'num':
+        return CELQuantity(node[1], node[2])
+    if kind == 'name':
+        return lookup(node[1])
+    if kind == 'neg':
+        x = _evaluate(node[1], values, lookup)
+        return CELQuantity(-x.value, x.dims)
+    if kind == 'not':
+        x = _evaluate(node[1], values, lookup)
+        return CELQuantity(np.where(np.asarray(x.value) == 0, 1., 0.))
+    if kind == 'call':
+        _, name, args, location, text = node
+        value = values.get(call_key(text), None)
+        if value is not None:
+            return value
+        func = _UNARY_FUNCTIONS.get(name, None) if location is None else None
+        if func is not None:
+            if len(args) != 1:
+                raise CELError(f'{name}() takes one argument, not {len(args)}')
+            return func(_evaluate(args[0], values, lookup), name)
+        func = _FUNCTIONS.get(name, None) if location is None else None
+        if func is None:
+            raise CELEvaluationError(f'{text} needs solver data and cannot be evaluated offline. '
+                                     f'Pass its value as parameter.')
+        try:
+            return func(*(_evaluate(arg, values, lookup) for arg in args))
+        except TypeError:
+            raise CELError(f'Invalid number of arguments for {name}()') from None
+
+    _, op, a, b = node
+    a = _evaluate(a, values, lookup)
+    b = _evaluate(b, values, lookup)
+    if op == '*':
+        return CELQuantity(a.value * b.value, tuple(x + y for x, y in zip(a.dims, b.dims)))
+    if op == '/':
+        return CELQuantity(a.value / b.value, tuple(x - y for x, y in zip(a.dims, b.dims)))
+    if op == '^':
+        _dimensionless(b, 'Exponent')
+        if a.dims == DIMENSIONLESS:
+            return CELQuantity(np.power(a.value, b.value))
+        if not np.isscalar(b.value):
+            raise CELUnitError('The exponent of a quantity with unit must not be an array')
+        return CELQuantity(np.power(a.value, b.value), tuple(d * b.value for d in a.dims))
+    if op in ('&&', '||'):
+        _dimensionless(a, op)
+        _dimensionless(b, op)
+        a, b = np.asarray(a.value) != 0, np.asarray(b.value) != 0
+        return CELQuantity(np.where(a & b if op == '&&' else a | b, 1., 0.))
+    _same_dims(a, b, op)
+    if op == '+':
+        return CELQuantity(a.value + b.value, a.dims)
+    if op == '-':
+        return CELQuantity(a.value - b.value, a.dims)
+    compare = {'==': np.equal, '!=': np.not_equal, '<': np.less, '>': np.greater,
+               '<=': np.less_equal, '>=': np.greater_equal}[op]
+    return CELQuantity(np.where(compare(a.value, b.value), 1., 0.))
@@ -11,7 +11,7 @@ logger = logging.getLogger(__package__)
 class CFXDefFile(CFXFile):
     """Class wrapped around the *.def case file"""
 
-    def __init__(self, filename):
+    def __init__(self, filename, force: bool = False):
         super().__init__(filename)
         if not self.filename.exists():
             logger.info('No .def file exists for the case. Creating one...')
@@ -24,9 +24,11 @@ class CFXDefFile(CFXFile):
 
         # now, the def file exists for sure. but is it up-to-date?
         if self.filename.stat().st_mtime < self.get_cfx_filename().stat().st_mtime:
-            logger.info(f'The .def file is out of date ({self.filename.stat().st_mtime} < '
-                        f'{self.get_cfx_filename().stat().st_mtime}. Creating a new one...')
-            self.filename = session.cfx2def(self.get_cfx_filename(), self.filename)
+            logger.info(f'The .def file is older than the .cfx file ({self.filename.stat().st_mtime} < '
+                        f'{self.get_cfx_filename().stat().st_mtime}. Updating it...')
+            self.filename = session.cfx2def(self.get_cfx_filename(), self.filename, force=force)
+        elif force:
+            self.filename = session.cfx2def(self.get_cfx_filename(), self.filename, force=True)
 
     def get_cfx_filename(self):
         """Generates the .cfx filename from the .def filename"""
@@ -0,0 +1,274 @@
+"""Shared HDF5 file handles.
+
+The CCL wrapper classes (`CCLHDFGroup` and friends) open the HDF5 file for every access.
+Within a `HDFSession` all of them use the one handle opened by the session instead, so
+reading or writing many values costs a single open/close and writes are flushed at once
+when the session ends. Sessions belong to the thread which entered them; other threads
+open the file themselves:
+
+    with ccl.session('r+'):
+        flow = ccl.flow[0]
+        flow.max_iterations = 100
+        flow.min_iterations = 10
+
+Functions registered with `add_write_hook()` are called with the filename after a file was
+opened for writing, i.e. when a writing `open_h5()` context or the outermost writing session
+ends. E.g. `cclindexdb.CCLIndexDB` uses it to update its index. `write_count()` counts the
+writing `open_h5()` contexts of a file, also those within a session, whose changes are not on
+disk yet. E.g. `ccllocator.CCLLocator` uses it to notice groups created or deleted through
+another wrapper of the same file.
+"""
+import contextlib
+import logging
+import os
+import pathlib
+import threading
+from typing import Callable, Dict, List, Union
+
+import h5py
+
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+_LOCAL = threading.local()
+_WRITE_HOOKS: List[Callable[[PATHLIKE], None]] = []
+_WRITE_COUNTS: Dict[str, int] = {}
+_WRITE_COUNTS_LOCK = threading.Lock()
+
+
+def add_write_hook(hook: Callable[[PATHLIKE], None]) -> None:
+    """Registers `hook(filename)`, which is called after `filename` was opened for writing"""
+    if hook not in _WRITE_HOOKS:
+        _WRITE_HOOKS.append(hook)
+
+
+def remove_write_hook(hook: Callable[[PATHLIKE], None]) -> None:
+    """Unregisters a hook added by `add_write_hook()`"""
+    if hook in _WRITE_HOOKS:
+        _WRITE_HOOKS.remove(hook)
+
+
+def _written(filename: PATHLIKE) -> None:
+    """Calls the write hooks. Errors of hooks are logged and do not fail the write."""
+    for hook in list(_WRITE_HOOKS):
+        try:
+            hook(filename)
+        except Exception as e:
+            logger.warning(f'Write hook {hook} failed for {filename}: {e}')
+
+
+def write_count(filename: PATHLIKE) -> int:
+    """Number of writing `open_h5()` contexts on `filename` which have ended"""
+    return _WRITE_COUNTS.get(_session_key(filename), 0)
+
+
+def _count_write(filename: PATHLIKE) -> None:
+    key = _session_key(filename)
+    with _WRITE_COUNTS_LOCK:
+        _WRITE_COUNTS[key] = _WRITE_COUNTS.get(key, 0) + 1
+
+
+def _sessions() -> Dict[str, "HDFSession"]:
+    """Active sessions of the current thread: absolute filename -> session"""
+    try:
+        return _LOCAL.sessions
+    except AttributeError:
+        _LOCAL.sessions = {}
+        return _LOCAL.sessions
+
+
+def _session_key(filename: PATHLIKE) -> str:
+    return os.path.abspath(os.fspath(filename))
+
+
+class HDFSession:
+    """Keeps an HDF5 file open while the context is active and lets `open_h5()` return its
+    handle. Nested sessions on the same file share the handle of the outermost session."""
+
+    def __init__(self, filename: PATHLIKE, mode: str = 'r'):
+        if mode not in ('r', 'r+', 'a'):
+            raise ValueError(f'Invalid session mode "{mode}". Must be "r", "r+" or "a"')
+        self.filename = filename
+        self.mode = mode
+        self._key = _session_key(filename)
+        self._h5 = None
+        self._outer = None
+
+    def __repr__(self):
+        state = 'open' if self.is_open else 'closed'
+        return f'<HDFSession {self.filename} (mode={self.mode}, {state})>'
+
+    def __enter__(self):
+        outer = _sessions().get(self._key, None)
+        if outer is not None:
+            _check_writable(outer, self.mode)
+            self._outer = outer
+            self._h5 = outer.h5
+        else:
+            self._h5 = h5py.File(self.filename, self.mode)
+            _sessions()[self._key] = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._outer is None:
+            try:
+                if self._h5.mode == 'r+':
+                    self._h5.flush()
+                self._h5.close()
+            finally:
+                del _sessions()[self._key]
+            if self.mode != 'r':
+                _written(self.filename)
+        self._h5 = None
+        self._outer = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._h5 is not None
+
+    @property
+    def h5(self) -> h5py.File:
+        """The open file handle"""
+        if self._h5 is None:
+            raise RuntimeError(f'Session on {self.filename} is not active. Use it as a context manager.')
+        return self._h5
+
+    def flush(self) -> None:
+        """Writes buffered changes to disk"""
+        self.h5.flush()
+
+
+def _check_writable(session: HDFSession, mode: str) -> None:
+    if mode != 'r' and session.mode == 'r':
+        raise ValueError(f'{session.filename} is opened read-only by the active session. '
+                         f'Open the session with mode "r+" to write.')
+
+
+class H5GroupRef(os.PathLike):
+    """Reference to an HDF5 group used in place of a filename. `open_h5()` opened on it
+    returns a view of the group as if it were the root group of a file. Hence, the CCL
+    wrapper classes (`CCLFile`, `CCLHDFGroup`, ...) work on a group inside a larger file,
+    e.g. on a case of a `CCLStudy`. `os.fspath()` returns the filename, so sessions are
+    shared with all references into the same file."""
+
+    def __init__(self, filename: PATHLIKE, group: str):
+        self.filename = pathlib.Path(filename)
+        self.group = group
+
+    def __fspath__(self) -> str:
+        return os.fspath(self.filename)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({str(self.filename)!r}, {self.group!r})'
+
+    def __str__(self):
+        return f'{self.filename}:{self.group}'
+
+    def __eq__(self, other):
+        if isinstance(other, H5GroupRef):
+            return self.filename == other.filename and self.group == other.group
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.filename, self.group))
+
+    @property
+    def stem(self) -> str:
+        """Name of the group"""
+        return self.group.rstrip('/').rsplit('/', 1)[-1]
+
+    @property
+    def parent(self) -> pathlib.Path:
+        """Directory of the file"""
+        return self.filename.parent
+
+    def view(self, h5: h5py.File, mode: str) -> "H5GroupView":
+        """Returns the view of the group in the open file `h5`.
+
+        `mode` is the mode `open_h5()` was called with. It is not used here and is a hook for
+        subclasses which prepare the group for writing (see `cclstudy.CCLStudyCase`). Like a
+        plain filename, the view is as writable as `h5`, which may be the handle of a writing
+        session even if `mode` is "r"."""
+        return H5GroupView(h5[self.group])
+
+
+class H5GroupView:
+    """An HDF5 group seen as the root group of a file: paths (also absolute ones) are
+    resolved relative to the group. Other attributes are those of the group."""
+
+    def __init__(self, group: h5py.Group):
+        self._group = group
+
+    def __repr__(self):
+        return f'<H5GroupView of {self._group.name}>'
+
+    @staticmethod
+    def _relative(name: str) -> str:
+        return name.lstrip('/') or '.'
+
+    def __getitem__(self, name: str):
+        return self._group[self._relative(name)]
+
+    def __contains__(self, name: str) -> bool:
+        name = self._relative(name)
+        return name == '.' or name in self._group
+
+    def __delitem__(self, name: str):
+        del self._group[self._relative(name)]
+
+    def __iter__(self):
+        return iter(self._group)
+
+    def __len__(self):
+        return len(self._group)
+
+    def move(self, source: str, dest: str) -> None:
+        self._group.move(self._relative(source), self._relative(dest))
+
+    def __getattr__(self, item):
+        return getattr(self._group, item)
+
+
+def _root(filename: PATHLIKE, h5: h5py.File, mode: str):
+    """The file or the view of the referenced group"""
+    if isinstance(filename, H5GroupRef):
+        return filename.view(h5, mode)
+    return h5
+
+
+def active_session(filename: PATHLIKE) -> Union[HDFSession, None]:
+    """Returns the active session of the current thread on the file or None"""
+    sessions = _sessions()
+    if not sessions:
+        return None
+    return sessions.get(_session_key(filename), None)
+
+
+@contextlib.contextmanager
+def open_h5(filename: PATHLIKE, mode: str = 'r', cls=h5py.File):
+    """Opens `filename` like `cls(filename, mode)`. If a session on the file is active, its
+    handle is returned instead and not closed when the context ends. If `filename` is an
+    `H5GroupRef`, the view of the referenced group is returned."""
+    session = active_session(filename)
+    if session is None:
+        opened = False
+        try:
+            with cls(os.fspath(filename), mode) as h5:
+                opened = True
+                yield _root(filename, h5, mode)
+        finally:
+            if opened and mode != 'r':
+                _count_write(filename)
+                _written(filename)
+    else:
+        _check_writable(session, mode)
+        try:
+            if cls is h5py.File:
+                yield _root(filename, session.h5, mode)
+            else:
+                # e.g. h5rdmtoolbox.File on the same file id. Must not be closed:
+                yield _root(filename, cls(session.h5.id), mode)
+        finally:
+            if mode != 'r':
+                _count_write(filename)
@@ -4,7 +4,9 @@ import os
 import subprocess
 from enum import Enum
 from pathlib import Path
+from typing import List, Tuple, Union
 
+from .asyncproc import run_async
 from .. import CFX_DOTENV_FILENAME
 
 dotenv.load_dotenv(CFX_DOTENV_FILENAME)
@@ -47,10 +49,8 @@ class MonitorCategory(Enum):
         return f'{self.name.replace("_", " ")}'
 
 
-def get_monitor_data_by_category(target: Path, category: MonitorCategory = MonitorCategory.ALL,
-                                 out: Path = 'userpoints.csv', units: bool = True) -> Path:
-    """writes monitor data from a *.res or *.dir file to *.out file using the same base name"""
-
+def _monitor_data_args(target: Path, category: MonitorCategory, out: Path,
+                       units: bool) -> Tuple[List[str], Path]:
     target_filename = Path(target)
 
     if target_filename.suffix not in ('.res', '.dir'):
@@ -63,22 +63,38 @@ def get_monitor_data_by_category(target: Path, category: MonitorCategory = Monit
     else:
         out_filename = Path(out)
 
-    _units = ''
+    args = [str(CFX5MONDATA), f'-{target_filename.suffix[1:]}', str(target_filename)]
+    if category is not MonitorCategory.ALL:
+        args += ['-varrule', f'CATEGORY = {str(category).replace("_", " ")}']
+    args += ['-out', str(out_filename)]
     if units:
-        _units = '-units'
-
-    if category.value:  # ==1 ==ALL
-        cmd = f'"{CFX5MONDATA}" -{target_filename.suffix[1:]} "{target_filename}" -out' \
-              f' "{out_filename}" {_units}'
-    else:
-        cmd = f'"{CFX5MONDATA}" -{target_filename.suffix[1:]} "{target_filename}" ' \
-              f'-varrule "CATEGORY = {str(category).replace("_", " ")}" -out {out_filename} {_units}'
+        args.append('-units')
 
     logger.info(f'Generating user points file from "{target_filename.name}"')
-    logger.debug(f'Generating user points file with bash str: {cmd}')
+    logger.debug(f'Generating user points file with: {args}')
+    return args, out_filename
+
+
+def get_monitor_data_by_category(target: Path, category: MonitorCategory = MonitorCategory.ALL,
+                                 out: Path = 'userpoints.csv', units: bool = True) -> Path:
+    """writes monitor data from a *.res or *.dir file to *.out file using the same base name"""
+    args, out_filename = _monitor_data_args(target, category, out, units)
+    subprocess.run(args)
+    if not out_filename.exists():
+        raise RuntimeError(f'Failed running "{" ".join(args)}"')
 
-    subprocess.run(cmd, shell=True)
+    return out_filename
+
+
+async def get_monitor_data_by_category_async(target: Path, category: MonitorCategory = MonitorCategory.ALL,
+                                             out: Path = 'userpoints.csv', units: bool = True,
+                                             timeout: Union[float, None] = None) -> Path:
+    """Coroutine of `get_monitor_data_by_category()`. cfx5mondata is killed after `timeout`
+    seconds or if the task is cancelled."""
+    args, out_filename = _monitor_data_args(target, category, out, units)
+    completed_process = await run_async(args, timeout=timeout)
     if not out_filename.exists():
-        raise RuntimeError(f'Failed running bash script "{cmd}"')
+        raise RuntimeError(f'Failed running "{" ".join(args)}" (return code {completed_process.returncode}): '
+                           f'{completed_process.stderr.decode(errors="replace").strip()}')
 
     return out_filename
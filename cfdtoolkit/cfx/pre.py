@@ -36,8 +36,9 @@ class CFXPre(CFXExe):
             cmd += f' -maxet \"{int(timeout_s)} [s]\"'  # e.g. maxet='10 [min]'
         return cmd
 
-    def write_def(self, target_dir: pathlib.Path = None) -> solve.CFXSolve:
-        """Write definition file"""
+    def write_def(self, target_dir: pathlib.Path = None, force: bool = False) -> solve.CFXSolve:
+        """Write definition file. Skipped if the existing one was written from a semantically
+        identical case file unless `force` is True"""
         if target_dir is not None:
             target_dir = pathlib.Path(target_dir)
             if not target_dir.is_dir():
@@ -50,7 +51,8 @@ class CFXPre(CFXExe):
             cfx2def(
                 self.filename,
                 def_filename,
-                ansys_version=self.version
+                ansys_version=self.version,
+                force=force
             )
         )
 
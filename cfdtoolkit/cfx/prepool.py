@@ -0,0 +1,280 @@
+"""Pool of warm cfx5pre processes.
+
+`session.play_session()` starts cfx5pre for every session file, and the startup usually
+takes much longer than the work of the session. `CFXPreWorkerPool` keeps `n_workers`
+processes of `cfx5pre -line` running and sends the sessions to their stdin. The end of a
+session is detected by a sentinel which the session prints last (a Perl line
+`! print "<sentinel>\n";`). Steps are checked by their output files as in
+`session.SessionComposer`. Workers which died or timed out are started again. A session is
+only sent again to the new worker if it never reached the old one or if `retries` is set.
+
+Example
+-------
+with CFXPreWorkerPool(n_workers=4) as pool:
+    futures = [pool.cfx2def(cfx_filename) for cfx_filename in cfx_filenames]
+    def_filenames = [f.result() for f in futures]
+"""
+import concurrent.futures
+import logging
+import os
+import pathlib
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, List, Union
+
+from . import casehash
+from .session import ANSYSVERSION, CFX5PRE, SessionComposer, SessionStep
+from .utils import NEW_PROCESS_GROUP, change_suffix, kill_process_group
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+
+class _WorkerDied(RuntimeError):
+    """The cfx5pre process ended while running a session"""
+
+
+class _SessionNotSent(_WorkerDied):
+    """The cfx5pre process ended before it received the session"""
+
+
+class _PreWorker:
+    """A `cfx5pre -line` process. Its output is read into a queue by a thread, so reading
+    can time out."""
+
+    def __init__(self, cfx5pre: pathlib.Path, name: str):
+        self.cfx5pre = cfx5pre
+        self.name = name
+        self.process = None
+        self.n_started = 0
+        self._lines = None
+
+    def __repr__(self):
+        return f'<_PreWorker {self.name} ({"alive" if self.is_alive else "stopped"})>'
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        self.stop()
+        self.process = subprocess.Popen([str(self.cfx5pre), '-line'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, bufsize=1, **NEW_PROCESS_GROUP)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.process.stdout, self._lines), daemon=True).start()
+        self.n_started += 1
+        logger.debug(f'Started {self.name} (pid {self.process.pid})')
+
+    @staticmethod
+    def _read(stdout, lines: queue.Queue) -> None:
+        for line in stdout:
+            lines.put(line)
+        lines.put(None)  # end of output
+
+    def stop(self, timeout: float = 10) -> None:
+        """Closes stdin, which ends cfx5pre, and kills the processes if they do not end"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            pass
+        self.kill()
+
+    def kill(self) -> None:
+        """Kills cfx5pre and the processes it started"""
+        if self.process is not None:
+            kill_process_group(self.process.pid)
+            self.process.wait()
+            self.process = None
+
+    def execute(self, text: str, timeout: Union[float, None]) -> List[str]:
+        """Sends the session `text` and returns the output lines until the sentinel"""
+        sentinel = f'CFDTOOLKIT-DONE-{uuid.uuid4().hex}'
+        try:
+            self.process.stdin.write(f'{text}\n! print "{sentinel}\\n";\n')
+            self.process.stdin.flush()
+        except OSError as e:
+            raise _SessionNotSent(f'{self.name} cannot receive the session: {e}') from None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=None if deadline is None else max(0., deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f'{self.name} did not finish the session within {timeout} s') from None
+            if line is None:
+                raise _WorkerDied(f'{self.name} ended with exit code {self.process.wait()}. '
+                                  f'Output:\n{"".join(output[-20:])}')
+            if sentinel in line and 'print' not in line:  # not the echo of the command
+                return output
+            output.append(line)
+
+
+class CFXPreWorkerPool:
+    """Runs cfx5pre sessions on `n_workers` warm `cfx5pre -line` processes.
+
+    Parameters
+    ----------
+    n_workers: int
+        Number of cfx5pre processes
+    cfx5pre: PATHLIKE
+        Path to the cfx5pre executable. Default takes the path from the config file
+    ansys_version: str
+        Version written into the COMMAND FILE header of the sessions
+    timeout: float
+        Maximum time of a session in seconds. The worker is killed and started again if the
+        session takes longer. None waits forever.
+    retries: int
+        Number of times a session is sent again if the worker died while running it. The
+        session runs again from the start, so only use it for idempotent sessions. A session
+        which never reached the worker is always sent once more.
+    """
+
+    def __init__(self, n_workers: int = 2, cfx5pre: Union[PATHLIKE, None] = None,
+                 ansys_version: str = ANSYSVERSION, timeout: Union[float, None] = None, retries: int = 0):
+        cfx5pre = CFX5PRE if cfx5pre is None else pathlib.Path(cfx5pre)
+        if not cfx5pre.exists():
+            raise FileExistsError(f'Could not find cfx5pre exe here: {cfx5pre}')
+        self.ansys_version = ansys_version
+        self.timeout = timeout
+        self.retries = retries
+        self._jobs = queue.Queue()
+        self._closed = False
+        self.workers = [_PreWorker(cfx5pre, f'cfx5pre-{i}') for i in range(n_workers)]
+        self._threads = [threading.Thread(target=self._serve, args=(worker,), daemon=True)
+                         for worker in self.workers]
+        for thread in self._threads:
+            thread.start()
+
+    def __repr__(self):
+        alive = sum(worker.is_alive for worker in self.workers)
+        return f'<CFXPreWorkerPool ({alive}/{len(self.workers)} workers alive)>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Finishes the submitted sessions and ends the workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _serve(self, worker: _PreWorker) -> None:
+        try:
+            worker.start()  # warm up before the first session
+        except OSError as e:
+            logger.error(f'Could not start {worker.name}: {e}')
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                worker.stop()
+                return
+            composer, result, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                steps = self._run(worker, composer)
+                future.set_result(steps if result is None else result(steps))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _run(self, worker: _PreWorker, composer: SessionComposer) -> List[SessionStep]:
+        mtimes = composer._output_mtimes()
+        text = composer.render()
+        error = None
+        retries, resent = self.retries, False
+        while True:
+            if not worker.is_alive:
+                if worker.n_started:
+                    logger.warning(f'{worker.name} is not running. Starting it again.')
+                worker.start()
+            try:
+                worker.execute(text, self.timeout)
+                error = None
+                break
+            except _SessionNotSent as e:
+                # nothing of the session ran, so it is safe to send it again
+                error = e
+                logger.warning(str(e))
+                if resent:
+                    break
+                resent = True
+            except _WorkerDied as e:
+                error = e
+                logger.warning(str(e))
+                if retries == 0:
+                    break
+                retries -= 1
+            except TimeoutError:
+                worker.kill()
+                raise
+        return composer._check_outputs(mtimes, error, check=True)
+
+    def submit(self, composer: SessionComposer,
+               result: Callable[[List[SessionStep]], object] = None) -> concurrent.futures.Future:
+        """Runs the steps of `composer` on the next free worker. The future returns the
+        checked steps (or `result(steps)`) and raises like `SessionComposer.run()`."""
+        if self._closed:
+            raise RuntimeError('The pool is closed')
+        future = concurrent.futures.Future()
+        self._jobs.put((composer, result, future))
+        return future
+
+    def _composer(self) -> SessionComposer:
+        return SessionComposer(ansys_version=self.ansys_version)
+
+    def importccl(self, cfx_filename: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None) -> concurrent.futures.Future:
+        """Imports a .ccl file into a .cfx file (see `session.importccl()`). The future
+        returns the .cfx filename."""
+        composer = self._composer()
+        composer.importccl(cfx_filename, ccl_filename)
+        return self.submit(composer, lambda steps: pathlib.Path(cfx_filename))
+
+    def change_timestep(self, cfx_filename: PATHLIKE, timestep: float) -> concurrent.futures.Future:
+        """Changes the timestep in a .cfx file (see `session.change_timestep()`)"""
+        composer = self._composer()
+        composer.change_timestep(cfx_filename, timestep)
+        return self.submit(composer, lambda steps: pathlib.Path(cfx_filename))
+
+    def cfx2def(self, cfx_filename: PATHLIKE, def_filename: Union[PATHLIKE, None] = None,
+                force: bool = False) -> concurrent.futures.Future:
+        """Writes the solver file (see `session.cfx2def()`). Skipped if the def file was
+        written from a semantically identical case file unless `force` is True. The future
+        returns the .def filename."""
+        cfx_filename = pathlib.Path(cfx_filename)
+        def_filename = change_suffix(cfx_filename, '.def') if def_filename is None else pathlib.Path(def_filename)
+        if not force and casehash.def_is_current(cfx_filename, def_filename, self.ansys_version):
+            logger.debug(f'{def_filename} is up-to-date with {cfx_filename}. Skipping cfx2def.')
+            os.utime(def_filename)  # the def file is as new as the case file
+            future = concurrent.futures.Future()
+            future.set_result(def_filename)
+            return future
+        composer = self._composer()
+        composer.cfx2def(cfx_filename, def_filename)
+        return self.submit(composer, lambda steps: def_filename)
+
+    def res2cfx(self, res_filename: PATHLIKE, cfx_filename: Union[PATHLIKE, None] = None) -> concurrent.futures.Future:
+        """Writes the case file of a result file. By default, "<case>_001.res" is written to
+        "<case>.cfx" (see `result.res2cfx()`). The future returns the .cfx filename."""
+        res_filename = pathlib.Path(res_filename)
+        if cfx_filename is None:
+            cfx_filename = res_filename.parent / f'{res_filename.stem.rsplit("_", 1)[0]}.cfx'
+        composer = self._composer()
+        composer.res2cfx(res_filename, cfx_filename)
+        return self.submit(composer, lambda steps: pathlib.Path(cfx_filename))
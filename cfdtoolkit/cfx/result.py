@@ -9,6 +9,7 @@ import dotenv
 
 from .installation import CFXInstallation
 from . import solve
+from .asyncproc import run_async
 from .core import OutFile, MonitorData
 from .session import run_session_file
 from .utils import change_suffix, touch_stp
@@ -104,8 +105,25 @@ class CFXResFile:
         print('Honestly, dont know! Check to be written')  # TODO check if crashed!4
         return True
 
+    @property
+    def def_filename(self) -> pathlib.Path:
+        """Definition file of the case, e.g. "<case>.def" for "<case>_001.res"."""
+        return self.filename.parent / f'{self.filename.stem.rsplit("_", 1)[0]}.def'
+
+    def _resume_args(self, nproc: int, def_filename: Union[PATHLIKE, None],
+                     timeout: Union[int, None]) -> List[str]:
+        if def_filename is None:
+            def_filename = self.def_filename
+            logger.debug(f'Resuming on def file: {def_filename}')
+        def_filename = pathlib.Path(def_filename)
+
+        if not def_filename.exists():
+            raise FileNotFoundError(f'Could not find definition file: {def_filename}')
+        return solve.CFXSolve(def_filename)._generate_args(nproc, self.filename, timeout_s=timeout,
+                                                           discard_run_history=False)
+
     def resume(self, nproc: int, def_filename: Union[PATHLIKE, None] = None,
-               timeout: str = None) -> str:
+               timeout: int = None) -> str:
         """resumes the computation from this result file
 
         Parameters
@@ -122,17 +140,16 @@ class CFXResFile:
         cmd: str
             The generated command line string to resume the computation.
         """
-        if def_filename is None:
-            def_filename = self.def_filename
-            logger.debug(f'Resuming on def file: {def_filename}')
-
-        if def_filename.exists():
-            cmd = solve.build_cmd(def_filename=self.def_filename, nproc=nproc,
-                                  ini_filename=self.filename, timeout=timeout)
-        else:
-            raise FileNotFoundError(f'Could not find definition file: {def_filename}')
-        p = subprocess.run(cmd, shell=True)
-        return cmd
+        args = self._resume_args(nproc, def_filename, timeout)
+        subprocess.run(args)
+        return ' '.join(args)
+
+    async def resume_async(self, nproc: int, def_filename: Union[PATHLIKE, None] = None,
+                           timeout: int = None,
+                           kill_after: Union[float, None] = None) -> subprocess.CompletedProcess:
+        """Coroutine of `resume()`. Returns the completed solver process with its captured
+        output. The solver is killed after `kill_after` seconds or if the task is cancelled."""
+        return await run_async(self._resume_args(nproc, def_filename, timeout), timeout=kill_after)
 
     @property
     def number(self):
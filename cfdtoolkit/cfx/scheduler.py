@@ -0,0 +1,377 @@
+"""Queue of solver runs packed onto the cores and licenses of the local machine.
+
+`CFXSolve.run()` blocks until the solver has finished, so cases are usually run one after
+another. `CFXScheduler` takes solve jobs of `CFXCase` objects with the number of processes,
+a priority and dependencies on other jobs. Jobs are started without blocking as soon as
+their dependencies are met and their processes and license tokens fit into the free part of
+the budget (`NPROC_MAX` physical cores by default). Jobs are started by descending priority;
+lower-priority jobs fill cores which a waiting larger job cannot use yet.
+
+A dependency is met if the job it names finished and its condition holds, e.g.
+"converged" to start a transient run after the steady run converged. Jobs whose dependency
+failed or whose condition does not hold are skipped.
+
+The queue is saved in a JSON file after every change. A driver which is restarted with the
+same file continues the queue and keeps track of the solver runs started before the
+restart. Only one driver must use a queue file at a time.
+
+Example
+-------
+scheduler = CFXScheduler('queue.json', license_tokens=4)
+steady = scheduler.submit(CFXCase('steady.cfx'), nproc=8, priority=1)
+scheduler.submit(CFXCase('transient.cfx'), nproc=16, after=[steady], condition='converged',
+                 ini_from=steady)
+scheduler.run()  # or call scheduler.step() periodically
+"""
+import json
+import logging
+import os
+import pathlib
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Union
+
+import psutil
+
+from .case import CFXCase
+from .exe import NPROC_MAX
+from .solve import CFXSolve
+from .utils import NEW_PROCESS_GROUP, change_suffix, kill_process_group
+from ..typing import PATHLIKE
+
+logger = logging.getLogger('cfdtoolkit')
+
+
+class JobState(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+    CANCELLED = 'cancelled'
+
+    @property
+    def is_final(self) -> bool:
+        return self not in (JobState.PENDING, JobState.RUNNING)
+
+
+@dataclass
+class SolveJob:
+    """A solver run of a case in the queue of a `CFXScheduler`"""
+    name: str
+    cfx_filename: str
+    nproc: int = 1
+    priority: int = 0
+    tokens: int = 1
+    after: List[str] = field(default_factory=list)
+    condition: str = 'succeeded'
+    ini_from: Union[str, None] = None
+    timeout_s: Union[int, None] = None
+    state: JobState = JobState.PENDING
+    pid: Union[int, None] = None
+    pgid: Union[int, None] = None  # process group of the solver and the processes it starts
+    create_time: Union[float, None] = None
+    n_res: Union[int, None] = None  # number of result files before the run
+    started: Union[float, None] = None
+    finished: Union[float, None] = None
+    returncode: Union[int, None] = None
+    error: Union[str, None] = None
+
+    @property
+    def case(self) -> CFXCase:
+        return CFXCase(self.cfx_filename)
+
+    @property
+    def res_files(self) -> List[pathlib.Path]:
+        cfx_filename = pathlib.Path(self.cfx_filename)
+        return sorted(cfx_filename.parent.glob(f'{cfx_filename.stem}_*.res'))
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), 'state': self.state.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SolveJob':
+        return cls(**{**data, 'state': JobState(data['state'])})
+
+
+def _succeeded(job: SolveJob) -> bool:
+    return job.state == JobState.SUCCEEDED
+
+
+def _converged(job: SolveJob) -> bool:
+    """The latest run stopped because the residual and target criteria were met"""
+    if not _succeeded(job) or not job.res_files:
+        return False
+    out_filename = change_suffix(job.res_files[-1], '.out')
+    if not out_filename.exists():
+        return False
+    return 'target criteria satisfied' in out_filename.read_text(errors='replace')
+
+
+CONDITIONS: Dict[str, Callable[[SolveJob], bool]] = {'succeeded': _succeeded, 'converged': _converged}
+
+
+def register_condition(name: str, condition: Callable[[SolveJob], bool]) -> None:
+    """Registers a condition which dependent jobs can name. It is called with the finished
+    job they depend on. Conditions are saved by name, so a restarted driver must register
+    them again."""
+    CONDITIONS[name] = condition
+
+
+class CFXScheduler:
+    """Runs the solve jobs of a persisted queue on the local machine.
+
+    Parameters
+    ----------
+    filename: PATHLIKE
+        JSON file of the queue. An existing queue is continued.
+    nproc_max: int
+        Number of processes which may run at the same time. Default is the number of
+        physical cores.
+    license_tokens: int
+        Number of license tokens which the running jobs may use. None for no limit.
+    cfx5solve: PATHLIKE
+        Path to the solver executable. Default takes the path from the config file.
+    """
+
+    def __init__(self, filename: PATHLIKE, nproc_max: int = NPROC_MAX,
+                 license_tokens: Union[int, None] = None, cfx5solve: Union[PATHLIKE, None] = None):
+        self.filename = pathlib.Path(filename)
+        self.nproc_max = nproc_max
+        self.license_tokens = license_tokens
+        self.cfx5solve = cfx5solve
+        self.jobs: Dict[str, SolveJob] = {}
+        self._processes: Dict[str, subprocess.Popen] = {}
+        if self.filename.exists():
+            with open(self.filename) as f:
+                self.jobs = {d['name']: SolveJob.from_dict(d) for d in json.load(f)['jobs']}
+            logger.debug(f'Continuing queue {self.filename} with {len(self.jobs)} jobs')
+
+    def __repr__(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.state.value] = counts.get(job.state.value, 0) + 1
+        return f'<CFXScheduler {self.filename} ({", ".join(f"{n} {s}" for s, n in counts.items()) or "empty"})>'
+
+    def __getitem__(self, name: str) -> SolveJob:
+        return self.jobs[name]
+
+    def save(self) -> None:
+        """Writes the queue to the file. The file is replaced at once, so it is never
+        left half written."""
+        tmp_filename = self.filename.with_name(f'.{self.filename.name}.tmp')
+        with open(tmp_filename, 'w') as f:
+            json.dump({'jobs': [job.to_dict() for job in self.jobs.values()]}, f, indent=2)
+        os.replace(tmp_filename, self.filename)
+
+    @property
+    def log_dir(self) -> pathlib.Path:
+        """Directory of the stdout/stderr of the solver runs"""
+        return self.filename.parent / f'{self.filename.stem}_logs'
+
+    def submit(self, case: Union[CFXCase, PATHLIKE], nproc: int = 1, priority: int = 0,
+               after: List[str] = None, condition: str = 'succeeded', ini_from: str = None,
+               timeout_s: int = None, tokens: int = 1, name: str = None) -> str:
+        """Adds a solve job and returns its name.
+
+        Parameters
+        ----------
+        case: Union[CFXCase, PATHLIKE]
+            The case or its .cfx file. The .def file must exist when the job starts.
+        nproc: int
+            Number of solver processes
+        priority: int
+            Jobs with higher priority are started first
+        after: List[str]
+            Names of the jobs which must have finished before
+        condition: str
+            Name of the condition the jobs in `after` must meet (see `CONDITIONS`)
+        ini_from: str
+            Name of a job whose latest result file is the initial solution. The job is
+            added to `after`.
+        timeout_s: int
+            Maximum run time passed to the solver
+        tokens: int
+            License tokens the job uses
+        name: str
+            Name of the job. Default is the case name.
+
+        A job which is already in the queue under the same name and for the same case is
+        not added again, so a restarted driver may submit its jobs again.
+        """
+        cfx_filename = str(case.filename if isinstance(case, CFXCase) else pathlib.Path(case).resolve())
+        name = pathlib.Path(cfx_filename).stem if name is None else name
+        after = list(after or [])
+        if ini_from is not None and ini_from not in after:
+            after.append(ini_from)
+        if name in self.jobs:
+            if self.jobs[name].cfx_filename != cfx_filename:
+                raise ValueError(f'A job "{name}" for another case exists: {self.jobs[name].cfx_filename}')
+            logger.debug(f'Job "{name}" is already in the queue')
+            return name
+        for dependency in after + ([] if ini_from is None else [ini_from]):
+            if dependency not in self.jobs:
+                raise KeyError(f'Unknown job "{dependency}"')
+        if condition not in CONDITIONS:
+            raise KeyError(f'Unknown condition "{condition}". Known: {list(CONDITIONS)}')
+        if not 0 < nproc <= self.nproc_max:
+            raise ValueError(f'nproc must be between 1 and {self.nproc_max} but is {nproc}')
+        if self.license_tokens is not None and tokens > self.license_tokens:
+            raise ValueError(f'The job needs {tokens} license tokens but only {self.license_tokens} are available')
+        self.jobs[name] = SolveJob(name, cfx_filename, nproc=nproc, priority=priority, tokens=tokens,
+                                   after=after, condition=condition, ini_from=ini_from, timeout_s=timeout_s)
+        self.save()
+        return name
+
+    def cancel(self, name: str) -> None:
+        """Cancels a pending job or kills a running one. Jobs depending on it are skipped."""
+        job = self.jobs[name]
+        if job.state == JobState.RUNNING:
+            # cfx5solve is a launcher script: the solver processes are its children
+            process = self._processes.pop(name, None)
+            if process is not None:
+                kill_process_group(job.pgid or job.pid)
+                process.wait()
+            else:
+                adopted = self._adopted_process(job)
+                if adopted is not None:
+                    children = adopted.children(recursive=True)
+                    kill_process_group(job.pgid or job.pid)
+                    for p in [adopted] + children:
+                        try:
+                            p.kill()
+                        except psutil.NoSuchProcess:
+                            pass
+        if not job.state.is_final:
+            self._finish(job, JobState.CANCELLED)
+        self.save()
+
+    def _adopted_process(self, job: SolveJob) -> Union[psutil.Process, None]:
+        """The process of a job started by an earlier driver if it still runs"""
+        try:
+            process = psutil.Process(job.pid)
+            if process.create_time() == job.create_time and process.status() != psutil.STATUS_ZOMBIE:
+                return process
+        except psutil.Error:
+            pass
+        return None
+
+    def _finish(self, job: SolveJob, state: JobState, error: str = None) -> None:
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        logger.info(f'Job "{job.name}" {state.value}' + ('' if error is None else f': {error}'))
+
+    def _update_running(self) -> None:
+        for job in self.jobs.values():
+            if job.state != JobState.RUNNING:
+                continue
+            process = self._processes.get(job.name, None)
+            if process is not None:
+                if process.poll() is None:
+                    continue
+                del self._processes[job.name]
+                job.returncode = process.returncode
+                succeeded = process.returncode == 0
+            else:
+                if self._adopted_process(job) is not None:
+                    continue
+                # started by an earlier driver: the exit code is lost, a new result file tells
+                succeeded = len(job.res_files) > job.n_res
+            if succeeded:
+                self._finish(job, JobState.SUCCEEDED)
+            else:
+                self._finish(job, JobState.FAILED, 'Solver failed' if job.returncode is None else
+                             f'Solver exited with code {job.returncode}')
+
+    def _is_skipped(self, job: SolveJob) -> bool:
+        """Skips a pending job whose dependencies cannot be met anymore"""
+        for dependency in (self.jobs[name] for name in job.after):
+            if dependency.state.is_final and not CONDITIONS[job.condition](dependency):
+                self._finish(job, JobState.SKIPPED, f'Job "{dependency.name}" did not meet "{job.condition}"')
+                return True
+        return False
+
+    def _is_ready(self, job: SolveJob) -> bool:
+        """Whether the dependencies of a pending job are met"""
+        return all(self.jobs[name].state.is_final for name in job.after) and not self._is_skipped(job)
+
+    def _start(self, job: SolveJob) -> None:
+        try:
+            case = job.case
+            ini_filename = None
+            if job.ini_from is not None:
+                res_files = self.jobs[job.ini_from].res_files
+                if not res_files:
+                    raise FileNotFoundError(f'Job "{job.ini_from}" has no result file')
+                ini_filename = res_files[-1]
+            solver = CFXSolve(case.def_filename, exe_filename=self.cfx5solve)
+            args = solver._run_args(job.nproc, ini_filename, job.timeout_s, discard_run_history=False,
+                                    max_nproc_check=False)
+            job.n_res = len(job.res_files)
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.log_dir / f'{job.name}.log', 'w') as log:
+                process = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT,
+                                           stdin=subprocess.DEVNULL, cwd=case.working_dir,
+                                           **NEW_PROCESS_GROUP)
+        except Exception as e:
+            self._finish(job, JobState.FAILED, f'{type(e).__name__}: {e}')
+            return
+        self._processes[job.name] = process
+        job.state = JobState.RUNNING
+        job.pid = process.pid
+        job.pgid = process.pid  # leader of its new process group
+        try:
+            job.create_time = psutil.Process(process.pid).create_time()
+        except psutil.Error:  # already ended
+            job.create_time = None
+        job.started = time.time()
+        logger.info(f'Started job "{job.name}" on {job.nproc} processes (pid {job.pid})')
+
+    def step(self) -> List[str]:
+        """Updates the states of the running jobs and starts the pending jobs which are ready
+        and fit into the free processes and license tokens. Returns the names of the
+        started jobs. Does not block."""
+        self._update_running()
+        running = [job for job in self.jobs.values() if job.state == JobState.RUNNING]
+        free_nproc = self.nproc_max - sum(job.nproc for job in running)
+        free_tokens = None if self.license_tokens is None else self.license_tokens - sum(job.tokens for job in running)
+        started = []
+        order = {name: i for i, name in enumerate(self.jobs)}
+        pending = sorted((job for job in self.jobs.values() if job.state == JobState.PENDING),
+                         key=lambda job: (-job.priority, order[job.name]))
+        for job in pending:
+            if job.nproc > free_nproc or (free_tokens is not None and job.tokens > free_tokens):
+                continue
+            if not self._is_ready(job):
+                continue
+            self._start(job)
+            if job.state == JobState.RUNNING:
+                free_nproc -= job.nproc
+                if free_tokens is not None:
+                    free_tokens -= job.tokens
+                started.append(job.name)
+        # skipping or failing a job may skip the jobs depending on it
+        while any(job.state == JobState.PENDING and self._is_skipped(job) for job in self.jobs.values()):
+            pass
+        self.save()
+        return started
+
+    @property
+    def is_done(self) -> bool:
+        """Whether all jobs have finished"""
+        return all(job.state.is_final for job in self.jobs.values())
+
+    def run(self, poll_interval: float = 10.) -> Dict[str, JobState]:
+        """Calls `step()` every `poll_interval` seconds until all jobs have finished. Returns
+        the final states."""
+        while True:
+            self.step()
+            if self.is_done:
+                return {name: job.state for name, job in self.jobs.items()}
+            if not any(job.state == JobState.RUNNING for job in self.jobs.values()):
+                raise RuntimeError('No job is running but pending jobs cannot start: '
+                                   f'{[job.name for job in self.jobs.values() if job.state == JobState.PENDING]}')
+            time.sleep(poll_interval)
@@ -1,13 +1,21 @@
+import contextlib
+import functools
+import itertools
 import logging
 import os
 import pathlib
+import re
 import shutil
 import subprocess
 import tempfile
-from typing import Union, Dict
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Union
 
 import dotenv
 
+from . import casehash
+from .asyncproc import run_async
 from .utils import change_suffix
 from .installation import ansys_version_from_inst_dir
 from .. import CFX_DOTENV_FILENAME
@@ -22,6 +30,88 @@ logger.setLevel(logging.DEBUG)
 CFX5PRE = pathlib.Path(os.environ.get("cfx5pre"))
 ANSYSVERSION = ansys_version_from_inst_dir(CFX5PRE)
 
+_PLACEHOLDER = re.compile(r'(__[A-Za-z0-9]+__)')
+
+
+class SessionTemplate:
+    """A `.pre` file with placeholders like "__cfxfilename__", split once into literal text
+    and placeholders. `render()` substitutes all placeholders in one pass."""
+
+    def __init__(self, text: str, name: str = '<string>'):
+        self.name = name
+        # literal text at even, placeholder names at odd positions
+        self._parts = _PLACEHOLDER.split(text)
+        self.placeholders = frozenset(self._parts[1::2])
+
+    def __repr__(self):
+        return f'<SessionTemplate {self.name} ({", ".join(sorted(self.placeholders))})>'
+
+    def render(self, params: Dict) -> str:
+        """The text with the placeholders replaced by `params` {placeholder: value}. Raises a
+        KeyError for parameters the template does not have and a ValueError for placeholders
+        without a parameter."""
+        unknown = [k for k in params if k not in self.placeholders]
+        if unknown:
+            raise KeyError(f'{", ".join(unknown)} not found in {self.name}.')
+        missing = self.placeholders.difference(params)
+        if missing:
+            raise ValueError(f'No value for {", ".join(sorted(missing))} in {self.name}.')
+        values = {k: str(v) for k, v in params.items()}
+        parts = self._parts.copy()
+        parts[1::2] = [values[k] for k in parts[1::2]]
+        return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_template(filename: pathlib.Path, mtime_ns: int) -> SessionTemplate:
+    logger.debug(f'Compiling session template {filename}')
+    return SessionTemplate(filename.read_text(), str(filename))
+
+
+def session_template(session_filename: PATHLIKE) -> SessionTemplate:
+    """The compiled template of a `.pre` file or of the file of this name in the session
+    directory. Templates are read once and again only if the file changes."""
+    filename = pathlib.Path(session_filename)
+    if not filename.exists():
+        filename = SESSIONS_DIR / filename
+    filename = filename.resolve()
+    return _compile_template(filename, filename.stat().st_mtime_ns)
+
+
+def load_templates() -> Dict[str, SessionTemplate]:
+    """Compiles all templates of the session directory {name: template}"""
+    return {f.name: session_template(f) for f in sorted(SESSIONS_DIR.glob('*.pre'))}
+
+
+_SCRATCH = None
+_SCRATCH_LOCK = threading.Lock()
+_SCRATCH_COUNTER = itertools.count()
+
+
+def scratch_dir() -> pathlib.Path:
+    """Directory for session files of this process. It is deleted when the process ends."""
+    global _SCRATCH
+    with _SCRATCH_LOCK:
+        if _SCRATCH is None:
+            _SCRATCH = tempfile.TemporaryDirectory(prefix='cfdtoolkit-sessions-')
+        return pathlib.Path(_SCRATCH.name)
+
+
+def _scratch_filename(ext: str) -> pathlib.Path:
+    """Unique filename in the scratch directory"""
+    return scratch_dir() / f'session{os.getpid()}_{next(_SCRATCH_COUNTER)}{ext}'
+
+
+@contextlib.contextmanager
+def _session_file(text: str) -> Iterator[pathlib.Path]:
+    """Writes `text` once to a file in the scratch directory, which is deleted afterwards"""
+    filename = _scratch_filename('.pre')
+    filename.write_text(text)
+    try:
+        yield filename
+    finally:
+        filename.unlink()
+
 
 def importccl(cfx_filename: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None,
               ansys_version: str = ANSYSVERSION) -> pathlib.Path:
@@ -52,8 +142,9 @@ def importccl(cfx_filename: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None
 
 
 def cfx2def(cfx_filename: PATHLIKE, def_filename: Union[PATHLIKE, None] = None,
-            ansys_version: str = ANSYSVERSION) -> pathlib.Path:
-    """Write solver file from cfx case file"""
+            ansys_version: str = ANSYSVERSION, force: bool = False) -> pathlib.Path:
+    """Write solver file from cfx case file. Skipped if the def file was written from a
+    semantically identical case file (see `casehash`) unless `force` is True."""
     cfx_filename = pathlib.Path(cfx_filename)
 
     if def_filename is None:
@@ -61,6 +152,11 @@ def cfx2def(cfx_filename: PATHLIKE, def_filename: Union[PATHLIKE, None] = None,
     else:
         def_filename = pathlib.Path(def_filename)
 
+    if not force and casehash.def_is_current(cfx_filename, def_filename, ansys_version):
+        logger.debug(f'{def_filename} is up-to-date with {cfx_filename}. Skipping cfx2def.')
+        os.utime(def_filename)  # the def file is as new as the case file
+        return def_filename
+
     logger.debug(f'Running session file cfx2def.pre to create def-file {def_filename} from cfx-file {cfx_filename}.')
     completed_process = run_session_file(SESSIONS_DIR / 'cfx2def.pre',
                                          {'__cfxfilename__': str(cfx_filename.absolute()),
@@ -68,13 +164,14 @@ def cfx2def(cfx_filename: PATHLIKE, def_filename: Union[PATHLIKE, None] = None,
                                           '__version__': ansys_version})
     if not def_filename.exists():
         raise RuntimeError(f'Something went wrong. The def file was not created. Process info: {completed_process}')
+    casehash.record_def(cfx_filename, def_filename, ansys_version)
     return def_filename
 
 
 def change_timestep_and_write_def(cfx_filename: PATHLIKE, def_filename: PATHLIKE, timestep: float,
                                   ansys_version: str = ANSYSVERSION):
     """changes timestep in *.cfx fil and writes solver file *.def"""
-    run_session_file(SESSIONS_DIR / 'cfx2def.pre',
+    run_session_file(SESSIONS_DIR / 'change_timestep_and_write_def.pre',
                      {'__cfxfilename__': str(cfx_filename.absolute()),
                       '__timestep__': str(timestep),
                       '__deffilename__': str(def_filename.absolute()),
@@ -91,27 +188,20 @@ def change_timestep(cfx_filename: PATHLIKE, timestep: float,
 
 
 def random_tmp_filename(ext=''):
-    """Generates a random file path in directory strudaset/.tmp with filename tmp****.hdf where **** are random
-    numbers. The file path is returned but the file itself is not created until used.
+    """Generates a unique file path in the scratch directory of this process (see
+    `scratch_dir()`), which is deleted when the process ends. The file itself is not
+    created until used.
 
     Returns
     --------
-    random_fpath: `string`
+    random_fpath: `pathlib.Path`
         random file path
     """
 
     if not ext == '':
         if "." not in ext:
             ext = f'.{ext}'
-
-    tmpdir = pathlib.Path(tempfile.TemporaryDirectory().name)
-    if not tmpdir.exists():
-        tmpdir.mkdir()
-    random_fpath = tmpdir.joinpath(f"tmp{ext}")
-    while os.path.isfile(random_fpath):
-        random_fpath = tmpdir.joinpath(f"tmp{ext}")
-
-    return random_fpath
+    return _scratch_filename(ext)
 
 
 def copy_session_file_to_tmp(session_filename: PATHLIKE) -> PATHLIKE:
@@ -141,17 +231,7 @@ def replace_in_file(filename, keyword, new_string):
         f.write(s)
 
 
-def play_session(session_file: PATHLIKE,
-                 cfx5pre: Union[PATHLIKE, None] = None) -> subprocess.CompletedProcess:
-    """
-    Runs cfx5pre session file
-
-    Parameters
-    ----------
-    cfx5pre : Union[str, bytes, os.PathLike, pathlib.Path], optional
-        path to cfx5pre exe.
-        Default takes from config file
-    """
+def _play_session_args(session_file: PATHLIKE, cfx5pre: Union[PATHLIKE, None]) -> List[str]:
     if cfx5pre is None:
         _cfx5path = CFX5PRE
     else:
@@ -159,28 +239,222 @@ def play_session(session_file: PATHLIKE,
 
     if not _cfx5path.exists():
         raise FileExistsError(f'Could not find cfx5pre exe here: {_cfx5path}')
+    return [str(_cfx5path), '-batch', str(pathlib.Path(session_file))]
 
-    session_file = pathlib.Path(session_file)
-
-    cmd = f'"{_cfx5path}" -batch "{session_file}"'
 
-    completed_process = subprocess.run(cmd, shell=True, capture_output=True)
+def _check_session_process(completed_process: subprocess.CompletedProcess) -> subprocess.CompletedProcess:
     logger.debug(f'subprocess info: {completed_process}')
     if completed_process.returncode != 0:
-        if 'not connect to any license server' in completed_process.stdout:
+        if 'not connect to any license server' in completed_process.stdout.decode(errors='replace'):
             raise ConnectionError(f'I seems that you are not connected to a license server: {completed_process}')
         else:  # unknown error
             raise RuntimeError(f'Subprocess was not successful: {completed_process}')
     return completed_process
 
 
+def play_session(session_file: PATHLIKE,
+                 cfx5pre: Union[PATHLIKE, None] = None) -> subprocess.CompletedProcess:
+    """
+    Runs cfx5pre session file
+
+    Parameters
+    ----------
+    cfx5pre : Union[str, bytes, os.PathLike, pathlib.Path], optional
+        path to cfx5pre exe.
+        Default takes from config file
+    """
+    args = _play_session_args(session_file, cfx5pre)
+    return _check_session_process(subprocess.run(args, capture_output=True))
+
+
+async def play_session_async(session_file: PATHLIKE, cfx5pre: Union[PATHLIKE, None] = None,
+                             timeout: Union[float, None] = None) -> subprocess.CompletedProcess:
+    """Coroutine of `play_session()`. cfx5pre is killed after `timeout` seconds or if the
+    task is cancelled (see `asyncproc.run_async()`)."""
+    args = _play_session_args(session_file, cfx5pre)
+    return _check_session_process(await run_async(args, timeout=timeout))
+
+
 def run_session_file(session_filename: Union[str, pathlib.Path],
                      param_keywords: Dict) -> subprocess.CompletedProcess:
-    """calls the session file and replaces the key words in param_keywords"""
-    if not pathlib.Path(session_filename).exists():
-        # try finding it in SESSIONS_DIR:
-        session_filename = (SESSIONS_DIR / session_filename).resolve().absolute()
-    tmp_session_file = copy_session_file_to_tmp(session_filename)
-    for k, v in param_keywords.items():
-        replace_in_file(tmp_session_file, k, v)
-    return play_session(tmp_session_file)
+    """calls the session file and replaces the key words in param_keywords. The template is
+    compiled once (see `session_template()`) and the session is written to the scratch
+    directory and deleted after the run."""
+    text = session_template(session_filename).render(param_keywords)
+    with _session_file(text) as filename:
+        return play_session(filename)
+
+
+async def run_session_file_async(session_filename: Union[str, pathlib.Path], param_keywords: Dict,
+                                 timeout: Union[float, None] = None) -> subprocess.CompletedProcess:
+    """Coroutine of `run_session_file()`"""
+    text = session_template(session_filename).render(param_keywords)
+    with _session_file(text) as filename:
+        return await play_session_async(filename, timeout=timeout)
+
+
+_COMMAND_FILE_HEADER = re.compile(r'^COMMAND FILE:[ \t]*\n.*?^END[ \t]*\n?', re.M | re.S)
+_VERSION_COMMENT = re.compile(r'^# CFX-.*\n?', re.M)
+
+
+@dataclass
+class SessionStep:
+    """One operation of a `SessionComposer`. `ok` is None until the session has run and
+    tells afterwards whether all `outputs` were written during the run."""
+    name: str
+    template: pathlib.Path
+    params: Dict[str, str]
+    outputs: List[pathlib.Path]
+    on_success: Union[Callable[[], None], None] = None
+    ok: Union[bool, None] = None
+
+    def render(self) -> str:
+        """Text of the template with the parameters replaced and without its COMMAND FILE header"""
+        text = session_template(self.template).render(self.params)
+        text = _VERSION_COMMENT.sub('', _COMMAND_FILE_HEADER.sub('', text, count=1))
+        return f'# --- step: {self.name} ---\n{text.strip()}\n'
+
+
+class SessionComposer:
+    """Batches several cfx5pre operations into one session file, which is run by a single
+    `cfx5pre -batch` call. Thus, cfx5pre starts and checks out a license once:
+
+        composer = SessionComposer()
+        composer.importccl('case.cfx', 'case.ccl')
+        composer.change_timestep('case.cfx', 0.01)
+        composer.cfx2def('case.cfx', 'case.def')
+        composer.run()
+
+    The `.pre` templates of the single operations are concatenated below one COMMAND FILE
+    header. After the run, every step is checked by the files it writes (`SessionStep.ok`).
+    Note, that steps writing the same file (e.g. `importccl()` and `change_timestep()` of one
+    case file) cannot be told apart.
+    """
+
+    def __init__(self, ansys_version: str = ANSYSVERSION):
+        self.ansys_version = ansys_version
+        self.steps: List[SessionStep] = []
+
+    def __repr__(self):
+        return f'<SessionComposer ({len(self.steps)} steps)>'
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add(self, name: str, template: PATHLIKE, params: Dict, outputs: List[PATHLIKE],
+            on_success: Callable[[], None] = None) -> SessionStep:
+        """Adds a step from a session template (filename or name of a file in the session
+        directory). "__version__" is added to `params`."""
+        template = pathlib.Path(template)
+        if not template.exists():
+            template = SESSIONS_DIR / template
+        step = SessionStep(name, template, {'__version__': self.ansys_version, **params},
+                           [pathlib.Path(o).absolute() for o in outputs], on_success)
+        step.render()  # fail early on unknown templates or parameters
+        self.steps.append(step)
+        return step
+
+    def importccl(self, cfx_filename: PATHLIKE, ccl_filename: Union[PATHLIKE, None] = None) -> SessionStep:
+        """Imports a .ccl file into a .cfx file (see `importccl()`)"""
+        cfx_filename = pathlib.Path(cfx_filename)
+        ccl_filename = change_suffix(cfx_filename, '.ccl') if ccl_filename is None else pathlib.Path(ccl_filename)
+        if not ccl_filename.exists():
+            raise FileExistsError(f'CCL file (.ccl) not found: {ccl_filename}')
+        self._check_input(cfx_filename)
+        return self.add('importccl', 'importccl.pre',
+                        {'__cfxfilename__': str(cfx_filename.absolute()),
+                         '__cclfilename__': str(ccl_filename.absolute())},
+                        outputs=[cfx_filename])
+
+    def change_timestep(self, cfx_filename: PATHLIKE, timestep: float) -> SessionStep:
+        """Changes the timestep in a .cfx file (see `change_timestep()`)"""
+        cfx_filename = pathlib.Path(cfx_filename)
+        self._check_input(cfx_filename)
+        return self.add('change_timestep', 'change_timestep.pre',
+                        {'__cfxfilename__': str(cfx_filename.absolute()),
+                         '__timestep__': str(timestep)},
+                        outputs=[cfx_filename])
+
+    def cfx2def(self, cfx_filename: PATHLIKE, def_filename: Union[PATHLIKE, None] = None) -> SessionStep:
+        """Writes the solver file of a .cfx file (see `cfx2def()`). Unlike `cfx2def()`, the
+        step is not skipped for an up-to-date def file, because earlier steps may change the
+        case file. The semantic hash of the written def file is recorded."""
+        cfx_filename = pathlib.Path(cfx_filename)
+        def_filename = cfx_filename.with_suffix('.def') if def_filename is None else pathlib.Path(def_filename)
+        self._check_input(cfx_filename)
+        return self.add('cfx2def', 'cfx2def.pre',
+                        {'__cfxfilename__': str(cfx_filename.absolute()),
+                         '__deffilename__': str(def_filename.absolute())},
+                        outputs=[def_filename],
+                        on_success=lambda: casehash.record_def(cfx_filename, def_filename, self.ansys_version))
+
+    def change_timestep_and_write_def(self, cfx_filename: PATHLIKE, def_filename: PATHLIKE,
+                                      timestep: float) -> SessionStep:
+        """Changes the timestep in a .cfx file and writes the solver file"""
+        cfx_filename = pathlib.Path(cfx_filename)
+        self._check_input(cfx_filename)
+        return self.add('change_timestep_and_write_def', 'change_timestep_and_write_def.pre',
+                        {'__cfxfilename__': str(cfx_filename.absolute()),
+                         '__timestep__': str(timestep),
+                         '__deffilename__': str(pathlib.Path(def_filename).absolute())},
+                        outputs=[cfx_filename, def_filename])
+
+    def res2cfx(self, res_filename: PATHLIKE, cfx_filename: PATHLIKE) -> SessionStep:
+        """Writes the case file of a result file"""
+        self._check_input(res_filename)
+        return self.add('res2cfx', 'res2cfx.pre',
+                        {'__resfilename__': str(pathlib.Path(res_filename).absolute()),
+                         '__cfxfilename__': str(pathlib.Path(cfx_filename).absolute())},
+                        outputs=[cfx_filename])
+
+    def def2cfx(self, def_filename: PATHLIKE, cfx_filename: PATHLIKE) -> SessionStep:
+        """Writes the case file of a solver file"""
+        self._check_input(def_filename)
+        return self.add('def2cfx', 'def2cfx.pre',
+                        {'__deffilename__': str(pathlib.Path(def_filename).absolute()),
+                         '__cfxfilename__': str(pathlib.Path(cfx_filename).absolute())},
+                        outputs=[cfx_filename])
+
+    def _check_input(self, filename: PATHLIKE) -> None:
+        """Input files must exist unless an earlier step writes them"""
+        filename = pathlib.Path(filename).absolute()
+        if not filename.exists() and not any(filename in step.outputs for step in self.steps):
+            raise FileExistsError(f'Input file not found: {filename}')
+
+    def render(self) -> str:
+        """The composed session file with a single COMMAND FILE header"""
+        if not self.steps:
+            raise ValueError('No steps to compose')
+        header = f'COMMAND FILE:\n  CFX Pre Version = {self.ansys_version}\nEND\n'
+        return '\n'.join([header] + [step.render() for step in self.steps])
+
+    def run(self, cfx5pre: Union[PATHLIKE, None] = None, check: bool = True) -> List[SessionStep]:
+        """Runs all steps in one cfx5pre process and checks the outputs of every step.
+        Raises a RuntimeError naming the failed steps if `check` is True."""
+        mtimes = self._output_mtimes()
+        error = None
+        with _session_file(self.render()) as session_filename:
+            logger.debug(f'Running {len(self.steps)} composed steps in one cfx5pre session')
+            try:
+                play_session(session_filename, cfx5pre)
+            except RuntimeError as e:  # the outputs tell which steps have succeeded
+                error = e
+        return self._check_outputs(mtimes, error, check)
+
+    def _output_mtimes(self) -> Dict[pathlib.Path, Union[int, None]]:
+        """Modification times of the outputs before the run (None for missing files)"""
+        return {o: o.stat().st_mtime_ns if o.exists() else None for step in self.steps for o in step.outputs}
+
+    def _check_outputs(self, mtimes: Dict[pathlib.Path, Union[int, None]], error: Union[Exception, None],
+                       check: bool) -> List[SessionStep]:
+        """Sets `ok` of the steps, whose outputs must have been written since `mtimes`"""
+        for step in self.steps:
+            step.ok = all(o.exists() and o.stat().st_mtime_ns != mtimes[o] for o in step.outputs)
+            if step.ok and step.on_success is not None:
+                step.on_success()
+        failed = [step.name for step in self.steps if not step.ok]
+        if failed and check:
+            raise RuntimeError(f'Session steps failed: {", ".join(failed)}') from error
+        if error is not None and check:
+            raise error
+        return self.steps
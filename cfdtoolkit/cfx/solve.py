@@ -2,9 +2,10 @@ import pathlib
 import subprocess
 import warnings
 from dataclasses import dataclass
-from typing import Union
+from typing import List, Union
 
 from . import result as res
+from .asyncproc import run_async
 from .ccl import _generate_from_def, CCLFile
 from .exe import CFXExe, NPROC_MAX
 from .utils import change_suffix
@@ -14,22 +15,22 @@ from .utils import change_suffix
 class CFXSolve(CFXExe):
     """cfx5solve interface class"""
 
-    def _generate_cmd(self, nproc: int, ini_filename: pathlib.Path, timeout_s: int,
-                      discard_run_history: bool, max_nproc_check: bool=True):
-        """generate the console command"""
+    def _generate_args(self, nproc: int, ini_filename: pathlib.Path, timeout_s: int,
+                       discard_run_history: bool, max_nproc_check: bool = True) -> List[str]:
+        """generate the argument list of the solver call"""
         if not self.filename.exists():
             raise FileNotFoundError(f'Definition file not found: {self.filename.resolve().absolute()}')
 
         exe = self.get_exe("cfx5solve")
-        cmd = f'"{exe}" -def "{self.filename}"'
+        args = [str(exe), '-def', str(self.filename)]
 
         if ini_filename is not None:
             if discard_run_history:
-                cmd += f' -ini-file "{ini_filename}"'
+                args += ['-ini-file', str(ini_filename)]
             else:
-                cmd += f' -ini "{ini_filename}"'
+                args += ['-ini', str(ini_filename)]
 
-        cmd += f' -chdir "{self.filename.parent}"'
+        args += ['-chdir', str(self.filename.parent)]
 
         if nproc > 1:
             if nproc > NPROC_MAX and max_nproc_check:
@@ -38,21 +39,25 @@ class CFXSolve(CFXExe):
                               f'It is adjusted to {NPROC_MAX}',
                               UserWarning)
                 nproc = NPROC_MAX
-            cmd += f' -par-local -partition {int(nproc)} -batch'
+            args += ['-par-local', '-partition', str(int(nproc)), '-batch']
 
         if timeout_s is not None:
             if timeout_s <= 0:
                 raise ValueError(f'Invalid value for timeout: {timeout_s}')
-            cmd += f' -maxet \"{int(timeout_s)} [s]\"'  # e.g. maxet='10 [min]'
-        return cmd
+            args += ['-maxet', f'{int(timeout_s)} [s]']  # e.g. maxet='10 [min]'
+        return args
 
-    def run(self, nproc: Union[int, str],
-            ini_filename: Union[pathlib.Path, res.CFXResFile] = None,
-            timeout_s: int = None,
-            discard_run_history: bool = False,
-            **kwargs):
-        """Run the solver"""
-        max_nproc_check = kwargs.pop('max_nproc_check', True)
+    def _generate_cmd(self, nproc: int, ini_filename: pathlib.Path, timeout_s: int,
+                      discard_run_history: bool, max_nproc_check: bool=True):
+        """generate the console command"""
+        args = self._generate_args(nproc, ini_filename, timeout_s, discard_run_history, max_nproc_check)
+        return ' '.join(a if a.startswith('-') or a.isdigit() else f'"{a}"' for a in args)
+
+    def _run_args(self, nproc: Union[int, str],
+                  ini_filename: Union[pathlib.Path, res.CFXResFile],
+                  timeout_s: int,
+                  discard_run_history: bool,
+                  max_nproc_check: bool) -> List[str]:
         if isinstance(nproc, str):
             if nproc == 'max':
                 nproc = NPROC_MAX
@@ -68,13 +73,37 @@ class CFXSolve(CFXExe):
         if isinstance(ini_filename, res.CFXResFile):
             ini_filename = ini_filename.filename
 
-        cmd = self._generate_cmd(nproc, ini_filename,
-                                 timeout_s=timeout_s,
-                                 discard_run_history=discard_run_history,
-                                 max_nproc_check=max_nproc_check)
+        return self._generate_args(nproc, ini_filename,
+                                   timeout_s=timeout_s,
+                                   discard_run_history=discard_run_history,
+                                   max_nproc_check=max_nproc_check)
+
+    def run(self, nproc: Union[int, str],
+            ini_filename: Union[pathlib.Path, res.CFXResFile] = None,
+            timeout_s: int = None,
+            discard_run_history: bool = False,
+            **kwargs):
+        """Run the solver"""
+        args = self._run_args(nproc, ini_filename, timeout_s, discard_run_history,
+                              kwargs.pop('max_nproc_check', True))
+        if kwargs.get('verbose', False):
+            print(args)
+        return subprocess.run(args)
+
+    async def run_async(self, nproc: Union[int, str],
+                        ini_filename: Union[pathlib.Path, res.CFXResFile] = None,
+                        timeout_s: int = None,
+                        discard_run_history: bool = False,
+                        kill_after: Union[float, None] = None,
+                        **kwargs) -> subprocess.CompletedProcess:
+        """Coroutine of `run()`. `timeout_s` is passed to the solver (-maxet), which stops
+        the run cleanly. `kill_after` seconds kill the solver process, as does cancelling
+        the task. The output of the solver is captured."""
+        args = self._run_args(nproc, ini_filename, timeout_s, discard_run_history,
+                              kwargs.pop('max_nproc_check', True))
         if kwargs.get('verbose', False):
-            print(cmd)
-        return subprocess.run(cmd, shell=True)
+            print(args)
+        return await run_async(args, timeout=kill_after)
 
     def write_ccl(self,
                   target_dir: pathlib.Path = None,
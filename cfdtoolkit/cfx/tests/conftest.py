@@ -0,0 +1,38 @@
+import stat
+import sys
+import time
+
+import psutil
+import pytest
+
+
+@pytest.fixture
+def stand_in(tmp_path):
+    """Writes executable Python scripts standing in for the CFX tools:
+    `stand_in('cfx5pre', code)` returns the path of the script in `tmp_path`"""
+
+    def _stand_in(name: str, code: str):
+        exe = tmp_path / name
+        exe.write_text(f'#!{sys.executable}\n{code}')
+        exe.chmod(exe.stat().st_mode | stat.S_IXUSR)
+        return exe
+
+    return _stand_in
+
+
+@pytest.fixture
+def has_ended():
+    """`has_ended(pid)` waits up to `timeout` seconds for the process to end"""
+
+    def _has_ended(pid: int, timeout: float = 5) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if psutil.Process(pid).status() == psutil.STATUS_ZOMBIE:
+                    return True
+            except psutil.NoSuchProcess:
+                return True
+            time.sleep(0.05)
+        return False
+
+    return _has_ended
@@ -0,0 +1,70 @@
+import asyncio
+import subprocess
+
+import pytest
+
+from cfdtoolkit.cfx import asyncproc, session
+from cfdtoolkit.cfx.result import CFXResFile
+from cfdtoolkit.cfx.solve import CFXSolve
+
+
+def test_async_tool_invocations(tmp_path, stand_in, has_ended):
+    def tool(name, code):
+        return stand_in(name, f'import pathlib, subprocess, sys, time\n{code}\n')
+
+    echo = tool('echo', 'print(repr(sys.argv[1:])); print("err", file=sys.stderr); sys.exit(int(sys.argv[1]))')
+    # launcher-like: starts the actual tool as child process and records its pid
+    sleep = tool('sleep', 'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])\n'
+                          'pathlib.Path(sys.argv[1]).write_text(str(child.pid))\n'
+                          'child.wait()')
+    nap = tool('nap', 'start = time.time(); time.sleep(0.3); print(start, time.time())')
+
+    completed = asyncio.run(asyncproc.run_async([echo, '0', 'a b']))
+    assert completed.returncode == 0
+    assert completed.stdout.decode().strip() == "['0', 'a b']" and completed.stderr.decode().strip() == 'err'
+    assert asyncio.run(asyncproc.run_async([echo, '3'])).returncode == 3
+
+    # timeout and cancellation kill the tool and its child processes
+    # (a watchdog fails the test if run_async() waits for the child instead)
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(asyncio.wait_for(asyncproc.run_async([sleep, tmp_path / 'a'], timeout=1), 20))
+    assert has_ended(int((tmp_path / 'a').read_text()))
+
+    async def cancel():
+        task = asyncio.ensure_future(asyncproc.run_async([sleep, tmp_path / 'b']))
+        while not (tmp_path / 'b').exists() or not (tmp_path / 'b').read_text():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(asyncio.shield(task), 20)
+
+    asyncio.run(cancel())
+    assert has_ended(int((tmp_path / 'b').read_text()))
+
+    # the tools run concurrently: at least two runs overlap
+    async def gather():
+        return await asyncio.gather(*(asyncproc.run_async([nap]) for _ in range(4)))
+
+    stamps = sorted(tuple(map(float, c.stdout.split())) for c in asyncio.run(gather()))
+    assert any(next_start < end for (_, end), (next_start, _) in zip(stamps, stamps[1:]))
+
+    # cfx5pre errors are raised as by play_session()
+    session_file = tmp_path / 'session.pre'
+    session_file.write_text('')
+    cfx5pre = tool('cfx5pre', 'print("could not connect to any license server"); sys.exit(1)')
+    with pytest.raises(ConnectionError):
+        asyncio.run(session.play_session_async(session_file, cfx5pre=cfx5pre))
+
+    # the solver is called with an argument list
+    def_filename = tmp_path / 'my case.def'
+    def_filename.write_text('def')
+    cfx5solve = tool('cfx5solve', 'print(repr(sys.argv[1:]))')
+    solver = CFXSolve(def_filename, exe_filename=cfx5solve)
+    assert solver._generate_cmd(1, None, 60, False) == \
+           f'"{cfx5solve}" -def "{def_filename}" -chdir "{tmp_path}" -maxet "60 [s]"'
+    completed = asyncio.run(solver.run_async(1, timeout_s=60))
+    assert completed.stdout.decode().strip() == repr(['-def', str(def_filename), '-chdir', str(tmp_path),
+                                                      '-maxet', '60 [s]'])
+    res_file = CFXResFile(tmp_path / 'my case_001.res')
+    assert res_file.def_filename == def_filename
+    assert res_file._resume_args(1, None, None)[1:5] == ['-def', str(def_filename), '-ini', str(res_file.filename)]
@@ -0,0 +1,887 @@
+import logging
+import os
+import pathlib
+import pickle
+import shutil
+import sys
+import threading
+
+import h5py
+import numpy as np
+import pytest
+
+from cfdtoolkit.cfx import casehash, hdfsession, session
+from cfdtoolkit.cfx import ccl as ccl_module
+from cfdtoolkit.cfx.ccl import (CCLFile, CCLGroup, CCLHDFFlowGroup, CCLTextFile, hdf_to_ccl, parse_ccl_lines,
+                                _tokenize_ccl)
+from cfdtoolkit.cfx.cclcolumns import CCLColumns, convert_layout, is_columnar
+from cfdtoolkit.cfx.ccldiff import CCLDiffer, hash_tree
+from cfdtoolkit.cfx.cclindexdb import CCLIndexDB
+from cfdtoolkit.cfx.cclstudy import CCLStudy
+from cfdtoolkit.cfx.ccltree import CCLTree
+from cfdtoolkit.cfx.cclvalue import CCLUnit, format_value, parse_value, to_array, typed_options
+from cfdtoolkit.cfx.cel import CELError, CELEvaluationError, CELExpressions, CELQuantity, CELUnitError
+from cfdtoolkit.cfx.hdfsession import open_h5
+
+testdata_dir = pathlib.Path(__file__).parent.joinpath('../../../testdata').resolve()
+CCL_FILENAME = testdata_dir.joinpath('cylinderflow/steady_state/cyl_steadystate_laminar.ccl')
+
+
+def _signature(grp):
+    return (grp.name, grp.grp_line, grp.end_line, grp.indentation_length, grp.group_type,
+            {k: (v.line, v.value) for k, v in grp.data.items()},
+            [_signature(g) for g in grp.sub_groups.values()])
+
+
+def test_parse_ccl_lines():
+    ccl = CCLTextFile(CCL_FILENAME)
+    legacy_root = CCLGroup(ccl.filename, 0, -1, ccl.indentation[0][1], ccl.intendation_step,
+                           ccl.lines, ccl.indentation, name='root')
+    assert _signature(ccl.root_group) == _signature(legacy_root)
+
+    flow = ccl.get_flow_group()
+    assert flow.name == 'FLOW: Flow Analysis 1'
+    inlet = flow['DOMAIN: Default Domain']['BOUNDARY: Inlet']
+    assert inlet.data['Boundary Type'].value == 'INLET'
+    data_source = ccl.root_group['LIBRARY']['CEL']['FUNCTION: inlet']['DATA SOURCE']
+    assert data_source.data['File Name'].value.endswith('cylinderflow/inlet_profile_Re20.csv')
+
+
+def test_tokenize_continuation_and_end_markers():
+    raw_lines = ['# comment\n',
+                 'FLOW: Flow Analysis 1\n',
+                 '  DOMAIN: dom\n',
+                 '    Location = A, \\\n',
+                 '      B\n',
+                 '\n',
+                 '    EMPTY GROUP:\n',
+                 '    END\n',
+                 '  END # DOMAIN: dom\n',
+                 'END\n']
+    lines, line_numbers = _tokenize_ccl(raw_lines)
+    assert lines[2] == '    Location = A, B'
+    assert line_numbers == [1, 2, 3, 6, 7, 8, 9]
+
+    root = parse_ccl_lines(lines)
+    domain = root['FLOW: Flow Analysis 1']['DOMAIN: dom']
+    assert domain.data['Location'].value == 'A, B'
+    assert list(domain.keys()) == ['EMPTY GROUP']
+    assert (domain.grp_line, domain.end_line) == (1, 5)
+
+
+def test_ccl_tree():
+    ccl = CCLTextFile(CCL_FILENAME)
+    tree = CCLTree.from_file(CCL_FILENAME)
+
+    def _compare(grp, node):
+        assert (grp.name, grp.group_type, grp.grp_line, grp.end_line) == \
+               (node.name, node.group_type, node.grp_line, node.end_line)
+        assert grp.data == node.data
+        assert list(grp.keys()) == node.keys()
+        for name, sub_grp in grp.sub_groups.items():
+            _compare(sub_grp, node[name])
+
+    _compare(ccl.root_group, tree.root)
+    assert tree.get_flow_group()['DOMAIN: Default Domain'].parent.name == 'FLOW: Flow Analysis 1'
+
+
+def test_incremental_update(tmp_path):
+    filename = shutil.copy(CCL_FILENAME, tmp_path / 'case.ccl')
+    ccl = CCLTextFile(filename)
+    assert not ccl.update()
+    solution_units = ccl.get_flow_group()['SOLUTION UNITS']
+
+    with open(filename) as f:
+        text = f.read()
+    text = text.replace('Maximum Number of Iterations = 5', 'Maximum Number of Iterations = 50')
+    text = text.replace('    BOUNDARY: SYMMETRY\n      Boundary Type = SYMMETRY\n      Location = SYMMETRY\n    END\n', '')
+    text = text.replace('  SOLVER CONTROL:\n', '  NEW GROUP:\n    Option = New\n  END\n  SOLVER CONTROL:\n')
+    text = text.replace('  MATERIAL GROUP: Air Data\n', '  MATERIAL GROUP: New\n  END\n  MATERIAL GROUP: Air Data\n')
+    with open(filename, 'w') as f:
+        f.write(text)
+    os.utime(filename, (0, ccl.mtime + 1))
+
+    assert ccl.update()
+    assert ccl.get_flow_group()['SOLUTION UNITS'] is solution_units
+    assert _signature(ccl.root_group) == _signature(CCLTextFile(filename).root_group)
+    flow = ccl.get_flow_group()
+    assert flow['SOLVER CONTROL']['CONVERGENCE CONTROL'].data['Maximum Number of Iterations'].value == '50'
+    assert 'BOUNDARY: SYMMETRY' not in flow['DOMAIN: Default Domain'].keys()
+    assert flow['NEW GROUP'].data['Option'].value == 'New'
+
+
+def test_edit_session(tmp_path):
+    filename = shutil.copy(CCL_FILENAME, tmp_path / 'case.ccl')
+    ccl = CCLTextFile(filename)
+    data_field = ccl.root_group['LIBRARY']['CEL']['FUNCTION: inlet']['DATA FIELD: Velocity u'].data
+    conv_ctrl = ccl.get_flow_group()['SOLVER CONTROL']['CONVERGENCE CONTROL'].data
+    result_units = data_field['Result Units']
+    max_iterations = conv_ctrl['Maximum Number of Iterations']
+
+    with ccl.edit() as tx:
+        tx.set(data_field['Parameter List'], 'U,Wall U')  # continued over two lines
+        tx.set(conv_ctrl['Maximum Number of Iterations'], 50)
+        tx.set(conv_ctrl['Timescale Factor'], '2.0')
+        assert len(tx) == 3
+        assert conv_ctrl['Maximum Number of Iterations'].value == '5'
+
+    assert pathlib.Path(f'{filename}.bak').read_text() == CCL_FILENAME.read_text()
+    assert len(list(tmp_path.iterdir())) == 2
+    assert not ccl.is_outdated
+    assert _signature(ccl.root_group) == _signature(CCLTextFile(filename).root_group)
+    conv_ctrl = ccl.get_flow_group()['SOLVER CONTROL']['CONVERGENCE CONTROL'].data
+    assert conv_ctrl['Maximum Number of Iterations'].value == '50'
+    assert max_iterations.value == '50'
+    with ccl.edit() as tx:
+        tx.set(conv_ctrl['Maximum Number of Iterations'], 50)  # same value as string
+        assert len(tx) == 0
+
+    # fields read before the edit are still valid:
+    result_units.set('[m s^-1]')
+    with ccl.edit() as tx:
+        tx.set(conv_ctrl['Timescale Factor'], '3.0')
+    ccl_new = CCLTextFile(filename)
+    assert ccl_new.root_group['LIBRARY']['CEL']['FUNCTION: inlet']['DATA FIELD: Velocity u'].data[
+               'Result Units'].value == '[m s^-1]'
+    assert ccl_new.get_flow_group()['SOLVER CONTROL']['CONVERGENCE CONTROL'].data[
+               'Timescale Factor'].value == '3.0'
+
+
+def test_ccl_index(tmp_path):
+    filename = shutil.copy(CCL_FILENAME, tmp_path / 'case.ccl')
+    ccl = CCLTextFile(filename)
+    index = ccl.index
+    assert index is ccl.index
+    conv_ctrl_path = 'FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL'
+    conv_ctrl = ccl.get_flow_group()['SOLVER CONTROL']['CONVERGENCE CONTROL']
+    assert index[conv_ctrl_path] is conv_ctrl
+    assert index[''] is ccl.root_group
+    assert 'FLOW: Flow Analysis 1/NO GROUP' not in index
+    assert [g.name for g in index.of_type('BOUNDARY')] == ['BOUNDARY: Inlet', 'BOUNDARY: Outlet',
+                                                          'BOUNDARY: SYMMETRY', 'BOUNDARY: WALL']
+    assert index.of_type('DOMAIN') == [ccl.get_flow_group()['DOMAIN: Default Domain']]
+    assert list(index.with_option('Maximum Number of Iterations')) == [conv_ctrl_path]
+
+    assert list(index.find('*/BOUNDARY: [IO]*let')) == [
+        'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet',
+        'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Outlet']
+    assert list(index.find(r'.*/BOUNDARY: \w+', regex=True)) == list(
+        f'FLOW: Flow Analysis 1/DOMAIN: Default Domain/{g.name}' for g in index.of_type('BOUNDARY'))
+    fields = index.find_options('Boundary Type', path_pattern='*Inlet')
+    assert [(k, f.value) for k, f in fields.items()] == [
+        ('FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/Boundary Type', 'INLET')]
+    assert set(index.find_options('Timescale *')) == {f'{conv_ctrl_path}/Timescale Control',
+                                                     f'{conv_ctrl_path}/Timescale Factor'}
+
+    # the compact tree gives the same index:
+    tree_index = CCLTree.from_file(filename).build_index()
+    assert list(tree_index.paths) == list(index.paths)
+    assert tree_index.options == index.options
+
+    # the index is rebuilt after the file has changed:
+    with ccl.edit() as tx:
+        tx.set(conv_ctrl.data['Maximum Number of Iterations'], 10)
+    assert index.find_options('Maximum Number of Iterations')[
+               f'{conv_ctrl_path}/Maximum Number of Iterations'].value == '10'
+    text = pathlib.Path(filename).read_text()
+    pathlib.Path(filename).write_text(text.replace('BOUNDARY: SYMMETRY', 'BOUNDARY: Symmetry'))
+    os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 10 ** 9))  # same size: bump the mtime
+    assert ccl.index is index  # lookups do not stat the file
+    assert ccl.update()
+    assert [g.name for g in ccl.index.of_type('BOUNDARY')][2] == 'BOUNDARY: Symmetry'
+    assert ccl.index is not index
+
+
+def test_columnar_layout(tmp_path):
+    ccl = CCLTextFile(CCL_FILENAME)
+    attr_filename = ccl.to_hdf(tmp_path / 'case.ccl_hdf')
+    col_filename = ccl.to_hdf(tmp_path / 'case.columnar.ccl_hdf', layout='columnar')
+    assert not is_columnar(attr_filename)
+    assert is_columnar(col_filename)
+
+    columns = CCLColumns.from_hdf(col_filename)
+    assert columns == CCLColumns.from_group(ccl.root_group)
+    assert columns == CCLColumns.from_attribute_hdf(attr_filename)
+    assert list(columns.group_path) == list(ccl.index.paths)
+    conv_ctrl_path = 'FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL'
+    assert columns.options(conv_ctrl_path)['Maximum Number of Iterations'] == '5'
+    assert columns.children('FLOW: Flow Analysis 1/SOLVER CONTROL') == [
+        f'FLOW: Flow Analysis 1/SOLVER CONTROL/{name}'
+        for name in ccl.get_flow_group()['SOLVER CONTROL'].keys()]
+
+    # converters between the layouts:
+    back_filename = convert_layout(col_filename, tmp_path / 'back.ccl_hdf')
+    assert not is_columnar(back_filename)
+    assert CCLColumns.from_attribute_hdf(back_filename) == columns
+    with pytest.raises(ValueError):
+        CCLFile(col_filename)
+    cclfile = CCLFile.from_columnar(col_filename, tmp_path / 'case2.ccl_hdf')
+    assert cclfile.flow[0]['SOLVER CONTROL']['CONVERGENCE CONTROL'].options['Timescale Factor'] == '1.0'
+    assert CCLColumns.from_hdf(CCLFile(attr_filename).to_columnar()) == columns
+
+
+def _legacy_hdf_to_ccl(hdf_filename, ccl_filename, intendation_step=2):
+    """recursive writer hdf_to_ccl() was replaced with (reference for the output)"""
+
+    def _write_to_file(writer, h5obj):
+        ret_string = ''
+        nlevel = len(h5obj.name.split('/')) - 2
+        _spaces = ''.join([' '] * nlevel * intendation_step)
+        name_stem = pathlib.Path(h5obj.name).stem
+        if ':' in name_stem:
+            ret_string += f'{_spaces}{name_stem}\n'
+        else:
+            ret_string += f'{_spaces}{name_stem.upper()}:\n'
+        for _k, _v in h5obj.attrs.items():
+            ret_string += _spaces.join([' '] * intendation_step) + f'{_k} = {_v}\n'
+        writer.write(ret_string)
+        for _v in h5obj.values():
+            _write_to_file(writer, _v)
+        writer.write(f'{_spaces}END\n')
+
+    with open(ccl_filename, 'w') as f:
+        with h5py.File(hdf_filename) as h5:
+            for k, v in h5.items():
+                _write_to_file(f, v)
+    return ccl_filename
+
+
+def test_hdf_to_ccl(tmp_path):
+    hdf_filename = CCLTextFile(CCL_FILENAME).to_hdf(tmp_path / 'case.ccl_hdf')
+    with h5py.File(hdf_filename, 'r+') as h5:
+        # creation ordered group:
+        grp = h5.create_group('LIBRARY/MATERIAL: Brine', track_order=True)
+        grp.create_group('THERMAL CONDUCTIVITY').attrs['Option'] = 'Value'
+        grp.create_group('density').attrs['Density'] = 997
+        grp.attrs['Material Group'] = 'Water Data'
+    for intendation_step in (2, 3):
+        new = hdf_to_ccl(hdf_filename, tmp_path / 'new.ccl', intendation_step=intendation_step)
+        legacy = _legacy_hdf_to_ccl(hdf_filename, tmp_path / 'legacy.ccl', intendation_step=intendation_step)
+        assert new.read_bytes() == legacy.read_bytes()
+
+    ccl = CCLTextFile(new)
+    assert ccl.index['FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL'].data[
+               'Maximum Number of Iterations'].value == '5'
+
+    # the legacy writer cut group names at a dot ("MATERIAL: Brine.1" -> "MATERIAL: Brine"):
+    with h5py.File(hdf_filename, 'r+') as h5:
+        h5['LIBRARY'].move('MATERIAL: Brine', 'MATERIAL: Brine.1')
+    ccl = CCLTextFile(hdf_to_ccl(hdf_filename, tmp_path / 'new.ccl'))
+    assert ccl.root_group['LIBRARY']['MATERIAL: Brine.1'].data['Material Group'].value == 'Water Data'
+
+
+def test_to_hdf_values_with_equal_signs(tmp_path):
+    ramp = 'if(t<=1 [s], t/1 [s], 1)'
+    ccl_filename = tmp_path / 'case.ccl'
+    ccl_filename.write_text(CCL_FILENAME.read_text().replace('    EXPRESSIONS:\n',
+                                                             f'    EXPRESSIONS:\n      Ramp = {ramp}\n'))
+    ccl = CCLTextFile(ccl_filename)
+    cclfile = CCLFile(ccl.to_hdf(tmp_path / 'case.ccl_hdf'))
+    # the option with "=" in its value and the options after it are written:
+    options = cclfile.expressions.options
+    assert options['Ramp'] == ramp
+    assert options['Um'] == '1.5 [m/s]'
+    assert not ccl.diff(cclfile)
+
+    ccl = CCLTextFile(hdf_to_ccl(cclfile.filename, tmp_path / 'roundtrip.ccl'))
+    assert ccl.root_group['LIBRARY']['CEL']['EXPRESSIONS'].data['Ramp'].value == ramp
+
+
+def test_cclfile_generation_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def _generate(input_file, ccl_filename=None, *args, **kwargs):
+        calls.append(input_file)
+        text = CCL_FILENAME.read_text()
+        if b'changed' in pathlib.Path(input_file).read_bytes():
+            text = text.replace('Maximum Number of Iterations = 5', 'Maximum Number of Iterations = 7')
+        pathlib.Path(ccl_filename).write_text(text)
+        return pathlib.Path(ccl_filename)
+
+    monkeypatch.setattr(ccl_module, 'generate', _generate)
+
+    def _max_iter(cclfile):
+        return cclfile.flow[0]['SOLVER CONTROL']['CONVERGENCE CONTROL'].options['Maximum Number of Iterations']
+
+    def_filename = tmp_path / 'case.def'
+    def_filename.write_bytes(b'definition')
+    cclfile = CCLFile(def_filename)
+    assert len(calls) == 1
+    assert cclfile.filename == tmp_path / 'case.ccl_hdf'
+    assert (tmp_path / '.cfdtoolkit' / 'ccl_cache').is_dir()
+    cclfile.set_steady_state_max_iterations(10)
+
+    # unchanged input: existing hdf file is taken, including its modifications:
+    assert _max_iter(CCLFile(def_filename)) == '10'
+    # take_existing=False regenerates the hdf file from the cached CCL text:
+    assert _max_iter(CCLFile(def_filename, take_existing=False)) == '5'
+    assert len(calls) == 1
+
+    # only touching the file does not invalidate the cache:
+    os.utime(def_filename, (0, def_filename.stat().st_mtime + 10))
+    assert _max_iter(CCLFile(def_filename)) == '5'
+    assert len(calls) == 1
+
+    # a copy of the case with the same content shares the cached CCL:
+    other_filename = tmp_path / 'other.def'
+    shutil.copy(def_filename, other_filename)
+    CCLFile(other_filename)
+    assert len(calls) == 1
+
+    # changed content:
+    def_filename.write_bytes(b'changed definition')
+    assert _max_iter(CCLFile(def_filename)) == '7'
+    assert len(calls) == 2
+
+    CCLFile(def_filename, cache=False)
+    assert len(calls) == 3
+
+
+def test_hdf_session(tmp_path, monkeypatch):
+    cclfile = CCLFile(CCLTextFile(CCL_FILENAME).to_hdf(tmp_path / 'case.ccl_hdf'))
+    opened = []
+
+    class _CountingFile(h5py.File):
+        def __init__(self, *args, **kwargs):
+            opened.append(args)
+            super().__init__(*args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(hdfsession.h5py, 'File', _CountingFile)
+        with cclfile.session('r+') as h5_session:
+            assert h5_session.is_open
+            flow = cclfile.flow[0]
+            assert flow.max_iterations == 5
+            flow.max_iterations = 20
+            flow.min_iterations = 2
+            boundaries = flow.domains[0].boundaries
+            assert [b.type for b in boundaries] == ['INLET', 'OPENING', 'SYMMETRY', 'WALL']
+            with cclfile.session('r'):  # nested sessions share the handle
+                assert flow.min_iterations == 2
+            # sessions are not shared with other threads:
+            other = []
+            thread = threading.Thread(target=lambda: other.append(hdfsession.active_session(cclfile.filename)))
+            thread.start()
+            thread.join()
+            assert other == [None]
+        assert len(opened) == 1
+        assert not h5_session.is_open
+        assert hdfsession.active_session(cclfile.filename) is None
+
+    # without session every access opens the file:
+    assert cclfile.flow[0].max_iterations == 20
+    with cclfile.session('r'):
+        with pytest.raises(ValueError):
+            cclfile.flow[0].max_iterations = 30
+    with pytest.raises(RuntimeError):
+        _ = h5_session.h5
+
+
+def test_ccl_snapshot(tmp_path):
+    cclfile = CCLFile(CCLTextFile(CCL_FILENAME).to_hdf(tmp_path / 'case.ccl_hdf'))
+    snapshot = cclfile.snapshot()
+    flow = snapshot.flow[0]
+    assert flow.path == '/FLOW: Flow Analysis 1'
+    assert flow.keys() == cclfile.flow[0].keys()
+    conv_ctrl = flow.solver_control['CONVERGENCE CONTROL']
+    assert conv_ctrl is flow['SOLVER CONTROL/CONVERGENCE CONTROL']
+    assert dict(conv_ctrl.options) == dict(cclfile.flow[0]['SOLVER CONTROL']['CONVERGENCE CONTROL'].options.values)
+    assert conv_ctrl.parent.parent is flow
+    assert snapshot.expressions.options['Um'] == '1.5 [m/s]'
+    with pytest.raises(KeyError):
+        flow['NO GROUP']
+
+    # read-only:
+    with pytest.raises(TypeError):
+        conv_ctrl.options['Maximum Number of Iterations'] = '10'
+    with pytest.raises(AttributeError):
+        conv_ctrl.path = '/'
+
+    # picklable:
+    restored = pickle.loads(pickle.dumps(snapshot))
+    assert restored.flow[0]['SOLVER CONTROL/CONVERGENCE CONTROL'].options['Timescale Factor'] == '1.0'
+    assert restored['LIBRARY'].parent is restored
+    assert restored.keys() == snapshot.keys()
+
+
+def test_ccl_diff(tmp_path):
+    base = CCLTextFile(CCL_FILENAME)
+    cclfile = CCLFile(base.to_hdf(tmp_path / 'case.ccl_hdf'))
+    # same content in text and HDF5 layout:
+    assert hash_tree(base).digest == hash_tree(cclfile).digest
+    assert not base.diff(cclfile)
+
+    text = CCL_FILENAME.read_text()
+    variant_filename = tmp_path / 'variant.ccl'
+    variant_filename.write_text(text.replace('Maximum Number of Iterations = 5', 'Maximum Number of Iterations = 50')
+                                .replace('Timescale Factor = 1.0\n', '')
+                                .replace('    Angle Units = ', '    Added Option = x\n    Angle Units = '))
+    cclfile.flow[0].monitor_object['newpoint'] = {'expression_value': 'cd'}
+    conv_ctrl_path = 'FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL'
+
+    differ = CCLDiffer(base)
+    variant_diff, cclfile_diff = differ.diff_many([CCLTextFile(variant_filename), cclfile])
+    assert variant_diff.changed_options == {f'{conv_ctrl_path}/Maximum Number of Iterations': ('5', '50')}
+    assert variant_diff.removed_options == {f'{conv_ctrl_path}/Timescale Factor': '1.0'}
+    assert variant_diff.added_options == {'FLOW: Flow Analysis 1/SOLUTION UNITS/Added Option': 'x'}
+    assert not variant_diff.added_groups and not variant_diff.removed_groups
+
+    mp_path = 'FLOW: Flow Analysis 1/OUTPUT CONTROL/MONITOR OBJECTS/MONITOR POINT: newpoint'
+    assert cclfile_diff.added_groups == [mp_path]
+    assert cclfile_diff.added_options == {f'{mp_path}/Coord Frame': 'Coord 0',
+                                          f'{mp_path}/Expression Value': 'cd',
+                                          f'{mp_path}/Option': 'Expression'}
+    assert not cclfile_diff.changed_options
+    assert cclfile.diff(base).removed_groups == [mp_path]
+
+
+def test_skip_unchanged_def(tmp_path, monkeypatch):
+    cfx_filename = tmp_path / 'case.cfx'
+    cfx_data = testdata_dir.joinpath('cylinderflow/steady_state/cyl_steadystate_laminar.cfx').read_bytes()
+    cfx_filename.write_bytes(cfx_data)
+    state_start = cfx_data.rfind(b'*DATASET', 0, cfx_data.rfind(b'STATE\r\x00'))
+
+    def _edit(old, new):
+        # same length edit of the valid (last) STATE dataset:
+        pos = cfx_data.index(old, state_start)
+        return cfx_data[:pos] + new + cfx_data[pos + len(old):]
+
+    digest = casehash.semantic_hash(cfx_filename)
+    assert digest is not None
+    # GUI state and dates do not change the hash, the physics do:
+    cfx_filename.write_bytes(_edit(b'Pivot Point = 1.1', b'Pivot Point = 1.2'))
+    assert casehash.semantic_hash(cfx_filename) == digest
+    cfx_filename.write_bytes(_edit(b'[16:11:46 CEST]', b'[17:11:46 CEST]'))
+    assert casehash.semantic_hash(cfx_filename) == digest
+    cfx_filename.write_bytes(_edit(b'Maximum Number of Iterations = 5', b'Maximum Number of Iterations = 6'))
+    assert casehash.semantic_hash(cfx_filename) != digest
+    cfx_filename.write_bytes(cfx_data)
+
+    calls = []
+
+    def _run_session_file(session_filename, param_keywords):
+        calls.append(param_keywords)
+        pathlib.Path(param_keywords['__deffilename__']).write_bytes(b'definition')
+
+    monkeypatch.setattr(session, 'run_session_file', _run_session_file)
+
+    def_filename = session.cfx2def(cfx_filename, ansys_version='22.2')
+    assert def_filename == tmp_path / 'case.def'
+    assert (tmp_path / '.cfdtoolkit' / 'case.def.semantic').exists()
+    assert len(calls) == 1
+
+    session.cfx2def(cfx_filename, ansys_version='22.2')
+    assert len(calls) == 1
+    # saved again without changes:
+    cfx_filename.write_bytes(_edit(b'Pivot Point = 1.1', b'Pivot Point = 1.2'))
+    os.utime(def_filename, (0, cfx_filename.stat().st_mtime - 10))
+    session.cfx2def(cfx_filename, ansys_version='22.2')
+    assert len(calls) == 1
+    assert def_filename.stat().st_mtime >= cfx_filename.stat().st_mtime
+
+    session.cfx2def(cfx_filename, ansys_version='22.2', force=True)
+    assert len(calls) == 2
+    session.cfx2def(cfx_filename, ansys_version='23.1')
+    assert len(calls) == 3
+    cfx_filename.write_bytes(_edit(b'Maximum Number of Iterations = 5', b'Maximum Number of Iterations = 6'))
+    session.cfx2def(cfx_filename, ansys_version='23.1')
+    assert len(calls) == 4
+    def_filename.unlink()
+    session.cfx2def(cfx_filename, ansys_version='23.1')
+    assert len(calls) == 5
+
+
+def test_ccl_overlay(tmp_path):
+    ccl = CCLTextFile(CCL_FILENAME)
+    base = ccl.overlay()
+    assert base.text == CCL_FILENAME.read_text()
+    assert base.variant({}).text() == base.text
+
+    bc = 'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY CONDITIONS'
+    variant = base.variant({f'{bc}/MASS AND MOMENTUM': {'Normal Speed': '2 [m s^-1]', 'Option': 'Normal Speed'},
+                            f'{bc}/FLOW DIRECTION': {'Option': 'Normal to Boundary Condition'},
+                            'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY PROFILE': None,
+                            'LIBRARY/CEL/EXPRESSIONS/Um': '2 [m/s]',
+                            'LIBRARY/CEL/EXPRESSIONS/Um2': '3 [m/s]'})
+    d = ccl.diff(CCLTextFile(variant.to_ccl(tmp_path / 'variant.ccl')))
+    assert d.changed_options == {'LIBRARY/CEL/EXPRESSIONS/Um': ('1.5 [m/s]', '2 [m/s]'),
+                                 f'{bc}/MASS AND MOMENTUM/Option': ('Cartesian Velocity Components',
+                                                                    'Normal Speed')}
+    assert d.added_groups == [f'{bc}/FLOW DIRECTION']
+    assert d.removed_groups == ['FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY PROFILE']
+    assert d.added_options['LIBRARY/CEL/EXPRESSIONS/Um2'] == '3 [m/s]'
+    assert f'{bc}/MASS AND MOMENTUM/U' in d.removed_options
+    # the base is not modified:
+    assert base.text == CCL_FILENAME.read_text()
+
+    # stacked overlays patch the group dict of the previous overlay:
+    stacked = variant.overlay({f'{bc}/MASS AND MOMENTUM/Normal Speed': '3 [m s^-1]'})
+    assert stacked.patches[f'{bc}/MASS AND MOMENTUM'] == {'Normal Speed': '3 [m s^-1]', 'Option': 'Normal Speed'}
+    assert variant.patches[f'{bc}/MASS AND MOMENTUM']['Normal Speed'] == '2 [m s^-1]'
+
+    with pytest.raises(ValueError):
+        base.variant({f'{bc}/MASS AND MOMENTUM': {'Option': 'Normal Speed'},
+                      f'{bc}/MASS AND MOMENTUM/Normal Speed': '3 [m s^-1]'})
+    with pytest.raises(KeyError):
+        base.variant({'LIBRARY/NO GROUP/Option': 'x'})
+    with pytest.raises(TypeError):
+        base.variant({bc: 'x'})
+
+    # continued lines and comments are kept:
+    raw = '# header\nLIBRARY:\n  CEL:\n    EXPRESSIONS:\n      a = 1 + \\\n        2\n      b = 3\n    END\n  END\nEND\n'
+    (tmp_path / 'raw.ccl').write_text(raw)
+    raw_base = CCLTextFile(tmp_path / 'raw.ccl').overlay()
+    assert raw_base.text == raw
+    assert raw_base.variant({'LIBRARY/CEL/EXPRESSIONS/a': '4'}).text() == raw.replace('1 + \\\n        2', '4')
+
+
+def test_ccl_values(tmp_path):
+    speed = parse_value('1.5 [m s^-1]')
+    assert speed.value == 1.5 and speed.unit is CCLUnit('m s^-1')
+    assert parse_value('0.1[m]').unit is parse_value('2 [m]').unit
+    assert parse_value('5').value == 5 and parse_value('5').unit is None
+    assert parse_value('0 [m], 0 [m], 1 [m]').value == (0, 0, 1)
+    assert parse_value('1.1, 0.205, 0.05').is_vector
+    for text in ('2*Um', 'Normal Speed', '1, 2 [m]', 'inlet.Velocity u(y)', ''):
+        assert parse_value(text) == text
+    for text in ('1.5 [m s^-1]', '0.1[m]', '1.0E-05', '0 [m], 0 [m], 1 [m]', ' 5 '):
+        assert str(parse_value(text)) == text
+        assert format_value(parse_value(text)) == text
+    assert format_value(0.1, 'm s^-1') == '0.1 [m s^-1]'
+    assert format_value(2.0, 's') == '2 [s]'
+    assert format_value((0, 0.5, 1), 'm') == '0, 0.5, 1 [m]'
+    assert parse_value(format_value(1 / 3, 's')).value == 1 / 3
+    np.testing.assert_array_equal(to_array(['1 [s]', 'x', '0.5 [s]']), [1, np.nan, 0.5])
+    with pytest.raises(ValueError):
+        to_array(['1 [s]', '1 [m]'], unit='s')
+
+    ccl = CCLTextFile(CCL_FILENAME)
+    values = typed_options(ccl)
+    assert values['LIBRARY/CEL/EXPRESSIONS/Um'].value == 1.5
+    assert values['FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL/Maximum Number of Iterations'].value == 5
+    assert typed_options(CCLFile(ccl.to_hdf(tmp_path / 'case.ccl_hdf'))) == values
+
+    hdf_filename = tmp_path / 'transient.ccl_hdf'
+    with h5py.File(hdf_filename, 'w') as h5:
+        at = h5.create_group('FLOW: Flow Analysis 1/ANALYSIS TYPE')
+        at.create_group('TIME STEPS').attrs['Timesteps'] = '0.01 [s]'
+        at.create_group('TIME DURATION').attrs['Total Time'] = '2.5 [s]'
+        at.create_group('INITIAL TIME').attrs['Time'] = '0 [s]'
+    flow = CCLHDFFlowGroup('FLOW: Flow Analysis 1', hdf_filename)
+    assert flow.time_steps == 0.01
+    assert flow.total_time == 2.5
+    assert flow.initial_time == 0
+    flow.total_time = 0.75
+    flow.time_steps = 1e-4
+    assert flow.total_time == 0.75
+    with h5py.File(hdf_filename) as h5:
+        assert h5['FLOW: Flow Analysis 1/ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'] == '0.0001 [s]'
+    assert flow['ANALYSIS TYPE/TIME DURATION'].typed_options['Total Time'] == parse_value('0.75 [s]')
+    with h5py.File(hdf_filename, 'r+') as h5:
+        at = h5['FLOW: Flow Analysis 1/ANALYSIS TYPE']
+        at['TIME STEPS'].attrs['Timesteps'] = '5 [ms]'
+        at['TIME DURATION'].attrs['Total Time'] = '2 [min]'
+        at['INITIAL TIME'].attrs['Time'] = '0.5 [hr]'
+    assert flow.time_steps == pytest.approx(0.005)
+    assert flow.total_time == 120
+    assert flow.initial_time == 1800
+    with h5py.File(hdf_filename, 'r+') as h5:
+        h5['FLOW: Flow Analysis 1/ANALYSIS TYPE/TIME STEPS'].attrs['Timesteps'] = '1 [m]'
+    with pytest.raises(ValueError):
+        flow.time_steps
+
+
+def test_generate_many(tmp_path, monkeypatch):
+    # stand-in for cfx5cmds: writes the test CCL unless the def file is invalid. Records the
+    # time it started and ended:
+    cfx5cmds = tmp_path / 'cfx5cmds'
+    cfx5cmds.write_text(f'#!{sys.executable}\n'
+                        'import shutil, sys, time\n'
+                        'args = dict(zip(sys.argv[2::2], sys.argv[3::2]))\n'
+                        'start = time.time()\n'
+                        'time.sleep(0.2)\n'
+                        'open(args["-def"] + ".stamps", "w").write(f"{start} {time.time()}")\n'
+                        'if open(args["-def"]).read() == "invalid":\n'
+                        '    sys.exit("Error reading def file")\n'
+                        f'shutil.copy(r"{CCL_FILENAME}", args["-text"])\n')
+    cfx5cmds.chmod(0o755)
+    monkeypatch.setattr(ccl_module, 'CFX5CMDS', cfx5cmds)
+
+    def_filenames = []
+    for i in range(6):
+        def_filenames.append(tmp_path / f'case{i}.def')
+        def_filenames[-1].write_text('invalid' if i == 3 else f'definition {i}')
+
+    result = ccl_module.generate_many(def_filenames, max_workers=6)
+    # ran concurrently: at least two calls were running at the same time
+    stamps = sorted(tuple(map(float, pathlib.Path(f'{f}.stamps').read_text().split())) for f in def_filenames)
+    assert any(next_start < end for (_, end), (next_start, _) in zip(stamps, stamps[1:]))
+    assert not result
+    assert list(result.errors) == [def_filenames[3]]
+    assert 'Error reading def file' in str(result.errors[def_filenames[3]])
+    assert list(result.filenames) == def_filenames[:3] + def_filenames[4:]
+    for def_filename, hdf_filename in result.filenames.items():
+        assert hdf_filename == def_filename.with_suffix('.ccl_hdf')
+        assert ccl_module.CCLFile(hdf_filename).flow[0].max_iterations == 5
+
+    result = ccl_module.generate_many(def_filenames[:2], max_workers=2, to_hdf=False, aux_dir='aux')
+    assert result
+    assert result.filenames[def_filenames[0]] == tmp_path / 'aux' / 'case0.ccl'
+
+
+def test_cel_expressions():
+    cel = CELExpressions.from_ccl(CCLTextFile(CCL_FILENAME))
+    assert cel.dependencies('cd') == ['Um', 'forcey']
+    assert cel.solver_functions('Re') == ['ave(Density)@INLET', 'ave(Dynamic Viscosity)@INLET']
+    order = cel.order(['cd'])
+    assert order.index('Um') < order.index('cd') and order.index('forcey') < order.index('cd')
+
+    result = cel.evaluate()  # expressions without solver data only
+    assert list(result) == ['Um']
+    assert result['Um'].to('m s^-1') == 1.5
+    with pytest.raises(CELEvaluationError):
+        cel.evaluate(['Re'])
+
+    # vectorized sweep with the solver functions passed as parameters
+    um = np.linspace(0.1, 2.0, 10_000)
+    result = cel.evaluate(['Re'], {'ave(Density)@INLET': '1 [kg m^-3]',
+                                   'ave( Dynamic Viscosity )@INLET': CELQuantity(1e-3, (1, -1, -1, 0, 0, 0, 0))},
+                          Um=CELQuantity.from_unit(um, 'm s^-1'))
+    assert result['Re'].unit == ''
+    assert np.allclose(result['Re'].value, 2 * um / 3 * 0.1 / 1e-3)
+
+    cel = CELExpressions({'T': '20 [C]', 'L': '10 [cm] + 2*x', 'A': 'L^2', 'c': 'if(A > 0.012 [m^2], sqrt(A), 0 [m])',
+                          'angle': 'sin(90 [deg])', 'bad': '1 [m] + 1 [s]', 'nodim': 'exp(1 [m])'})
+    result = cel.evaluate(['T', 'A', 'c', 'angle'], x=CELQuantity.from_unit([0, 10, 20], 'mm'))
+    assert result['T'].to('K') == pytest.approx(293.15)
+    assert np.allclose(result['A'].to('cm^2'), [100, 144, 196])
+    assert np.allclose(result['c'].value, [0, 0.12, 0.14])
+    assert result['angle'].value == pytest.approx(1)
+    with pytest.raises(CELUnitError):
+        result['A'].to('m')
+    with pytest.raises(CELUnitError):
+        cel.evaluate(['bad'])
+    with pytest.raises(CELUnitError):
+        cel.evaluate(['nodim'])
+
+    with pytest.raises(CELError, match='Cyclic'):
+        CELExpressions({'a': 'b + 1', 'b': '2*a'}).order()
+    with pytest.raises(CELError):
+        CELExpressions({'a': '2*(b + 1'})
+
+
+def test_lazy_ccl_text_file(tmp_path, caplog):
+    ccl = CCLTextFile(CCL_FILENAME)
+    with CCLTextFile.lazy(CCL_FILENAME) as lazy:
+        assert list(lazy.keys()) == ['LIBRARY', 'FLOW: Flow Analysis 1', 'COMMAND FILE']
+        assert lazy.root_group.sub_groups.parsed == []
+        flow = lazy.get_flow_group()
+        assert flow.name == 'FLOW: Flow Analysis 1' and flow.group_type == 'FLOW'
+        assert lazy.root_group.sub_groups.parsed == ['FLOW: Flow Analysis 1']
+        assert flow.sub_groups.parsed == []
+        bc = lazy['FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY CONDITIONS']
+        assert flow.sub_groups.parsed == ['DOMAIN: Default Domain']
+        assert bc['MASS AND MOMENTUM'].data['U'].value == 'inlet.Velocity u(y)'
+        assert lazy.get('FLOW: Flow Analysis 1/DOMAIN: missing') is None
+        with pytest.raises(KeyError):
+            lazy['LIBRARY/missing']
+        # accessing everything gives the same tree as the full parser
+        assert hash_tree(lazy.root_group).digest == hash_tree(ccl.root_group).digest
+        assert list(lazy.index.paths) == list(ccl.index.paths)
+
+    filename = tmp_path / 'continued.ccl'
+    filename.write_bytes(b'LIBRARY:\r\n'
+                         b'  CEL:\r\n'
+                         b'    EXPRESSIONS:\r\n'
+                         b'      Um = 1.5 \\\r\n'
+                         b'      [m/s]\r\n'
+                         b'    END\r\n'
+                         b'  END\r\n'
+                         b'END\r\n'
+                         b'# comment\r\n'
+                         b'FLOW: Flow Analysis 1\r\n'
+                         b'  DOMAIN: fluid\r\n'
+                         b'    Location = B1, \\\r\n'
+                         b'    B2\r\n'
+                         b'  END\r\n'
+                         b'END\r\n')
+    lazy = CCLTextFile.lazy(filename)
+    assert list(lazy.keys()) == ['LIBRARY', 'FLOW: Flow Analysis 1']
+    assert lazy['LIBRARY/CEL/EXPRESSIONS'].data['Um'].value == '1.5 [m/s]'
+    assert list(lazy['FLOW: Flow Analysis 1'].keys()) == ['DOMAIN: fluid']
+    assert lazy['FLOW: Flow Analysis 1/DOMAIN: fluid'].data['Location'].value == 'B1, B2'
+
+    filename.write_text('COMMAND FILE:\n  Version = 22.2\n  EMPTY GROUP:\n  END\nEND\n')
+    assert lazy.update()
+    assert list(lazy.keys()) == ['COMMAND FILE']
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger='cfdtoolkit'):
+        assert lazy['COMMAND FILE'].data['Version'].value == '22.2'
+        assert list(lazy['COMMAND FILE'].keys()) == ['EMPTY GROUP']
+        assert lazy['COMMAND FILE/EMPTY GROUP'].data == {}
+    assert [r for r in caplog.records if r.levelno >= logging.WARNING] == []
+    lazy.close()
+
+
+def test_ccl_study(tmp_path):
+    base = CCLTextFile(CCL_FILENAME).overlay()
+    study = CCLStudy(tmp_path / 'study.ccl_study')
+    for i in range(4):
+        filename = base.variant({'LIBRARY/CEL/EXPRESSIONS/Um': f'{i} [m/s]'}).to_ccl(tmp_path / f'case{i}.ccl')
+        study.add(f'case{i}', CCLTextFile(filename))
+    assert study.cases == ['case0', 'case1', 'case2', 'case3']
+    with pytest.raises(KeyError):
+        study.add('case0', CCLTextFile(CCL_FILENAME))
+    stats = study.stats()
+    assert stats['groups'] == 4 * len(CCLTextFile(CCL_FILENAME).index)
+    assert stats['stored_groups'] < stats['groups'] / 3
+
+    # cases are CCLFile objects
+    case = study['case2']
+    assert case.flow[0].max_iterations == 5
+    assert case.expressions.options['Um'] == '2 [m/s]'
+    assert not case.diff(CCLTextFile(tmp_path / 'case2.ccl'))
+    snapshot = case.snapshot()
+    assert snapshot['FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL'].options[
+               'Maximum Number of Iterations'] == '5'
+
+    # writing to a case does not change the others sharing the groups
+    mi = 'FLOW: Flow Analysis 1/SOLVER CONTROL/CONVERGENCE CONTROL/Maximum Number of Iterations'
+    case.flow[0].max_iterations = 50
+    assert study.values(mi) == {'case0': '5', 'case1': '5', 'case2': '50', 'case3': '5'}
+    assert study.diff('case1', 'case2').changed_options == {mi: ('5', '50'),
+                                                            'LIBRARY/CEL/EXPRESSIONS/Um': ('1 [m/s]', '2 [m/s]')}
+    assert study.deduplicate() == 1
+    assert study.values(mi)['case2'] == '50'
+    assert study.find_options('Um')['case3'] == {'LIBRARY/CEL/EXPRESSIONS/Um': '3 [m/s]'}
+    assert study.values('LIBRARY/missing/Um')['case0'] is None
+
+    exported = study.export('case2', tmp_path / 'case2.ccl_hdf')
+    assert not exported.diff(case)
+    study.remove('case2')
+    assert study.prune() > 0
+    assert 'case2' not in study and len(study) == 3
+    assert study['case3'].expressions.options['Um'] == '3 [m/s]'
+
+
+def test_ccl_index_db(tmp_path, monkeypatch):
+    base = CCLTextFile(CCL_FILENAME).overlay()
+    mm = 'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet/BOUNDARY CONDITIONS/MASS AND MOMENTUM'
+    flow_rates = {'case0': '0.2 [kg s^-1]', 'case1': '0.8 [kg s^-1]', 'case2': '700 [g s^-1]'}
+    files = []
+    for name, flow_rate in flow_rates.items():
+        variant = base.variant({mm: {'Option': 'Mass Flow Rate', 'Mass Flow Rate': flow_rate}})
+        files.append(CCLTextFile(variant.to_ccl(tmp_path / f'{name}.ccl')).to_hdf(tmp_path / f'{name}.ccl_hdf'))
+    study = CCLStudy(tmp_path / 'study.ccl_study')
+    study.add('velocity', CCLTextFile(CCL_FILENAME))
+    study.add('massflow', CCLFile(files[1]))
+
+    db = CCLIndexDB(tmp_path / 'cases.ccl_index')
+    assert db.add(files) == 3
+    assert db.add(study) == 2
+    assert len(db) == 5 and CCLFile(files[0]) in db
+
+    def inlets(threshold):
+        return (db.query(group_type='MASS AND MOMENTUM')
+                .where('Option', '==', 'Mass Flow Rate')
+                .where('Mass Flow Rate', '>', threshold)
+                .within('BOUNDARY', 'Boundary Type', '==', 'INLET'))
+
+    # values are compared in SI units
+    assert [(pathlib.Path(f).stem, name) for f, name, _ in inlets('0.5 [kg s^-1]').paths()] == [
+        ('case1', ''), ('case2', ''), ('study', 'massflow')]
+    assert inlets('600 [g s^-1]').count() == 3
+    assert inlets(0.75).count() == 2
+    assert inlets('0.5 [m s^-1]').count() == 0  # other dimensions
+    groups = inlets('0.75 [kg s^-1]').groups()
+    assert groups[0].path == mm and groups[0].options['Mass Flow Rate'] == '0.8 [kg s^-1]'
+    cases = inlets('0.5 [kg s^-1]').cases()
+    assert all(isinstance(case, CCLFile) for case in cases)
+    assert cases[2].expressions.options['Um'] == study['massflow'].expressions.options['Um']
+    assert db.query(path='LIBRARY/CEL/EXPRESSIONS').where('Um', 'glob', '*[[]m/s]').count() == 5
+    with pytest.raises(ValueError):
+        db.query().where('Option', '>', 'Mass Flow Rate')
+
+    # writing a case updates its rows
+    CCLFile(files[0]).flow[0].max_iterations = 20
+    group = inlets(0).groups()[0]
+    group.options['Mass Flow Rate'] = '1 [kg s^-1]'
+    assert inlets(0.9).count() == 1
+    assert db.query().where('Maximum Number of Iterations', '==', 20).count() == 1
+    study['velocity'].flow[0].max_iterations = 30
+    assert db.query().where('Maximum Number of Iterations', '>', 10).count() == 2
+    assert db.refresh() == 0
+
+    # writing the study by its filename indexes only the cases whose tree was replaced
+    indexed = []
+    index = db._index
+    monkeypatch.setattr(db, '_index', lambda filename, name: (indexed.append(name), index(filename, name)))
+    for i in range(3):
+        study.add(f'extra{i}', CCLFile(files[2]))
+    CCLStudy(study.filename)
+    assert indexed == []
+    study.add('massflow', CCLFile(files[0]), overwrite=True)
+    assert indexed == ['massflow']
+    assert db.query().where('Maximum Number of Iterations', '==', 20).count() == 2  # case0 and massflow
+    study.remove('velocity')
+    assert indexed == ['massflow'] and len(db) == 4
+    assert db.refresh() == 0
+    monkeypatch.undo()
+
+    # changes by other means are found by refresh()
+    files[2].unlink()
+    CCLTextFile(tmp_path / 'case0.ccl').to_hdf(files[0])
+    db.close()
+    with CCLIndexDB(tmp_path / 'cases.ccl_index', watch=False) as db:
+        assert db.refresh() == 1
+        assert len(db) == 3
+        assert [(pathlib.Path(f).stem, name) for f, name, _ in inlets(0.9).paths()] == [('study', 'massflow')]
+
+
+def test_ccl_locator(tmp_path):
+    cclfile = CCLFile(CCLTextFile(CCL_FILENAME).to_hdf(tmp_path / 'case.ccl_hdf'))
+    locator = cclfile.locator
+    inlet = 'FLOW: Flow Analysis 1/DOMAIN: Default Domain/BOUNDARY: Inlet'
+    assert locator.find('BOUNDARY', 'inlet') == [inlet]
+    assert locator.find('boundary', boundary_type='inlet') == [inlet]
+    assert locator.get('EXPRESSIONS') == 'LIBRARY/CEL/EXPRESSIONS'
+    assert cclfile.cel.path == 'LIBRARY/CEL'
+    assert [d.name for d in cclfile.domains(flow='Flow Analysis 1')] == ['Default Domain']
+    assert [b.path for b in cclfile.boundaries(boundary_type='INLET')] == [inlet]
+    with pytest.raises(KeyError):
+        locator.get('FLOW', 'missing')
+
+    # setters update the locator instead of walking the file again
+    cclfile.set_massflowrate(0.5)
+    assert cclfile.locator is locator and not locator.is_outdated
+    assert f'{inlet}/BOUNDARY CONDITIONS/FLOW DIRECTION' in locator
+    mm = cclfile.snapshot()[f'{inlet}/BOUNDARY CONDITIONS/MASS AND MOMENTUM'].options
+    assert mm['Mass Flow Rate'] == '0.5 [kg s^-1]' and mm['Option'] == 'Mass Flow Rate'
+    cclfile.set_normalspeed(2)
+    assert f'{inlet}/BOUNDARY CONDITIONS/FLOW DIRECTION' not in locator
+    assert not locator.update()
+
+    # groups created by others are found after the file changed on disk
+    with h5py.File(cclfile.filename, 'r+') as h5:
+        h5.copy(h5[inlet], h5[inlet].parent, 'BOUNDARY: Inlet 2')
+    assert len(cclfile.boundaries('inlet*')) == 2
+    with pytest.raises(ValueError):
+        cclfile.set_massflowrate(0.5)  # ambiguous
+    cclfile.set_massflowrate(0.25, boundary='Inlet*')
+    cclfile.set_massflowrate(0.75, boundary=['inlet 2'], flow='Flow Analysis 1')
+    snapshot = cclfile.snapshot()
+    assert [snapshot[f'{b.path}/BOUNDARY CONDITIONS/MASS AND MOMENTUM'].options['Mass Flow Rate']
+            for b in cclfile.boundaries(boundary_type='INLET')] == ['0.25 [kg s^-1]', '0.75 [kg s^-1]']
+    with pytest.raises(KeyError):
+        cclfile.set_normalspeed(1, boundary='Outlet 7')
+
+    # groups renamed through another wrapper within a session (not yet on disk) are found, too
+    with cclfile.session('r+'):
+        assert len(cclfile.boundaries('inlet*')) == 2
+        with open_h5(cclfile.filename, 'r+') as h5:
+            h5[inlet].parent.move('BOUNDARY: Inlet 2', 'BOUNDARY: Inlet 3')
+        assert [b.name for b in cclfile.boundaries('inlet*')] == ['Inlet', 'Inlet 3']
+        cclfile.set_massflowrate(0.1, boundary='inlet 3')
+    with h5py.File(cclfile.filename) as h5:
+        assert h5[f'{inlet} 3/BOUNDARY CONDITIONS/MASS AND MOMENTUM'].attrs['Mass Flow Rate'] == '0.1 [kg s^-1]'
+        assert f'{inlet} 2' not in h5
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from cfdtoolkit.cfx import casehash, session
+from cfdtoolkit.cfx.prepool import CFXPreWorkerPool
+
+
+def test_cfx5pre_worker_pool(tmp_path, monkeypatch, stand_in, has_ended):
+    # stand-in for "cfx5pre -line": executes >load and >writeCaseFile, prints for "! print",
+    # exits for >crash and hangs for >hang in a child process like the launcher script
+    starts = tmp_path / 'starts.txt'
+    crashes = tmp_path / 'crashes.txt'
+    hung = tmp_path / 'hung.txt'
+    cfx5pre = stand_in('cfx5pre', f'''import pathlib, re, subprocess, sys, time
+assert sys.argv[1:] == ['-line']
+with open({str(starts)!r}, 'a') as f:
+    f.write('started\\n')
+loaded, pending = None, ''
+for line in sys.stdin:
+    line = pending + line.rstrip('\\n')
+    if line.endswith('\\\\'):
+        pending = line[:-1]
+        continue
+    pending = ''
+    m = re.match(r'! print "(.*)\\\\n";', line)
+    if m:
+        print(m.group(1), flush=True)
+    m = re.match(r'>(\\w+)\\s*(?:filename=([^,]+))?', line)
+    if m is None:
+        continue
+    command, filename = m.groups()
+    if command == 'load':
+        loaded = filename
+    elif command == 'writeCaseFile':
+        pathlib.Path(filename or loaded).write_text('written')
+    elif command == 'crash':
+        with open({str(crashes)!r}, 'a') as f:
+            f.write('crashed\\n')
+        sys.exit(3)
+    elif command == 'hang':
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        pathlib.Path({str(hung)!r}).write_text(str(child.pid))
+        child.wait()
+''')
+    crash = tmp_path / 'crash.pre'
+    crash.write_text('COMMAND FILE:\n  CFX Pre Version = __version__\nEND\n>crash\n')
+    hang = tmp_path / 'hang.pre'
+    hang.write_text('COMMAND FILE:\n  CFX Pre Version = __version__\nEND\n>hang\n')
+
+    cfx_filenames = []
+    for i in range(4):
+        cfx_filenames.append(tmp_path / f'case{i}.cfx')
+        cfx_filenames[-1].write_text('case')
+    (tmp_path / 'case0.ccl').write_text('ccl')
+    (tmp_path / 'case0_001.res').write_text('res')
+
+    with CFXPreWorkerPool(n_workers=2, cfx5pre=cfx5pre, ansys_version='22.2', timeout=5) as pool:
+        futures = [pool.cfx2def(f) for f in cfx_filenames]
+        assert [f.result() for f in futures] == [f.with_suffix('.def') for f in cfx_filenames]
+        assert all(f.with_suffix('.def').read_text() == 'written' for f in cfx_filenames)
+        assert pool.importccl(cfx_filenames[0]).result() == cfx_filenames[0]
+        cfx_filenames[0].unlink()
+        assert pool.res2cfx(tmp_path / 'case0_001.res').result() == cfx_filenames[0]
+        assert cfx_filenames[0].exists()
+        assert starts.read_text().count('started') == 2  # the workers are reused
+
+        # dead workers are started again. The session is only sent again with retries:
+        composer = session.SessionComposer(ansys_version='22.2')
+        composer.add('crash', crash, {}, [])
+        with pytest.raises(RuntimeError, match='exit code 3'):
+            pool.submit(composer).result()
+        assert crashes.read_text().count('crashed') == 1
+        pool.retries = 1
+        with pytest.raises(RuntimeError, match='exit code 3'):
+            pool.submit(composer).result()
+        assert crashes.read_text().count('crashed') == 3
+        pool.retries = 0
+        assert pool.cfx2def(cfx_filenames[1], tmp_path / 'again.def').result().exists()
+        pool.timeout = 0.5
+        composer = session.SessionComposer(ansys_version='22.2')
+        composer.add('hang', hang, {}, [])
+        with pytest.raises(TimeoutError):
+            pool.submit(composer).result()
+        assert has_ended(int(hung.read_text()))  # the child of the killed cfx5pre, too
+        pool.timeout = 5
+        assert pool.cfx2def(cfx_filenames[2], tmp_path / 'after_timeout.def').result().exists()
+
+        # a skipped cfx2def touches the def file like session.cfx2def():
+        def_filename = cfx_filenames[3].with_suffix('.def')
+        os.utime(def_filename, ns=(1, 1))
+        with monkeypatch.context() as m:
+            m.setattr(casehash, 'def_is_current', lambda *args: True)
+            assert pool.cfx2def(cfx_filenames[3]).result() == def_filename
+        assert def_filename.stat().st_mtime_ns >= cfx_filenames[3].stat().st_mtime_ns
+    assert not any(worker.is_alive for worker in pool.workers)
+    with pytest.raises(RuntimeError):
+        pool.cfx2def(cfx_filenames[3])
@@ -0,0 +1,100 @@
+import functools
+import time
+
+import pytest
+
+from cfdtoolkit.cfx.scheduler import CFXScheduler, JobState
+
+
+def _case(directory, name, def_text='converges'):
+    (directory / f'{name}.cfx').write_text('cfx')
+    if def_text is not None:
+        (directory / f'{name}.def').write_text(def_text)
+    return directory / f'{name}.cfx'
+
+
+def test_cfx_scheduler(tmp_path, stand_in):
+    # stand-in for cfx5solve: writes the next result and out file of the case
+    cfx5solve = stand_in('cfx5solve', '''import pathlib, sys, time
+args = sys.argv[1:]
+def_filename = pathlib.Path(args[args.index('-def') + 1])
+ini = args[args.index('-ini') + 1] if '-ini' in args else ''
+time.sleep(1)
+n = len(list(def_filename.parent.glob(def_filename.stem + '_*.res'))) + 1
+res_filename = def_filename.parent / f'{def_filename.stem}_{n:03d}.res'
+res_filename.write_text('res')
+converged = 'all RMS residual AND user-defined target criteria satisfied.' if 'converges' in def_filename.read_text() else ''
+res_filename.with_suffix('.out').write_text(f'ini={ini}\\n{converged}')
+''')
+
+    case = functools.partial(_case, tmp_path)
+    queue = tmp_path / 'queue.json'
+    scheduler = CFXScheduler(queue, nproc_max=4, license_tokens=2, cfx5solve=cfx5solve)
+    steady = scheduler.submit(case('steady'), nproc=2)
+    scheduler.submit(case('transient'), nproc=4, after=[steady], condition='converged', ini_from=steady)
+    diverging = scheduler.submit(case('diverging', 'diverges'), nproc=2)
+    scheduler.submit(case('transient2'), after=[diverging], condition='converged')
+    scheduler.submit(case('urgent'), nproc=1, priority=5)
+    scheduler.submit(case('nodef', None), nproc=1, priority=-1)
+    assert scheduler.submit(case('steady'), nproc=2) == 'steady'  # not added twice
+    with pytest.raises(ValueError):
+        scheduler.submit(case('large'), nproc=8)
+    with pytest.raises(KeyError):
+        scheduler.submit(case('orphan'), after=['unknown'])
+
+    # two license tokens: the urgent job first, then steady. Does not block.
+    assert scheduler.step() == ['urgent', 'steady']
+    assert scheduler._processes['steady'].poll() is None  # still running
+    assert scheduler['transient'].state == JobState.PENDING
+
+    # a restarted driver continues the queue and tracks the running solvers
+    scheduler = CFXScheduler(queue, nproc_max=4, license_tokens=2, cfx5solve=cfx5solve)
+    assert scheduler['steady'].state == JobState.RUNNING
+    assert scheduler.step() == []
+    states = scheduler.run(poll_interval=0.1)
+    assert states == {'steady': JobState.SUCCEEDED, 'transient': JobState.SUCCEEDED,
+                      'diverging': JobState.SUCCEEDED, 'transient2': JobState.SKIPPED,
+                      'urgent': JobState.SUCCEEDED, 'nodef': JobState.FAILED}
+    assert 'Definition file not found' in scheduler['nodef'].error
+    assert (tmp_path / 'transient_001.out').read_text().startswith(f'ini={tmp_path / "steady_001.res"}')
+    assert scheduler['transient'].started >= scheduler['steady'].finished
+    assert CFXScheduler(queue).is_done
+
+
+def test_cfx_scheduler_cancel(tmp_path, stand_in, has_ended):
+    # launcher-like stand-in for cfx5solve: the "solver" is a child process
+    cfx5solve = stand_in('cfx5solve', '''import pathlib, subprocess, sys
+args = sys.argv[1:]
+def_filename = pathlib.Path(args[args.index('-def') + 1])
+child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+def_filename.with_suffix('.child').write_text(str(child.pid))
+child.wait()
+''')
+
+    def child_pid(name):
+        filename = tmp_path / f'{name}.child'
+        deadline = time.monotonic() + 10
+        while not (filename.exists() and filename.read_text()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return int(filename.read_text())
+
+    queue = tmp_path / 'queue.json'
+    scheduler = CFXScheduler(queue, nproc_max=2, cfx5solve=cfx5solve)
+    scheduler.submit(_case(tmp_path, 'a'))
+    scheduler.submit(_case(tmp_path, 'b'), after=['a'])
+    scheduler.submit(_case(tmp_path, 'c'))
+    assert scheduler.step() == ['a', 'c']
+    pids = {name: child_pid(name) for name in ('a', 'c')}
+
+    # the solver processes end with the job, so their cores are free again
+    scheduler.cancel('a')
+    assert scheduler['a'].state == JobState.CANCELLED
+    assert has_ended(pids['a'])
+    assert scheduler.step() == []
+    assert scheduler['b'].state == JobState.SKIPPED
+
+    # jobs started by an earlier driver, too
+    scheduler = CFXScheduler(queue, nproc_max=2, cfx5solve=cfx5solve)
+    scheduler.cancel('c')
+    assert has_ended(pids['c'])
+    assert scheduler.is_done
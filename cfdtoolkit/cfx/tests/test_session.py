@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from cfdtoolkit.cfx import session
+
+
+def test_session_composer(tmp_path, stand_in):
+    # stand-in for cfx5pre: loads and writes the files named in the session file
+    calls = tmp_path / 'calls.txt'
+    cfx5pre = stand_in('cfx5pre', f'''import pathlib, re, sys
+text = pathlib.Path(sys.argv[2]).read_text()
+with open({str(calls)!r}, 'a') as f:
+    f.write(text + '\\n=====\\n')
+loaded = None
+for line in re.sub(r'\\\\\\n', '', text).splitlines():
+    m = re.match(r'>(\\w+)\\s*(?:filename=([^,]+))?', line)
+    if m is None:
+        continue
+    command, filename = m.groups()
+    if command == 'load':
+        if not pathlib.Path(filename).exists():
+            sys.exit(1)
+        loaded = filename
+    elif command == 'writeCaseFile':
+        pathlib.Path(filename or loaded).write_text(text)
+''')
+
+    cfx_filename = tmp_path / 'case.cfx'
+    cfx_filename.write_text('case')
+    ccl_filename = tmp_path / 'case.ccl'
+    ccl_filename.write_text('ccl')
+    os.utime(cfx_filename, (0, 0))
+
+    composer = session.SessionComposer(ansys_version='22.2')
+    composer.importccl(cfx_filename, ccl_filename)
+    composer.change_timestep(cfx_filename, 0.01)
+    composer.cfx2def(cfx_filename)
+    text = composer.render()
+    assert text.count('COMMAND FILE:') == 1 and 'CFX Pre Version = 22.2' in text
+    assert '__' not in text and 'Timesteps = 0.01 [s]' in text
+    assert text.index('>importccl') < text.index('&replace') < text.index('operation=write def file')
+
+    steps = composer.run(cfx5pre=cfx5pre)
+    assert [step.ok for step in steps] == [True, True, True]
+    assert calls.read_text().count('=====') == 1  # one cfx5pre run
+    assert (tmp_path / 'case.def').exists()
+
+    # a step whose input is written by an earlier step
+    composer = session.SessionComposer(ansys_version='22.2')
+    with pytest.raises(FileExistsError):
+        composer.cfx2def(tmp_path / 'other.cfx')
+    composer.def2cfx(tmp_path / 'case.def', tmp_path / 'other.cfx')
+    composer.cfx2def(tmp_path / 'other.cfx')
+    assert [step.ok for step in composer.run(cfx5pre=cfx5pre)] == [True, True]
+
+    # failed steps are reported by the missing outputs
+    composer = session.SessionComposer(ansys_version='22.2')
+    composer.cfx2def(cfx_filename, tmp_path / 'first.def')
+    composer.res2cfx(cfx_filename, tmp_path / 'second.cfx')
+    (tmp_path / 'second.cfx').write_text('old')
+    with pytest.raises(KeyError):
+        composer.add('bad', 'cfx2def.pre', {'__unknown__': 1}, [])
+    composer.steps[1].params['__resfilename__'] = str(tmp_path / 'missing.res')
+    with pytest.raises(RuntimeError, match='res2cfx'):
+        composer.run(cfx5pre=cfx5pre)
+    assert [step.ok for step in composer.steps] == [True, False]
+
+
+def test_session_templates(tmp_path, monkeypatch):
+    templates = session.load_templates()
+    assert 'cfx2def.pre' in templates
+    template = templates['cfx2def.pre']
+    assert template is session.session_template('cfx2def.pre')  # compiled once
+    assert template.placeholders == {'__version__', '__cfxfilename__', '__deffilename__'}
+    params = {'__version__': '22.2', '__cfxfilename__': '/a/case.cfx', '__deffilename__': '/a/case.def'}
+    text = template.render(params)
+    assert '>writeCaseFile filename=/a/case.def,operation=write def file' in text
+    assert text.count('22.2') == 2 and '__' not in text
+    with pytest.raises(ValueError, match='__deffilename__'):
+        template.render({'__version__': '22.2', '__cfxfilename__': '/a/case.cfx'})
+    with pytest.raises(KeyError, match='__timestep__'):
+        template.render({**params, '__timestep__': 0.1})
+    # values are not substituted again
+    assert session.SessionTemplate('a __x__ b __y__').render({'__x__': '__y__', '__y__': 1}) == 'a __y__ b 1'
+
+    # templates outside the session directory are compiled again after a change
+    custom = tmp_path / 'custom.pre'
+    custom.write_text('>load filename=__cfxfilename__')
+    assert session.session_template(custom).placeholders == {'__cfxfilename__'}
+    custom.write_text('>load filename=__deffilename__')
+    os.utime(custom, ns=(0, 10 ** 9))
+    assert session.session_template(custom).placeholders == {'__deffilename__'}
+
+    # the session is written once to the scratch directory and removed after the run
+    played = []
+
+    def _play_session(session_file, cfx5pre=None):
+        played.append((session_file, session_file.read_text()))
+
+    monkeypatch.setattr(session, 'play_session', _play_session)
+    session.run_session_file('cfx2def.pre', params)
+    (session_file, played_text), = played
+    assert played_text == text
+    assert session_file.parent == session.scratch_dir() and not session_file.exists()
+    assert session.random_tmp_filename('pre').parent == session.scratch_dir()
@@ -1,11 +1,31 @@
+import os
 import pathlib
 import re
+import signal
+import subprocess
 from os import utime
-from typing import Tuple
+from typing import Dict, Tuple
 
 from ..typing import PATHLIKE
 
 
+# Popen arguments starting a tool in its own process group. CFX tools are launcher scripts
+# and the actual programs are their child processes, which are killed with the group.
+NEW_PROCESS_GROUP: Dict = {'start_new_session': True} if os.name == 'posix' else \
+    {'creationflags': getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)}
+
+
+def kill_process_group(pid: int) -> None:
+    """Kills a process started with `NEW_PROCESS_GROUP` and all processes of its group"""
+    if os.name == 'posix':
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], capture_output=True)
+
+
 def _generate_mtime_filename(filename, target_dir) -> pathlib.Path:
     return pathlib.Path(target_dir).joinpath(f'{pathlib.Path(filename).stem}.st_mtime')
 